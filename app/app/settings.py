@@ -52,18 +52,28 @@ INSTALLED_APPS = [
 
     'core',
     'user',
+    'jobs',
+    'audit',
+    'outbox',
+    'listings',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.bus.InvalidationBusMiddleware',
+    'user.middleware.ActivityMiddleware',
+    'core.budget.QueryBudgetMiddleware',
+    'core.memory.MemoryWatchdogMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -151,7 +161,7 @@ AUTH_USER_MODEL = 'user.User'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -174,4 +184,195 @@ CORS_ALLOWED_ORIGINS = [
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'user.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'user.serializers.TokenRefreshSerializer',
 }
+
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+JOBS_RETRY_BACKOFF = float(os.environ.get('JOBS_RETRY_BACKOFF', 5))
+JOBS_RETRY_BACKOFF_MAX = float(os.environ.get('JOBS_RETRY_BACKOFF_MAX', 3600))
+JOBS_LOCK_TIMEOUT = int(os.environ.get('JOBS_LOCK_TIMEOUT', 900))
+JOBS_HEARTBEAT_INTERVAL = int(os.environ.get('JOBS_HEARTBEAT_INTERVAL', 60))
+
+USER_IMAGE_MAX_SIZE = int(os.environ.get('USER_IMAGE_MAX_SIZE', 2048))
+
+USER_ACTIVITY_FLUSH_INTERVAL = float(
+    os.environ.get('USER_ACTIVITY_FLUSH_INTERVAL', 30)
+)
+USER_ACTIVITY_BATCH_SIZE = int(os.environ.get('USER_ACTIVITY_BATCH_SIZE', 500))
+
+AUDIT_SINK = os.environ.get('AUDIT_SINK', 'db')  # 'db' or 'file'
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 2))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_FILE_PATH = os.environ.get('AUDIT_FILE_PATH', '/vol/web/audit.ndjson')
+AUDIT_FILE_MAX_BYTES = int(
+    os.environ.get('AUDIT_FILE_MAX_BYTES', 100 * 1024 * 1024)
+)
+AUDIT_FILE_BACKUP_COUNT = int(os.environ.get('AUDIT_FILE_BACKUP_COUNT', 10))
+
+# Encodings in order of preference; br and zstd need the brotli and
+# zstandard packages and are skipped when those are not installed.
+COMPRESSION_PREFERENCE = ['zstd', 'br', 'gzip']
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+COMPRESSION_ROUTE_LEVELS = {
+    '/api/v1/schema/': {'gzip': 9, 'br': 11, 'zstd': 19},
+}
+COMPRESSION_CACHE_ROUTES = ['/api/v1/schema/']
+COMPRESSION_CACHE_SIZE = 32
+
+USER_BATCH_LOOKUP_LIMIT = int(os.environ.get('USER_BATCH_LOOKUP_LIMIT', 100))
+
+USER_ACCESS_CACHE_TIMEOUT = int(
+    os.environ.get('USER_ACCESS_CACHE_TIMEOUT', 300)
+)
+
+AUTHENTICATION_BACKENDS = ['user.backends.CaseInsensitiveEmailBackend']
+
+# 'buffered' writes outstanding tokens behind in batches, 'sync' inline.
+TOKEN_RECORDER_DURABILITY = os.environ.get(
+    'TOKEN_RECORDER_DURABILITY', 'buffered'
+)
+TOKEN_RECORDER_FLUSH_INTERVAL = float(
+    os.environ.get('TOKEN_RECORDER_FLUSH_INTERVAL', 1)
+)
+TOKEN_RECORDER_BATCH_SIZE = int(
+    os.environ.get('TOKEN_RECORDER_BATCH_SIZE', 500)
+)
+
+# Resized user images served from /media/users/<id>/<size>.<ext>
+USER_IMAGE_SIZES = [64, 128, 256, 512, 1024]
+USER_IMAGE_CACHE_DIR = os.environ.get(
+    'USER_IMAGE_CACHE_DIR', '/vol/web/cache/images/'
+)
+USER_IMAGE_CACHE_MAX_BYTES = int(
+    os.environ.get('USER_IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+)
+USER_IMAGE_MAX_AGE = int(os.environ.get('USER_IMAGE_MAX_AGE', 7 * 24 * 3600))
+# 'django' streams with FileResponse, 'x-accel' hands the file to nginx
+# through an internal location mapping USER_IMAGE_ACCEL_PREFIX to the
+# cache dir, 'x-sendfile' to Apache or lighttpd.
+USER_IMAGE_DELIVERY = os.environ.get('USER_IMAGE_DELIVERY', 'django')
+USER_IMAGE_ACCEL_PREFIX = os.environ.get(
+    'USER_IMAGE_ACCEL_PREFIX', '/internal/images/'
+)
+
+# Superusers profile a request by sending `X-Profile: 1`; a fraction of
+# all requests can be sampled as well.
+PROFILING_HEADER = 'X-Profile'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_SAMPLE_INTERVAL = float(
+    os.environ.get('PROFILING_SAMPLE_INTERVAL', 0.005)
+)
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/vol/web/profiles/')
+PROFILING_MAX_CAPTURES = int(os.environ.get('PROFILING_MAX_CAPTURES', 200))
+
+# tracemalloc snapshots are taken through /api/v1/memory/ or on
+# MEMORY_SNAPSHOT_SIGNAL (off by default, uwsgi uses SIGUSR1 and SIGUSR2
+# itself); workers over MEMORY_RSS_LIMIT_MB log their top allocators and
+# are gracefully restarted. A limit or watchdog interval of 0 disables it.
+MEMORY_TRACE_ON_START = os.environ.get('MEMORY_TRACE_ON_START') == '1'
+MEMORY_TRACEMALLOC_FRAMES = int(
+    os.environ.get('MEMORY_TRACEMALLOC_FRAMES', 10)
+)
+MEMORY_SNAPSHOTS_KEPT = int(os.environ.get('MEMORY_SNAPSHOTS_KEPT', 3))
+MEMORY_SNAPSHOT_DIR = os.environ.get('MEMORY_SNAPSHOT_DIR', '')
+MEMORY_SNAPSHOT_SIGNAL = os.environ.get('MEMORY_SNAPSHOT_SIGNAL', '')
+MEMORY_RSS_LIMIT_MB = int(os.environ.get('MEMORY_RSS_LIMIT_MB', 0))
+MEMORY_WATCHDOG_INTERVAL = float(
+    os.environ.get('MEMORY_WATCHDOG_INTERVAL', 60)
+)
+MEMORY_WATCHDOG_TOP = int(os.environ.get('MEMORY_WATCHDOG_TOP', 10))
+
+# Cache invalidations between workers over LISTEN/NOTIFY, see core.bus
+INVALIDATION_BUS_LISTEN = os.environ.get('INVALIDATION_BUS_LISTEN', '1') == '1'
+INVALIDATION_BUS_RESYNC_INTERVAL = float(
+    os.environ.get('INVALIDATION_BUS_RESYNC_INTERVAL', 5)
+)
+INVALIDATION_BUS_GAP_GRACE = float(
+    os.environ.get('INVALIDATION_BUS_GAP_GRACE', 2)
+)
+
+# In-process cache of users by id, see user.cache
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+
+# Users idle for USER_ARCHIVE_IDLE_DAYS, or deactivated for
+# USER_ARCHIVE_INACTIVE_DAYS, are moved to cold storage by archive_users
+USER_ARCHIVE_IDLE_DAYS = int(os.environ.get('USER_ARCHIVE_IDLE_DAYS', 730))
+USER_ARCHIVE_INACTIVE_DAYS = int(
+    os.environ.get('USER_ARCHIVE_INACTIVE_DAYS', 180)
+)
+USER_ARCHIVE_BATCH_SIZE = int(os.environ.get('USER_ARCHIVE_BATCH_SIZE', 500))
+USER_ARCHIVE_SLEEP = float(os.environ.get('USER_ARCHIVE_SLEEP', 0.5))
+USER_ARCHIVE_LOCK_TIMEOUT = int(
+    os.environ.get('USER_ARCHIVE_LOCK_TIMEOUT', 2000)
+)
+
+# Responses to requests sent with an Idempotency-Key, see core.idempotency
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+IDEMPOTENCY_WAIT = float(os.environ.get('IDEMPOTENCY_WAIT', 10))
+IDEMPOTENCY_POLL_INTERVAL = float(
+    os.environ.get('IDEMPOTENCY_POLL_INTERVAL', 0.1)
+)
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# User events are delivered by dispatch_outbox to OUTBOX_SINKS, comma
+# separated https://, file:///path (NDJSON) or unix:///path URIs
+OUTBOX_SINKS = list(
+    filter(None, os.environ.get('OUTBOX_SINKS', '').split(','))
+)
+OUTBOX_PARTITIONS = int(os.environ.get('OUTBOX_PARTITIONS', 8))
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_RETRY_BACKOFF = float(os.environ.get('OUTBOX_RETRY_BACKOFF', 1))
+OUTBOX_RETRY_BACKOFF_MAX = float(
+    os.environ.get('OUTBOX_RETRY_BACKOFF_MAX', 300)
+)
+OUTBOX_RETENTION = int(os.environ.get('OUTBOX_RETENTION', 3 * 24 * 3600))
+OUTBOX_WEBHOOK_SECRET = os.environ.get('OUTBOX_WEBHOOK_SECRET', '')
+OUTBOX_WEBHOOK_TIMEOUT = float(os.environ.get('OUTBOX_WEBHOOK_TIMEOUT', 10))
+
+# Per-worker Bloom filter of emails in use, see user.emails
+USER_EMAIL_FILTER_CAPACITY = int(
+    os.environ.get('USER_EMAIL_FILTER_CAPACITY', 100000)
+)
+USER_EMAIL_FILTER_ERROR_RATE = float(
+    os.environ.get('USER_EMAIL_FILTER_ERROR_RATE', 0.01)
+)
+USER_EMAIL_FILTER_REBUILD_INTERVAL = float(
+    os.environ.get('USER_EMAIL_FILTER_REBUILD_INTERVAL', 3600)
+)
+# Builds run on a thread, emails being checked in the database meanwhile
+USER_EMAIL_FILTER_BACKGROUND = (
+    os.environ.get('USER_EMAIL_FILTER_BACKGROUND', '1') == '1'
+)
+
+# Views over their query_budget raise when enforced and log otherwise;
+# database time overruns only log unless enforced separately
+QUERY_BUDGET_ENFORCE = bool(
+    int(os.environ.get('QUERY_BUDGET_ENFORCE', int(DEBUG)))
+)
+QUERY_BUDGET_ENFORCE_SECONDS = bool(
+    int(os.environ.get('QUERY_BUDGET_ENFORCE_SECONDS', 0))
+)
+
+# Listing searches: widest box still looked up by grid cells, in rows of
+# 0.01 degrees, largest radius in km and largest page
+LISTING_SEARCH_MAX_CELL_ROWS = int(
+    os.environ.get('LISTING_SEARCH_MAX_CELL_ROWS', 64)
+)
+LISTING_SEARCH_MAX_RADIUS_KM = float(
+    os.environ.get('LISTING_SEARCH_MAX_RADIUS_KM', 100)
+)
+LISTING_SEARCH_MAX_LIMIT = int(os.environ.get('LISTING_SEARCH_MAX_LIMIT', 200))
+
+# Matching stores reload changed rows one by one up to this many, then
+# rebuild; largest number of recommendations per request
+MATCHING_MAX_PENDING = int(os.environ.get('MATCHING_MAX_PENDING', 1000))
+MATCHING_MAX_LIMIT = int(os.environ.get('MATCHING_MAX_LIMIT', 100))
+
+# The user change feed holds back rows changed in the last this many
+# seconds, so a transaction committing late is not skipped by cursors
+USER_CHANGES_SAFETY_LAG = float(os.environ.get('USER_CHANGES_SAFETY_LAG', 5))
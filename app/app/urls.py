@@ -23,8 +23,17 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import MemoryView, MetricsView, profile_file, profile_list
+from user.images import user_image
+
 
 urlpatterns = [
+    path('admin/profiles/', profile_list, name='admin-profiles'),
+    path(
+        'admin/profiles/<str:filename>',
+        profile_file,
+        name='admin-profile-file',
+    ),
     path('admin/', admin.site.urls),
     path('api/v1/schema/', SpectacularAPIView.as_view(), name='api-schema'),
     path(
@@ -33,6 +42,15 @@ urlpatterns = [
         name='api-docs',
     ),
     path('api/v1/user/', include('user.urls')),
+    path('api/v1/audit/', include('audit.urls')),
+    path('api/v1/', include('listings.urls')),
+    path('api/v1/metrics/', MetricsView.as_view(), name='metrics'),
+    path('api/v1/memory/', MemoryView.as_view(), name='memory'),
+    path(
+        'media/users/<int:user_id>/<int:size>.<str:ext>',
+        user_image,
+        name='user-image',
+    ),
 ]
 
 
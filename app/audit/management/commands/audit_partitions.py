@@ -0,0 +1,115 @@
+"""
+Django command to maintain the monthly audit event partitions.
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+COLUMNS = 'id, created_at, action, user_id, target_id, ip, detail'
+
+
+def month_start(day, offset=0):
+    """First day of the month `offset` months after `day`."""
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def ensure_partition(cursor, start):
+    """
+    Create the partition of the month starting on `start`, return its
+    name and whether it was created.
+
+    A partition cannot be created while the default one holds rows in
+    its range, so those rows are moved: the default partition is
+    detached, the new one created and filled, and the default one
+    attached again, all in one transaction holding the table lock.
+    """
+    end = month_start(start, 1)
+    name = f'audit_auditevent_y{start.year}m{start.month:02d}'
+    cursor.execute('SELECT to_regclass(%s)', [name])
+    if cursor.fetchone()[0] is not None:
+        return name, False
+    bounds = [start.isoformat(), end.isoformat()]
+    with transaction.atomic():
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM audit_auditevent_default '
+            'WHERE created_at >= %s AND created_at < %s)',
+            bounds,
+        )
+        moving = cursor.fetchone()[0]
+        if moving:
+            cursor.execute(
+                'ALTER TABLE audit_auditevent '
+                'DETACH PARTITION audit_auditevent_default'
+            )
+        cursor.execute(
+            f'CREATE TABLE {name} PARTITION OF audit_auditevent '
+            'FOR VALUES FROM (%s) TO (%s)',
+            bounds,
+        )
+        if moving:
+            cursor.execute(
+                f'INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} '
+                'FROM audit_auditevent_default '
+                'WHERE created_at >= %s AND created_at < %s',
+                bounds,
+            )
+            cursor.execute(
+                'DELETE FROM audit_auditevent_default '
+                'WHERE created_at >= %s AND created_at < %s',
+                bounds,
+            )
+            cursor.execute(
+                'ALTER TABLE audit_auditevent ATTACH PARTITION '
+                'audit_auditevent_default DEFAULT'
+            )
+    return name, True
+
+
+class Command(BaseCommand):
+    """Django command to create upcoming and drop expired partitions."""
+    help = 'Create monthly audit partitions ahead and drop old ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=3,
+            help='Months to create partitions for, including this one.',
+        )
+        parser.add_argument(
+            '--retain', type=int, default=None,
+            help='Drop partitions older than this many months.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if connection.vendor != 'postgresql':
+            raise CommandError('Audit partitioning requires PostgreSQL.')
+
+        today = date.today()
+        with connection.cursor() as cursor:
+            for offset in range(options['ahead']):
+                name, _ = ensure_partition(
+                    cursor, month_start(today, offset)
+                )
+                self.stdout.write(f'Partition {name} ready.')
+
+            if options['retain'] is None:
+                return
+            cutoff = month_start(today, -options['retain'])
+            cursor.execute(
+                """
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'audit_auditevent'::regclass
+                  AND c.relname ~ '^audit_auditevent_y[0-9]{4}m[0-9]{2}$'
+                """
+            )
+            for (name,) in cursor.fetchall():
+                year, month = int(name[-7:-3]), int(name[-2:])
+                if date(year, month, 1) < cutoff:
+                    cursor.execute(
+                        f'ALTER TABLE audit_auditevent DETACH PARTITION {name}'
+                    )
+                    cursor.execute(f'DROP TABLE {name}')
+                    self.stdout.write(f'Dropped partition {name}.')
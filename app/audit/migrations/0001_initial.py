@@ -0,0 +1,84 @@
+from datetime import date
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_table(apps, schema_editor):
+    """Create the events table, range partitioned on PostgreSQL."""
+    AuditEvent = apps.get_model('audit', 'AuditEvent')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(AuditEvent)
+        return
+
+    # Partitioned tables need the partition key in the primary key and
+    # cannot use identity columns before PostgreSQL 17, hence bigserial.
+    schema_editor.execute(
+        """
+        CREATE TABLE audit_auditevent (
+            id bigserial NOT NULL,
+            created_at timestamp with time zone NOT NULL,
+            action varchar(32) NOT NULL,
+            user_id bigint NULL,
+            target_id bigint NULL,
+            ip inet NULL,
+            detail jsonb NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    schema_editor.execute(
+        'CREATE TABLE audit_auditevent_default '
+        'PARTITION OF audit_auditevent DEFAULT'
+    )
+    # This month and the next exist before any write, so the default
+    # partition stays empty and `audit_partitions` can add later months
+    today = date.today()
+    months = today.year * 12 + today.month - 1
+    for offset in range(2):
+        start = date((months + offset) // 12, (months + offset) % 12 + 1, 1)
+        end = date(
+            (months + offset + 1) // 12, (months + offset + 1) % 12 + 1, 1
+        )
+        schema_editor.execute(
+            f'CREATE TABLE audit_auditevent_y{start.year}m{start.month:02d} '
+            'PARTITION OF audit_auditevent FOR VALUES FROM (%s) TO (%s)',
+            [start.isoformat(), end.isoformat()],
+        )
+    for index in AuditEvent._meta.indexes:
+        schema_editor.add_index(AuditEvent, index)
+
+
+def drop_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model('audit', 'AuditEvent'))
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='AuditEvent',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('action', models.CharField(choices=[('login', 'Login'), ('login_failed', 'Failed login'), ('token_refresh', 'Token refresh'), ('logout', 'Logout'), ('admin_create_denied', 'Admin creation denied'), ('image_upload', 'Image upload')], max_length=32)),
+                        ('user_id', models.BigIntegerField(blank=True, null=True)),
+                        ('target_id', models.BigIntegerField(blank=True, null=True)),
+                        ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                        ('detail', models.JSONField(default=dict)),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['user_id', 'created_at'], name='audit_user_created_idx'), models.Index(fields=['action', 'created_at'], name='audit_action_created_idx'), models.Index(fields=['created_at'], name='audit_created_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
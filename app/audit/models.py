@@ -0,0 +1,52 @@
+"""
+Database models for the audit trail.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class AuditEvent(models.Model):
+    """
+    An authentication or admin action.
+
+    On PostgreSQL the table is range partitioned by `created_at`, see the
+    `audit_partitions` command. Users are referenced by id only so events
+    outlive the accounts they describe.
+    """
+    LOGIN = 'login'
+    LOGIN_FAILED = 'login_failed'
+    TOKEN_REFRESH = 'token_refresh'
+    LOGOUT = 'logout'
+    ADMIN_CREATE_DENIED = 'admin_create_denied'
+    IMAGE_UPLOAD = 'image_upload'
+    ACTION_CHOICES = [
+        (LOGIN, 'Login'),
+        (LOGIN_FAILED, 'Failed login'),
+        (TOKEN_REFRESH, 'Token refresh'),
+        (LOGOUT, 'Logout'),
+        (ADMIN_CREATE_DENIED, 'Admin creation denied'),
+        (IMAGE_UPLOAD, 'Image upload'),
+    ]
+
+    created_at = models.DateTimeField(default=timezone.now)
+    action = models.CharField(max_length=32, choices=ACTION_CHOICES)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    target_id = models.BigIntegerField(null=True, blank=True)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    detail = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user_id', 'created_at'],
+                name='audit_user_created_idx',
+            ),
+            models.Index(
+                fields=['action', 'created_at'],
+                name='audit_action_created_idx',
+            ),
+            models.Index(fields=['created_at'], name='audit_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.action} by {self.user_id} at {self.created_at}'
@@ -0,0 +1,129 @@
+"""
+Non-blocking, batched recording of audit events.
+"""
+import json
+import logging
+import queue
+import time
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from audit.models import AuditEvent
+from core import metrics
+from core.background import BackgroundFlusher
+
+
+class AuditRecorder(BackgroundFlusher):
+    """
+    Queue audit events in memory and write them in bulk.
+
+    The queue is bounded by `AUDIT_QUEUE_SIZE`; when it is full new events
+    are dropped and counted rather than slowing the request down.
+    """
+    interval_setting = 'AUDIT_FLUSH_INTERVAL'
+
+    def __init__(self):
+        super().__init__()
+        self.events = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+        self.file_handler = None
+        self.stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed': 0,
+            'high_watermark': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def record(self, action, request=None, user=None, target=None,
+               **detail):
+        """
+        Queue an event; never blocks and never raises on overload.
+
+        `user` and `target` may be model instances or ids; `user` defaults
+        to the authenticated user of `request`.
+        """
+        if user is None and request is not None:
+            user = getattr(request, 'user', None)
+        if user is not None and not isinstance(user, int):
+            user = user.pk if user.is_authenticated else None
+        event = AuditEvent(
+            action=action,
+            user_id=user,
+            target_id=getattr(target, 'pk', target),
+            ip=request.META.get('REMOTE_ADDR') if request else None,
+            detail=detail,
+        )
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            with self.lock:
+                self.stats['dropped'] += 1
+            return
+        depth = self.events.qsize()
+        with self.lock:
+            self.stats['enqueued'] += 1
+            self.stats['high_watermark'] = max(
+                self.stats['high_watermark'], depth
+            )
+        if depth >= settings.AUDIT_BATCH_SIZE:
+            self.wake()
+        self.schedule()
+
+    def flush(self):
+        while True:
+            batch = []
+            while len(batch) < settings.AUDIT_BATCH_SIZE:
+                try:
+                    batch.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            started = time.monotonic()
+            try:
+                self.write(batch)
+            except Exception:
+                with self.lock:
+                    self.stats['failed'] += len(batch)
+                raise
+            with self.lock:
+                self.stats['written'] += len(batch)
+                self.stats['last_flush_ms'] = round(
+                    1000 * (time.monotonic() - started), 3
+                )
+
+    def write(self, batch):
+        if settings.AUDIT_SINK == 'file':
+            handler = self.get_file_handler()
+            for event in batch:
+                handler.handle(logging.makeLogRecord({'msg': json.dumps({
+                    'created_at': event.created_at,
+                    'action': event.action,
+                    'user_id': event.user_id,
+                    'target_id': event.target_id,
+                    'ip': event.ip,
+                    'detail': event.detail,
+                }, cls=DjangoJSONEncoder)}))
+        else:
+            AuditEvent.objects.bulk_create(batch)
+
+    def get_file_handler(self):
+        """Handler appending NDJSON lines to a size rotated file."""
+        if self.file_handler is None:
+            self.file_handler = RotatingFileHandler(
+                settings.AUDIT_FILE_PATH,
+                maxBytes=settings.AUDIT_FILE_MAX_BYTES,
+                backupCount=settings.AUDIT_FILE_BACKUP_COUNT,
+            )
+        return self.file_handler
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, 'queue_depth': self.events.qsize()}
+
+
+recorder = AuditRecorder()
+metrics.register('audit', recorder.snapshot)
@@ -0,0 +1,18 @@
+"""
+Serializers for the audit API View
+"""
+from rest_framework import serializers
+
+from audit.models import AuditEvent
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    """Serializer for audit events."""
+
+    class Meta:
+        model = AuditEvent
+        fields = [
+            'id', 'created_at', 'action', 'user_id', 'target_id', 'ip',
+            'detail',
+        ]
+        read_only_fields = fields
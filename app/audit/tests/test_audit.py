@@ -0,0 +1,162 @@
+"""
+Tests for the audit trail.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from audit.management.commands.audit_partitions import (
+    ensure_partition,
+    month_start,
+)
+from audit.models import AuditEvent
+from audit.recorder import AuditRecorder
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+EVENTS_URL = reverse('audit:event-list')
+ACCESS_TOKEN_URL = reverse('user:token_obtain_pair')
+REFRESH_TOKEN_URL = reverse('user:token_refresh')
+CREATE_LIST_USERS_URL = reverse('user:user-list')
+
+
+@pytest.fixture
+def superuser_client(db):
+    user = User.objects.create_superuser('super@example.com', 'pass12345')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.mark.django_db
+def test_login_refresh_and_failed_login_are_audited():
+    """Test token obtain, refresh and bad credentials write events."""
+    user = User.objects.create_user('test@example.com', 'pass12345')
+    client = APIClient()
+
+    res = client.post(ACCESS_TOKEN_URL, {
+        'email': 'test@example.com', 'password': 'pass12345'
+    })
+    client.post(REFRESH_TOKEN_URL, {'refresh': res.data['refresh']})
+    client.post(ACCESS_TOKEN_URL, {
+        'email': 'test@example.com', 'password': 'wrong'
+    })
+
+    events = list(
+        AuditEvent.objects.order_by('id').values_list('action', 'user_id')
+    )
+    assert events == [
+        (AuditEvent.LOGIN, user.id),
+        (AuditEvent.TOKEN_REFRESH, user.id),
+        (AuditEvent.LOGIN_FAILED, None),
+    ]
+    failed = AuditEvent.objects.get(action=AuditEvent.LOGIN_FAILED)
+    assert failed.detail == {'email': 'test@example.com'}
+    assert failed.ip == '127.0.0.1'
+
+
+@pytest.mark.django_db
+def test_denied_admin_creation_is_audited():
+    """Test an admin trying to create another admin is audited."""
+    admin = UserFactory(user_type='admin')
+    client = APIClient()
+    client.force_authenticate(user=admin)
+
+    client.post(CREATE_LIST_USERS_URL, {
+        'email': 'new@example.com', 'password': 'pass12345', 'name': 'n',
+        'gender': 'M', 'user_type': 'admin',
+    })
+
+    event = AuditEvent.objects.get()
+    assert event.action == AuditEvent.ADMIN_CREATE_DENIED
+    assert event.user_id == admin.id
+
+
+@pytest.mark.django_db
+def test_recorder_drops_events_when_queue_is_full():
+    """Test a full queue drops events instead of blocking."""
+    with override_settings(AUDIT_QUEUE_SIZE=2):
+        recorder = AuditRecorder()
+
+    with patch.object(recorder, 'schedule'):
+        for _ in range(3):
+            recorder.record(AuditEvent.LOGOUT, user=1)
+
+    assert recorder.snapshot()['dropped'] == 1
+    assert recorder.snapshot()['queue_depth'] == 2
+    recorder.flush()
+    assert AuditEvent.objects.count() == 2
+    assert recorder.snapshot()['written'] == 2
+
+
+@override_settings(AUDIT_SINK='file')
+def test_recorder_file_sink(tmp_path, settings):
+    """Test the file sink appends NDJSON lines."""
+    settings.AUDIT_FILE_PATH = str(tmp_path / 'audit.ndjson')
+    recorder = AuditRecorder()
+
+    recorder.record(AuditEvent.LOGOUT, user=7)
+
+    assert '"user_id": 7' in (tmp_path / 'audit.ndjson').read_text()
+
+
+def test_list_events_filters_by_user_and_time(superuser_client):
+    """Test superusers can query events by user and time range."""
+    now = timezone.now()
+    AuditEvent.objects.bulk_create([
+        AuditEvent(action=AuditEvent.LOGIN, user_id=1, created_at=now),
+        AuditEvent(action=AuditEvent.LOGIN, user_id=2, created_at=now),
+        AuditEvent(
+            action=AuditEvent.LOGIN, user_id=1,
+            created_at=now - timedelta(days=2),
+        ),
+    ])
+
+    res = superuser_client.get(EVENTS_URL, {
+        'user': 1, 'since': (now - timedelta(days=1)).isoformat(),
+    })
+
+    assert res.status_code == status.HTTP_200_OK
+    assert [e['user_id'] for e in res.data['results']] == [1]
+
+
+@pytest.mark.django_db
+def test_list_events_forbidden_for_admins():
+    """Test plain admins cannot read the audit trail."""
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='admin'))
+
+    res = client.get(EVENTS_URL)
+
+    assert res.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(
+    connection.vendor != 'postgresql', reason='Partitioning needs PostgreSQL.'
+)
+def test_partition_takes_over_rows_of_the_default_partition():
+    """Test events already in the default partition move to a new one."""
+    start = month_start(date.today(), 36)
+    event = AuditEvent.objects.create(
+        action=AuditEvent.LOGIN,
+        created_at=datetime(start.year, start.month, 2,
+                            tzinfo=dt_timezone.utc),
+    )
+
+    with connection.cursor() as cursor:
+        name, created = ensure_partition(cursor, start)
+        assert created
+        cursor.execute(f'SELECT id FROM {name}')
+        assert cursor.fetchall() == [(event.pk,)]
+        assert ensure_partition(cursor, start) == (name, False)
+    assert AuditEvent.objects.get(pk=event.pk).action == AuditEvent.LOGIN
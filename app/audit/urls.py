@@ -0,0 +1,12 @@
+"""
+URL mappings for the audit API.
+"""
+from django.urls import path
+
+from audit import views
+
+app_name = 'audit'
+
+urlpatterns = [
+    path('events/', views.AuditEventView.as_view(), name='event-list'),
+]
@@ -0,0 +1,50 @@
+"""
+Views for the audit API.
+"""
+from django.utils.dateparse import parse_datetime
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+from audit.models import AuditEvent
+from audit.serializers import AuditEventSerializer
+from user.authentication import CachedJWTAuthentication
+from user.permissions import IsSuperUser
+
+
+class AuditEventPagination(CursorPagination):
+    """Keyset pagination, newest events first."""
+    ordering = ('-created_at', '-id')
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+
+class AuditEventView(generics.ListAPIView):
+    """
+    List audit events for superusers.
+
+    Filters: `user`, `action`, `since` and `until` (ISO 8601). Filtering
+    on a time range lets PostgreSQL prune partitions.
+    """
+    serializer_class = AuditEventSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperUser]
+    pagination_class = AuditEventPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = AuditEvent.objects.all()
+        if params.get('user'):
+            if not params['user'].isdigit():
+                raise ValidationError({'user': 'Must be a user id.'})
+            queryset = queryset.filter(user_id=params['user'])
+        if params.get('action'):
+            queryset = queryset.filter(action=params['action'])
+        for param, lookup in [('since', 'gte'), ('until', 'lt')]:
+            if params.get(param):
+                value = parse_datetime(params[param])
+                if value is None:
+                    raise ValidationError({param: 'Must be an ISO 8601 time.'})
+                queryset = queryset.filter(**{f'created_at__{lookup}': value})
+        return queryset
@@ -0,0 +1,44 @@
+"""
+Project wide pytest fixtures.
+"""
+import pytest
+
+pytest_plugins = ['core.testing']
+
+
+@pytest.fixture(autouse=True)
+def inline_background_flushes(settings):
+    """Flush in-process write buffers and build filters inline."""
+    settings.USER_ACTIVITY_FLUSH_INTERVAL = 0
+    settings.AUDIT_FLUSH_INTERVAL = 0
+    settings.TOKEN_RECORDER_FLUSH_INTERVAL = 0
+    settings.USER_EMAIL_FILTER_BACKGROUND = False
+
+
+@pytest.fixture(autouse=True)
+def no_change_feed_lag(settings):
+    """Let the user change feed return rows changed just now."""
+    settings.USER_CHANGES_SAFETY_LAG = 0
+
+
+@pytest.fixture(autouse=True)
+def no_bus_listener(settings):
+    """Keep the invalidation bus from starting its listener thread."""
+    settings.INVALIDATION_BUS_LISTEN = False
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with empty caches."""
+    from django.core.cache import cache
+
+    from listings import matching
+    from user.cache import logout_cache, user_cache
+    from user.emails import email_filter
+
+    cache.clear()
+    user_cache.invalidate()
+    logout_cache.invalidate()
+    email_filter.reset()
+    matching.listings.reset()
+    matching.seekers.reset()
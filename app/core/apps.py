@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.models import CharField, Field
+        from django.db.models.functions import Lower
+
+        from core.lookups import Any
+
+        Field.register_lookup(Any)
+        CharField.register_lookup(Lower)
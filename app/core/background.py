@@ -0,0 +1,100 @@
+"""
+Periodic background threads and flushing of in-process write buffers.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicThread:
+    """
+    Call `tick` on a daemon thread every `interval_setting` seconds.
+
+    `start` launches the thread lazily so every forked worker owns its
+    own, and does nothing while the interval is 0.
+    """
+    interval_setting = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    @property
+    def interval(self):
+        return getattr(settings, self.interval_setting)
+
+    def start(self):
+        """Make sure the thread is running, True if this started it."""
+        if not self.interval:
+            return False
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return False
+        with self.lock:
+            if self.pid == os.getpid() and self.thread.is_alive():
+                return False
+            self.thread = threading.Thread(
+                target=self.run,
+                name=type(self).__name__,
+                daemon=True,
+            )
+            self.thread.start()
+            self.pid = os.getpid()
+            return True
+
+    def wake(self):
+        """Tick as soon as possible instead of at the next interval."""
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.tick_safely()
+
+    def tick_safely(self):
+        try:
+            self.tick()
+        except Exception:
+            logger.exception('%s failed', type(self).__name__)
+        finally:
+            if threading.current_thread() is self.thread:
+                connections.close_all()
+
+    def tick(self):
+        raise NotImplementedError
+
+
+class BackgroundFlusher(PeriodicThread):
+    """
+    Call `flush` on a daemon thread every `interval_setting` seconds, and
+    once more when the process exits.
+
+    Subclasses buffer writes, call `schedule` after each one and implement
+    `flush`. An interval of 0 flushes inline, which is what tests use.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.exit_registered = False
+
+    def schedule(self):
+        """Flush inline or make sure the flush thread is running."""
+        if not self.interval:
+            self.flush()
+        elif self.start() and not self.exit_registered:
+            atexit.register(self.tick_safely)
+            self.exit_registered = True
+
+    def tick(self):
+        self.flush()
+
+    def flush(self):
+        raise NotImplementedError
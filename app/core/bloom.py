@@ -0,0 +1,49 @@
+"""
+A plain Bloom filter of strings.
+"""
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and a tunable false positive
+    rate, in `bits` bits for `capacity` members.
+
+    The `hashes` bit indexes of a value come from one 128-bit BLAKE2b
+    digest by double hashing.
+    """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = max(round(self.bits / capacity * math.log(2)), 1)
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def indexes(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, value):
+        for index in self.indexes(value):
+            self.array[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(
+            self.array[index >> 3] & 1 << (index & 7)
+            for index in self.indexes(value)
+        )
+
+    def estimated_error_rate(self):
+        """False positive rate expected after `count` additions."""
+        return (
+            1 - math.exp(-self.hashes * self.count / self.bits)
+        ) ** self.hashes
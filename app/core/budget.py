@@ -0,0 +1,170 @@
+"""
+Declarative per-view query budgets.
+"""
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+Budget = namedtuple('Budget', ['queries', 'seconds'])
+
+lock = threading.Lock()
+overruns = Counter()
+# Per thread, like database connections
+local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more queries, or longer in the database, than allowed."""
+
+
+def query_budget(queries=None, seconds=None):
+    """
+    Allow a view at most `queries` queries and `seconds` of database time
+    per request.
+
+    Decorates a view class, a view or viewset method (one action) or a
+    view function such as the result of `as_view()`; the method's budget
+    wins over its class's.
+    """
+    budget = Budget(queries, seconds)
+
+    def decorator(view):
+        view.query_budget = budget
+        return view
+
+    return decorator
+
+
+@contextmanager
+def unbudgeted():
+    """
+    Leave the queries run inside out of every `QueryCounter`, for waits
+    whose number of polls depends on another request.
+    """
+    paused = getattr(local, 'paused', 0)
+    local.paused = paused + 1
+    try:
+        yield
+    finally:
+        local.paused = paused
+
+
+def budget_for(view, method):
+    """The budget of the view function a request resolved to, if any."""
+    cls = getattr(view, 'cls', None)
+    if cls is not None:
+        actions = getattr(view, 'actions', None) or {}
+        handler = getattr(
+            cls, actions.get(method.lower(), method.lower()), None
+        )
+        budget = getattr(handler, 'query_budget', None)
+        if budget is not None:
+            return budget
+        budget = getattr(cls, 'query_budget', None)
+        if budget is not None:
+            return budget
+    return getattr(view, 'query_budget', None)
+
+
+class QueryCounter:
+    """`execute_wrapper` counting queries and their time."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(local, 'paused', 0):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self):
+        """The most repeated statement and its count, N+1 suspects."""
+        if not self.queries:
+            return None, 0
+        return Counter(sql for sql, _ in self.queries).most_common(1)[0]
+
+
+def overrun(budget, counter):
+    """Describe how `counter` went over `budget`, None if it did not."""
+    problems = []
+    if budget.queries is not None and counter.count > budget.queries:
+        problems.append(f'{counter.count} queries (budget {budget.queries})')
+    if budget.seconds is not None and counter.seconds > budget.seconds:
+        problems.append(
+            f'{counter.seconds * 1000:.1f}ms in the database '
+            f'(budget {budget.seconds * 1000:.0f}ms)'
+        )
+    if not problems:
+        return None
+    sql, times = counter.repeated()
+    message = ', '.join(problems)
+    if times > 1:
+        message += f'; ran {times} times: {sql[:200]}'
+    return message
+
+
+class QueryBudgetMiddleware:
+    """
+    Check every request against its view's `query_budget`.
+
+    Overruns raise `QueryBudgetExceeded` when `QUERY_BUDGET_ENFORCE` is
+    set, as in DEBUG and tests, and are logged otherwise. Database time
+    depends on the machine, so overrunning only `seconds` raises just
+    with `QUERY_BUDGET_ENFORCE_SECONDS` too; latency targets are checked
+    by benchmarks such as `search_benchmark`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        match = request.resolver_match
+        budget = match and budget_for(match.func, request.method)
+        if not budget:
+            return response
+        message = overrun(budget, counter)
+        if message is None:
+            return response
+        route = f'{request.method} {match.route}'
+        with lock:
+            overruns[route] += 1
+        message = f'{route} exceeded its query budget: {message}'
+        if settings.QUERY_BUDGET_ENFORCE and (
+            settings.QUERY_BUDGET_ENFORCE_SECONDS or
+            budget.queries is not None and counter.count > budget.queries
+        ):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        return response
+
+
+def snapshot():
+    with lock:
+        return {'overruns': dict(overruns)}
+
+
+metrics.register('query_budget', snapshot)
@@ -0,0 +1,238 @@
+"""
+Cross-process cache invalidation over Postgres LISTEN/NOTIFY.
+"""
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'invalidation'
+SEQUENCE = 'core_invalidation_seq'
+HOSTNAME = socket.gethostname()
+
+
+def origin():
+    """Identify this process across every node."""
+    return f'{HOSTNAME}:{os.getpid()}'
+
+
+class InvalidationBus:
+    """
+    Publish `(topic, key)` invalidations to every worker on every node.
+
+    Subscribers are called in the publishing process right away, again
+    on commit when published in a transaction (other threads may have
+    cached the old rows meanwhile), and in every other process once the
+    listener thread receives the `NOTIFY`. A key of None means
+    "everything in this topic".
+
+    Messages carry a number from a Postgres sequence. Numbers that do not
+    arrive within `INVALIDATION_BUS_GAP_GRACE` seconds (a lost message, a
+    rolled back transaction or a listener reconnect) make every subscriber
+    drop everything, so a cache can never stay stale for good. The
+    sequence is also polled so a lost last message is noticed too.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(list)
+        self.thread = None
+        self.pid = None
+        self.last_seq = None
+        self.missing = {}
+        self.stats = {
+            'published': 0,
+            'received': 0,
+            'gaps': 0,
+            'flushes': 0,
+            'reconnects': 0,
+            'latency_ms_last': None,
+            'latency_ms_max': 0.0,
+            'latency_ms_total': 0.0,
+        }
+
+    def subscribe(self, topic, callback):
+        """Call `callback(key)` for every invalidation of `topic`."""
+        self.subscribers[topic].append(callback)
+
+    def publish(self, topic, key=None):
+        """Invalidate `key` of `topic` here now and everywhere on commit."""
+        self.apply(topic, key)
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self.apply(topic, key))
+        with self.lock:
+            self.stats['published'] += 1
+        if connection.vendor != 'postgresql':
+            return
+        self.ensure_listening()
+        # NOTIFY is transactional, other processes hear of it on commit
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, json_build_object('
+                "'t', %s::text, 'k', %s::text, 's', nextval(%s), "
+                "'ts', extract(epoch from clock_timestamp()), 'o', %s::text"
+                ')::text)',
+                [
+                    CHANNEL, topic, None if key is None else str(key),
+                    SEQUENCE, origin(),
+                ],
+            )
+
+    def apply(self, topic, key):
+        for callback in self.subscribers.get(topic, ()):
+            try:
+                callback(key)
+            except Exception:
+                logger.exception('Invalidation of %s %s failed', topic, key)
+
+    def flush_all(self):
+        """Drop everything from every subscribed cache."""
+        with self.lock:
+            self.stats['flushes'] += 1
+        for topic in list(self.subscribers):
+            self.apply(topic, None)
+
+    def ensure_listening(self):
+        """Start this process's listener thread if it is not running."""
+        if (
+            connection.vendor != 'postgresql' or
+            not settings.INVALIDATION_BUS_LISTEN
+        ):
+            return
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.pid != os.getpid() or not self.thread.is_alive():
+                self.last_seq = None
+                self.missing = {}
+                self.thread = threading.Thread(
+                    target=self.listen, name='InvalidationBus', daemon=True
+                )
+                self.thread.start()
+                self.pid = os.getpid()
+
+    def listen(self):
+        backoff = 1
+        while True:
+            try:
+                self.listen_once()
+            except Exception:
+                logger.exception('Invalidation listener failed')
+            with self.lock:
+                self.stats['reconnects'] += 1
+            # Anything may have been missed while disconnected
+            self.last_seq = None
+            self.flush_all()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def listen_once(self):
+        wrapper = connections['default']
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            next_check = time.monotonic()
+            while True:
+                if select.select([conn], [], [], 1.0)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        self.receive(conn.notifies.pop(0).payload)
+                if time.monotonic() >= next_check:
+                    with conn.cursor() as cursor:
+                        cursor.execute(f'SELECT last_value FROM {SEQUENCE}')
+                        self.check(cursor.fetchone()[0])
+                    next_check = (
+                        time.monotonic() +
+                        settings.INVALIDATION_BUS_RESYNC_INTERVAL
+                    )
+        finally:
+            conn.close()
+
+    def receive(self, payload):
+        """Apply one message from another process (or this one)."""
+        message = json.loads(payload)
+        latency = max(1000 * (time.time() - message['ts']), 0.0)
+        with self.lock:
+            stats = self.stats
+            stats['received'] += 1
+            stats['latency_ms_last'] = round(latency, 3)
+            stats['latency_ms_max'] = max(stats['latency_ms_max'], latency)
+            stats['latency_ms_total'] += latency
+        self.sequenced(message['s'])
+        if message['o'] != origin():
+            key = message['k']
+            if key is not None and key.isdigit():
+                key = int(key)
+            self.apply(message['t'], key)
+
+    def sequenced(self, seq):
+        """Track message numbers, marking the ones skipped as missing."""
+        self.missing.pop(seq, None)
+        if self.last_seq is None:
+            self.last_seq = seq
+        elif seq > self.last_seq:
+            self.check(seq - 1)
+            self.last_seq = seq
+
+    def check(self, last_value):
+        """Flush everything once a missing number is overdue."""
+        now = time.monotonic()
+        if self.last_seq is None:
+            self.last_seq = last_value
+        skipped = last_value - self.last_seq
+        if skipped <= 1000:
+            for seq in range(self.last_seq + 1, last_value + 1):
+                self.missing.setdefault(seq, now)
+        self.last_seq = max(self.last_seq, last_value)
+        grace = settings.INVALIDATION_BUS_GAP_GRACE
+        if skipped > 1000 or self.missing and (
+            min(self.missing.values()) + grace <= now or
+            len(self.missing) > 1000
+        ):
+            with self.lock:
+                self.stats['gaps'] += 1
+            self.missing = {}
+            self.flush_all()
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        total = stats.pop('latency_ms_total')
+        stats['latency_ms_avg'] = (
+            round(total / stats['received'], 3)
+            if stats['received'] else None
+        )
+        stats['latency_ms_max'] = round(stats['latency_ms_max'], 3)
+        stats['missing'] = len(self.missing)
+        stats['listening'] = bool(
+            self.thread and self.pid == os.getpid() and self.thread.is_alive()
+        )
+        return stats
+
+
+bus = InvalidationBus()
+metrics.register('invalidation_bus', bus.snapshot)
+
+
+class InvalidationBusMiddleware:
+    """Make sure every worker process listens for invalidations."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        bus.ensure_listening()
+        return self.get_response(request)
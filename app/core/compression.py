@@ -0,0 +1,215 @@
+"""
+Response compression negotiated on `Accept-Encoding`.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/x-ndjson',
+    'application/vnd.oai.openapi',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+re_accept_encoding = _lazy_re_compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+class _Brotli:
+    """Give brotli the `compress`/`flush` interface of zlib."""
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+def compressor(encoding, level):
+    """Return a streaming compressor for `encoding` at `level`."""
+    if encoding == 'gzip':
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    if encoding == 'br':
+        return _Brotli(level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError(f'Unsupported encoding "{encoding}".')
+
+
+def available_encodings():
+    """Encodings usable in this process, most preferred first."""
+    installed = {'gzip': True, 'br': brotli, 'zstd': zstandard}
+    return [
+        encoding for encoding in settings.COMPRESSION_PREFERENCE
+        if installed.get(encoding)
+    ]
+
+
+def negotiate(accept_encoding):
+    """Pick the best available encoding for an `Accept-Encoding` value."""
+    weights = {}
+    for name, q in re_accept_encoding.findall(accept_encoding or ''):
+        try:
+            weights[name.lower()] = float(q) if q else 1.0
+        except ValueError:
+            continue
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding, level):
+    compressobj = compressor(encoding, level)
+    return compressobj.compress(data) + compressobj.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    compressobj = compressor(encoding, level)
+    for chunk in chunks:
+        data = compressobj.compress(chunk)
+        if data:
+            yield data
+    yield compressobj.flush()
+
+
+def route_level(path, encoding):
+    """Compression level for `path`, the longest matching prefix wins."""
+    level = settings.COMPRESSION_LEVELS[encoding]
+    matched = ''
+    for prefix, levels in settings.COMPRESSION_ROUTE_LEVELS.items():
+        if (
+            path.startswith(prefix) and len(prefix) > len(matched) and
+            encoding in levels
+        ):
+            matched, level = prefix, levels[encoding]
+    return level
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by path, encoding and content."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, path, content, encoding, level):
+        key = (
+            path, encoding, level,
+            hashlib.blake2b(content, digest_size=16).digest(),
+        )
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        compressed = compress(content, encoding, level)
+        with self.lock:
+            self.entries[key] = compressed
+            while len(self.entries) > settings.COMPRESSION_CACHE_SIZE:
+                self.entries.popitem(last=False)
+        return compressed
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+cache = CompressedCache()
+metrics.register('compression_cache', cache.snapshot)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with zstd, brotli or gzip.
+
+    Bodies smaller than `COMPRESSION_MIN_SIZE` are left alone, levels come
+    from `COMPRESSION_LEVELS` overridden per path prefix by
+    `COMPRESSION_ROUTE_LEVELS`, streaming responses are compressed chunk
+    by chunk and routes in `COMPRESSION_CACHE_ROUTES` reuse compressed
+    bodies while their content is unchanged.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if (
+            response.has_header('Content-Encoding') or
+            not content_type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+        if (
+            not response.streaming and
+            len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+        level = route_level(request.path, encoding)
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level
+            )
+            del response['Content-Length']
+        else:
+            if request.path.startswith(
+                tuple(settings.COMPRESSION_CACHE_ROUTES)
+            ):
+                compressed = cache.get_or_compress(
+                    request.path, response.content, encoding, level
+                )
+            else:
+                compressed = compress(response.content, encoding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong ETag no longer applies.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,212 @@
+"""
+`Idempotency-Key` support for unsafe API views.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from core import metrics
+from core.budget import unbudgeted
+from core.models import IdempotencyKey
+
+# Response headers stored along with the body and replayed
+REPLAYED_HEADERS = ('Location',)
+
+lock = threading.Lock()
+stats = {'executed': 0, 'replayed': 0, 'waited': 0, 'conflicts': 0}
+
+
+def count(stat):
+    with lock:
+        stats[stat] += 1
+
+
+def snapshot():
+    with lock:
+        return dict(stats)
+
+
+def fingerprint(request):
+    """Hash of the method, path and parsed body, files included."""
+    digest = hashlib.sha256(f'{request.method} {request.path}'.encode())
+    data = request.data
+    # Parsed rather than raw, as multipart boundaries change on retries
+    items = sorted(data.lists()) if hasattr(data, 'lists') else [
+        (None, [data])
+    ]
+    for key, values in items:
+        for value in values:
+            if isinstance(value, UploadedFile):
+                digest.update(json.dumps([key, value.name]).encode())
+                for chunk in value.chunks():
+                    digest.update(chunk)
+                value.seek(0)
+            else:
+                digest.update(json.dumps(
+                    [key, value], sort_keys=True, default=str
+                ).encode())
+    return digest.hexdigest()
+
+
+def claim(owner, scope, key, request_fingerprint):
+    """
+    Insert the in-flight row for a key, or return the existing one.
+
+    Returns `(record, claimed)`. Expired rows and rows left in flight for
+    `IDEMPOTENCY_LOCK_TIMEOUT` seconds, by a crashed worker, are taken over.
+    """
+    now = timezone.now()
+    lookup = {'owner': owner, 'scope': scope, 'key': key}
+    IdempotencyKey.objects.filter(**lookup, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                **lookup,
+                fingerprint=request_fingerprint,
+                locked_at=now,
+                expires_at=now + timedelta(
+                    seconds=settings.IDEMPOTENCY_KEY_TTL
+                ),
+            ), True
+    except IntegrityError:
+        pass
+    record = IdempotencyKey.objects.filter(**lookup).first()
+    if record is None:
+        # Released by a failed first attempt in the meantime
+        return claim(owner, scope, key, request_fingerprint)
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    if (
+        record.status is None and
+        record.fingerprint == request_fingerprint and
+        record.locked_at <= stale and
+        IdempotencyKey.objects.filter(
+            pk=record.pk, status__isnull=True, locked_at=record.locked_at
+        ).update(locked_at=now)
+    ):
+        return record, True
+    return record, False
+
+
+def wait(record):
+    """
+    Poll an in-flight row until it completes, is released or times out.
+
+    The polls do not count against the view's query budget, as their
+    number depends on how long the first request takes.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+    with unbudgeted():
+        while record is not None and record.status is None:
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+            record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def replay(record):
+    count('replayed')
+    response = Response(record.data, status=record.status)
+    for name, value in record.headers.items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """
+    Run a view method once per `Idempotency-Key`, owner and `scope`.
+
+    The first response is stored for `IDEMPOTENCY_KEY_TTL` seconds and
+    replayed for retries without running the view again. Concurrent
+    retries wait up to `IDEMPOTENCY_WAIT` seconds for the first one to
+    finish. Reusing a key for a different request is a 422, and a 5xx
+    response releases the key so the request can be retried for real.
+    """
+
+    def decorator(method):
+
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(settings.IDEMPOTENCY_HEADER)
+            if not key:
+                return method(view, request, *args, **kwargs)
+            if len(key) > 255:
+                return Response(
+                    {'detail': f'{settings.IDEMPOTENCY_HEADER} is too long.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            owner = (
+                str(request.user.pk) if request.user.is_authenticated else ''
+            )
+            request_fingerprint = fingerprint(request)
+
+            while True:
+                record, claimed = claim(
+                    owner, scope, key, request_fingerprint
+                )
+                if claimed:
+                    break
+                if record.fingerprint != request_fingerprint:
+                    count('conflicts')
+                    return Response(
+                        {'detail': (
+                            f'{settings.IDEMPOTENCY_HEADER} was already used '
+                            'for a different request.'
+                        )},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if record.status is None:
+                    count('waited')
+                    record = wait(record)
+                    if record is None:
+                        continue
+                if record.status is None:
+                    response = Response(
+                        {'detail': (
+                            'A request with this '
+                            f'{settings.IDEMPOTENCY_HEADER} is in progress.'
+                        )},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                    response['Retry-After'] = '1'
+                    return response
+                return replay(record)
+
+            try:
+                response = method(view, request, *args, **kwargs)
+            except Exception as exc:
+                try:
+                    response = view.handle_exception(exc)
+                except Exception:
+                    record.delete()
+                    raise
+            count('executed')
+            if response.status_code >= 500:
+                record.delete()
+                return response
+            record.status = response.status_code
+            record.data = response.data
+            record.headers = {
+                name: response[name]
+                for name in REPLAYED_HEADERS if response.has_header(name)
+            }
+            record.save(update_fields=['status', 'data', 'headers'])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+metrics.register('idempotency', snapshot)
@@ -0,0 +1,30 @@
+"""
+Custom lookups shared by the apps.
+"""
+from django.core.exceptions import EmptyResultSet
+from django.db.models import lookups
+
+
+class Any(lookups.In):
+    """
+    `field__any=[...]`, compiled to `field = ANY(%s)` on PostgreSQL.
+
+    The values travel as one array parameter, so the SQL text is the same
+    whatever the number of values and Postgres can reuse the plan. Other
+    databases fall back to `IN (...)`.
+    """
+    lookup_name = 'any'
+
+    def as_postgresql(self, compiler, connection):
+        if not self.rhs_is_direct_value():
+            return super().as_sql(compiler, connection)
+        values = [value for value in self.rhs if value is not None]
+        if not values:
+            raise EmptyResultSet
+        field = self.lhs.output_field
+        lhs, params = self.process_lhs(compiler, connection)
+        values = [
+            field.get_db_prep_value(value, connection, prepared=True)
+            for value in values
+        ]
+        return f'{lhs} = ANY(%s)', (*params, values)
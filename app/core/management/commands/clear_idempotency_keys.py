@@ -0,0 +1,21 @@
+"""
+Django command to delete expired idempotency keys.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Django command to purge stored idempotent responses."""
+    help = 'Delete idempotency keys past their IDEMPOTENCY_KEY_TTL.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        deleted, _ = IdempotencyKey.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} idempotency keys.')
+        )
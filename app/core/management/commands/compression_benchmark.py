@@ -0,0 +1,66 @@
+"""
+Django command to compare compression levels on a real payload.
+"""
+import time
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import compression
+
+LEVELS = {
+    'gzip': [1, 3, 6, 9],
+    'br': [1, 4, 6, 9, 11],
+    'zstd': [1, 3, 6, 12, 19],
+}
+
+
+class Command(BaseCommand):
+    """Django command to report ratio and CPU time per encoding level."""
+    help = 'Benchmark response compression on a URL or file payload.'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--url', help='URL to fetch the payload from.')
+        source.add_argument('--file', help='File holding the payload.')
+        parser.add_argument(
+            '--header', action='append', default=[],
+            help='Request header for --url, e.g. "Authorization: Bearer x".',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        payload = self.load(options)
+        if not payload:
+            raise CommandError('Payload is empty.')
+
+        self.stdout.write(f'Payload: {len(payload)} bytes')
+        self.stdout.write(
+            f'{"encoding":<8} {"level":>5} {"bytes":>10} {"ratio":>7} '
+            f'{"ms":>9} {"MB/s":>8}'
+        )
+        for encoding in compression.available_encodings():
+            for level in LEVELS[encoding]:
+                best = None
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    size = len(compression.compress(payload, encoding, level))
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                self.stdout.write(
+                    f'{encoding:<8} {level:>5} {size:>10} '
+                    f'{len(payload) / size:>7.2f} {best * 1000:>9.3f} '
+                    f'{len(payload) / best / 1e6:>8.1f}'
+                )
+
+    def load(self, options):
+        if options['file']:
+            with open(options['file'], 'rb') as f:
+                return f.read()
+        request = urllib.request.Request(options['url'])
+        for header in options['header']:
+            name, _, value = header.partition(':')
+            request.add_header(name.strip(), value.strip())
+        with urllib.request.urlopen(request) as response:
+            return response.read()
@@ -0,0 +1,193 @@
+"""
+Per-worker memory diagnostics.
+"""
+import logging
+import os
+import resource
+import signal
+import threading
+import tracemalloc
+
+from django.conf import settings
+from django.utils import timezone
+
+from core import metrics
+from core.background import PeriodicThread
+
+logger = logging.getLogger(__name__)
+
+try:
+    import uwsgi
+except ImportError:  # pragma: no cover - only importable under uwsgi
+    uwsgi = None
+
+IGNORED_FRAMES = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def rss_bytes():
+    """Current resident set size; the peak where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_stat(stat):
+    data = {
+        'size': stat.size,
+        'count': stat.count,
+        'traceback': stat.traceback.format(),
+    }
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        data['size_diff'] = stat.size_diff
+        data['count_diff'] = stat.count_diff
+    return data
+
+
+class Snapshots:
+    """The last `MEMORY_SNAPSHOTS_KEPT` tracemalloc snapshots of a worker."""
+
+    def __init__(self):
+        # Re-entrant as the signal handler may interrupt a locked section
+        self.lock = threading.RLock()
+        self.snapshots = []
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_TRACEMALLOC_FRAMES)
+
+    def stop(self):
+        tracemalloc.stop()
+        with self.lock:
+            self.snapshots = []
+
+    def take(self):
+        """Take a snapshot, starting tracing first if needed."""
+        self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_FRAMES)
+        with self.lock:
+            self.snapshots.append((timezone.now(), snapshot))
+            del self.snapshots[:-settings.MEMORY_SNAPSHOTS_KEPT]
+        if settings.MEMORY_SNAPSHOT_DIR:
+            os.makedirs(settings.MEMORY_SNAPSHOT_DIR, exist_ok=True)
+            snapshot.dump(os.path.join(
+                settings.MEMORY_SNAPSHOT_DIR,
+                f'{os.getpid()}-{timezone.now():%Y%m%dT%H%M%S}.tracemalloc',
+            ))
+        return snapshot
+
+    def top(self, limit=10):
+        """Largest allocations of the latest snapshot, by traceback."""
+        with self.lock:
+            if not self.snapshots:
+                return []
+            snapshot = self.snapshots[-1][1]
+        return [
+            format_stat(stat)
+            for stat in snapshot.statistics('traceback')[:limit]
+        ]
+
+    def diff(self, limit=10):
+        """Growth between the last two snapshots, grouped by traceback."""
+        with self.lock:
+            if len(self.snapshots) < 2:
+                return []
+            (_, old), (_, new) = self.snapshots[-2:]
+        return [
+            format_stat(stat)
+            for stat in new.compare_to(old, 'traceback')[:limit]
+        ]
+
+    def snapshot(self):
+        with self.lock:
+            taken = [taken_at.isoformat() for taken_at, _ in self.snapshots]
+        return {
+            'rss_bytes': rss_bytes(),
+            'tracing': self.tracing,
+            'traced_bytes': (
+                tracemalloc.get_traced_memory()[0] if self.tracing else None
+            ),
+            'snapshots': taken,
+        }
+
+
+snapshots = Snapshots()
+metrics.register('memory', snapshots.snapshot)
+
+
+class RSSWatchdog(PeriodicThread):
+    """
+    Check the worker's RSS every `MEMORY_WATCHDOG_INTERVAL` seconds.
+
+    Over `MEMORY_RSS_LIMIT_MB` the top allocators are logged (when
+    tracing) and, under uwsgi, the worker is sent SIGHUP so it finishes
+    its current request and is replaced by the master. Unlike the write
+    buffers it has nothing to do at exit, and an interval of 0 turns it
+    off rather than checking on every request.
+    """
+    interval_setting = 'MEMORY_WATCHDOG_INTERVAL'
+
+    def __init__(self):
+        super().__init__()
+        self.restarting = False
+
+    def tick(self):
+        rss = rss_bytes()
+        limit = settings.MEMORY_RSS_LIMIT_MB * 1024 * 1024
+        if self.restarting or not limit or rss < limit:
+            return
+        logger.warning(
+            'Worker %d RSS %.1f MiB is over the %d MiB limit',
+            os.getpid(), rss / 2 ** 20, settings.MEMORY_RSS_LIMIT_MB,
+        )
+        if snapshots.tracing:
+            snapshots.take()
+            for stat in snapshots.top(settings.MEMORY_WATCHDOG_TOP):
+                logger.warning(
+                    'Top allocation %d bytes in %d blocks:\n%s',
+                    stat['size'], stat['count'],
+                    '\n'.join(stat['traceback']),
+                )
+        if uwsgi is not None:
+            self.restarting = True
+            os.kill(os.getpid(), signal.SIGHUP)
+
+
+watchdog = RSSWatchdog()
+
+
+class MemoryWatchdogMiddleware:
+    """Make sure every worker process runs its RSS watchdog."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.MEMORY_RSS_LIMIT_MB:
+            watchdog.start()
+        return response
+
+
+def install():
+    """
+    Snapshot on `MEMORY_SNAPSHOT_SIGNAL` and trace from startup when
+    `MEMORY_TRACE_ON_START` is set. Called once by the WSGI entrypoint.
+    """
+    if settings.MEMORY_TRACE_ON_START:
+        snapshots.start()
+    if settings.MEMORY_SNAPSHOT_SIGNAL:
+        signal.signal(
+            getattr(signal, settings.MEMORY_SNAPSHOT_SIGNAL),
+            lambda signum, frame: snapshots.take(),
+        )
@@ -0,0 +1,14 @@
+"""
+Registry of in-process metrics exposed to superusers.
+"""
+registry = {}
+
+
+def register(name, collect):
+    """Register a callable returning a JSON serializable snapshot."""
+    registry[name] = collect
+
+
+def snapshot():
+    """Collect every registered metric for this worker process."""
+    return {name: collect() for name, collect in sorted(registry.items())}
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE SEQUENCE IF NOT EXISTS core_invalidation_seq'
+        )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS core_invalidation_seq')
+
+
+class Migration(migrations.Migration):
+    """Numbers invalidation bus messages, see `core.bus`."""
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
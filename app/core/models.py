@@ -0,0 +1,39 @@
+"""
+Database models shared by every app.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyKey(models.Model):
+    """
+    The first response to a request sent with an `Idempotency-Key`.
+
+    A row without a status is a request still in flight.
+    """
+    owner = models.CharField(max_length=64)
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.PositiveSmallIntegerField(null=True, blank=True)
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    headers = models.JSONField(default=dict)
+    locked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'scope', 'key'],
+                name='idempotency_key_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['expires_at'], name='idempotency_expires_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.scope} {self.key}'
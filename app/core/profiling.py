@@ -0,0 +1,193 @@
+"""
+Opt-in per-request profiling.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from user.authentication import CachedJWTAuthentication
+from user.permissions import SUPERUSER, has_role
+
+logger = logging.getLogger(__name__)
+
+re_unsafe = re.compile(r'[^A-Za-z0-9_.-]+')
+re_capture = re.compile(r'^[A-Za-z0-9_.-]+\.(json|pstats|folded)$')
+
+
+class Sampler:
+    """
+    Sample the stack of one thread every `interval` seconds.
+
+    The counts are written in the folded format read by `flamegraph.pl`
+    and speedscope, one `outer;inner;leaf count` line per stack.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} '
+                    f'({os.path.basename(code.co_filename)}:{frame.f_lineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+def requested_by_superuser(request):
+    """Whether the request carries the profile header of a superuser."""
+    if request.headers.get(settings.PROFILING_HEADER) != '1':
+        return False
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        # API clients authenticate with a JWT inside the view, too late
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        user = result[0] if result else None
+    return has_role(user, SUPERUSER)
+
+
+def save_capture(request, response, profiler, sampler, duration):
+    """Write the pstats, folded stacks and metadata of one capture."""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    match = request.resolver_match
+    route = match.route if match else request.path
+    now = timezone.now()
+    name = re_unsafe.sub('_', '{}-{}-{}-{}'.format(
+        now.strftime('%Y%m%dT%H%M%S%f'), request.method, route,
+        os.getpid(),
+    )).strip('_')
+    base = os.path.join(settings.PROFILING_DIR, name)
+    profiler.dump_stats(base + '.pstats')
+    with open(base + '.folded', 'w') as f:
+        f.write(sampler.folded())
+    with open(base + '.json', 'w') as f:
+        json.dump({
+            'name': name,
+            'created_at': now.isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'status': response.status_code,
+            'duration_ms': round(1000 * duration, 3),
+        }, f)
+    rotate()
+    return name
+
+
+def rotate():
+    """Keep only the newest `PROFILING_MAX_CAPTURES` captures."""
+    captures = sorted(
+        name for name in os.listdir(settings.PROFILING_DIR)
+        if name.endswith('.json')
+    )
+    for name in captures[:-settings.PROFILING_MAX_CAPTURES or None]:
+        base = os.path.join(settings.PROFILING_DIR, name[:-len('.json')])
+        for ext in ('.json', '.pstats', '.folded'):
+            try:
+                os.unlink(base + ext)
+            except FileNotFoundError:
+                pass
+
+
+def list_captures():
+    """Metadata of the stored captures, newest first."""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    captures = []
+    for name in sorted(os.listdir(settings.PROFILING_DIR), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.PROFILING_DIR, name)) as f:
+                captures.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return captures
+
+
+def capture_path(filename):
+    """Path of a stored capture file, None for anything else."""
+    if not re_capture.match(filename):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, filename)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests sent by superusers with `X-Profile: 1`, plus a
+    `PROFILING_SAMPLE_RATE` fraction of all requests.
+
+    Each capture stores cProfile stats and sampled folded stacks for a
+    flame graph under `PROFILING_DIR`, listed on the admin profiles page.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = requested_by_superuser(request)
+        if not requested and not (
+            settings.PROFILING_SAMPLE_RATE and
+            random.random() < settings.PROFILING_SAMPLE_RATE
+        ):
+            return self.get_response(request)
+
+        sampler = Sampler(
+            threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL
+        )
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            sampler.stop()
+        duration = time.perf_counter() - started
+
+        try:
+            name = save_capture(request, response, profiler, sampler,
+                                duration)
+        except OSError:
+            logger.exception('Could not store profile')
+            return response
+        if requested:
+            response['X-Profile-Id'] = name
+        return response
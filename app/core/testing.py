@@ -0,0 +1,71 @@
+"""
+Pytest plugin enforcing query budgets, see `core.budget`.
+
+Enabled from the project `conftest.py` with
+`pytest_plugins = ['core.testing']`.
+"""
+import pytest
+from django.db import connection
+
+from core.budget import QueryCounter
+
+DEFAULT_SCALES = (1, 5, 20)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(queries): fail when the test runs more queries',
+    )
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    """
+    Raise on view query count overruns instead of logging them; database
+    time depends on the machine running the tests and is not enforced.
+    """
+    settings.QUERY_BUDGET_ENFORCE = True
+    settings.QUERY_BUDGET_ENFORCE_SECONDS = False
+
+
+@pytest.fixture(autouse=True)
+def query_budget_marker(request):
+    """Count the queries of tests marked `query_budget(n)`."""
+    marker = request.node.get_closest_marker('query_budget')
+    if marker is None:
+        yield
+        return
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield
+    assert counter.count <= marker.args[0], (
+        f'{counter.count} queries, budget {marker.args[0]}'
+    )
+
+
+@pytest.fixture
+def query_scaling():
+    """
+    Measure the queries of `send(prepare())` after `grow(n)` added `n`
+    more rows, at each of `scales` total rows.
+
+    Returns the counts by scale. `send` runs once before measuring so
+    per-process caches are warm and do not skew the first count.
+    """
+
+    def measure(grow, send, prepare=lambda: None, scales=DEFAULT_SCALES):
+        send(prepare())
+        counts = {}
+        grown = 0
+        for scale in scales:
+            grow(scale - grown)
+            grown = scale
+            args = prepare()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                send(args)
+            counts[scale] = counter.count
+        return counts
+
+    return measure
@@ -0,0 +1,26 @@
+"""
+Tests for the Bloom filter.
+"""
+from core.bloom import BloomFilter
+
+
+def test_sizing_follows_capacity_and_error_rate():
+    """Test bits and hashes follow the usual optimal sizing."""
+    bloom = BloomFilter(1000, 0.01)
+
+    assert bloom.bits == 9586
+    assert bloom.hashes == 7
+
+
+def test_no_false_negatives_and_bounded_false_positives():
+    """Test members are always found and outsiders rarely are."""
+    bloom = BloomFilter(2000, 0.01)
+    for i in range(2000):
+        bloom.add(f'user{i}@example.com')
+
+    assert all(f'user{i}@example.com' in bloom for i in range(2000))
+    false_positives = sum(
+        f'other{i}@example.com' in bloom for i in range(10000)
+    )
+    assert false_positives / 10000 < 0.02
+    assert 0.005 < bloom.estimated_error_rate() < 0.015
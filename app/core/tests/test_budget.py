@@ -0,0 +1,117 @@
+"""
+Tests for query budgets.
+"""
+import logging
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework import viewsets
+from rest_framework.views import APIView
+
+from core import budget
+from core.budget import (
+    Budget,
+    QueryBudgetExceeded,
+    QueryBudgetMiddleware,
+    budget_for,
+    query_budget,
+)
+
+User = get_user_model()
+
+
+@query_budget(queries=1)
+def view(request):
+    return HttpResponse()
+
+
+def middleware(queries):
+    """Middleware around a view running `queries` identical queries."""
+
+    def get_response(request):
+        request.resolver_match = SimpleNamespace(
+            func=view, route='budgeted/'
+        )
+        for _ in range(queries):
+            list(User.objects.filter(pk=1))
+        return HttpResponse()
+
+    return QueryBudgetMiddleware(get_response)
+
+
+def test_budget_for_prefers_the_method():
+    """Test method budgets override class budgets and fall back to them."""
+
+    @query_budget(queries=5)
+    class Users(viewsets.ViewSet):
+        def list(self, request):
+            pass
+
+        @query_budget(queries=2)
+        def create(self, request):
+            pass
+
+    @query_budget(queries=3)
+    class Plain(APIView):
+        def get(self, request):
+            pass
+
+    users = Users.as_view({'get': 'list', 'post': 'create'})
+    assert budget_for(users, 'GET') == Budget(5, None)
+    assert budget_for(users, 'POST') == Budget(2, None)
+    assert budget_for(Plain.as_view(), 'GET') == Budget(3, None)
+    assert budget_for(view, 'GET') == Budget(1, None)
+    assert budget_for(APIView.as_view(), 'GET') is None
+
+
+@pytest.mark.django_db
+def test_enforced_overrun_raises():
+    """Test an overrun raises and names the repeated query."""
+    with pytest.raises(QueryBudgetExceeded) as e:
+        middleware(3)(RequestFactory().get('/budgeted/'))
+
+    assert 'GET budgeted/' in str(e.value)
+    assert '3 queries (budget 1)' in str(e.value)
+    assert 'ran 3 times' in str(e.value)
+
+
+@pytest.mark.django_db
+def test_overrun_is_logged_when_not_enforced(settings, caplog):
+    """Test overruns only log and count outside of DEBUG and tests."""
+    settings.QUERY_BUDGET_ENFORCE = False
+    before = budget.snapshot()['overruns'].get('GET budgeted/', 0)
+
+    with caplog.at_level(logging.WARNING, logger='core.budget'):
+        res = middleware(2)(RequestFactory().get('/budgeted/'))
+        middleware(1)(RequestFactory().get('/budgeted/'))
+
+    assert res.status_code == 200
+    assert len(caplog.records) == 1
+    assert '2 queries (budget 1)' in caplog.records[0].getMessage()
+    assert budget.snapshot()['overruns']['GET budgeted/'] == before + 1
+
+
+@pytest.mark.django_db
+def test_database_time_overrun_only_logs(settings, caplog, monkeypatch):
+    """Test seconds budgets are not enforced unless asked to."""
+    monkeypatch.setattr(view, 'query_budget', Budget(1, 0.0))
+
+    with caplog.at_level(logging.WARNING, logger='core.budget'):
+        res = middleware(1)(RequestFactory().get('/budgeted/'))
+
+    assert res.status_code == 200
+    assert 'in the database' in caplog.records[0].getMessage()
+    settings.QUERY_BUDGET_ENFORCE_SECONDS = True
+    with pytest.raises(QueryBudgetExceeded):
+        middleware(1)(RequestFactory().get('/budgeted/'))
+
+
+@pytest.mark.django_db
+@pytest.mark.query_budget(2)
+def test_query_budget_marker():
+    """Test the marker lets a test run up to its budget."""
+    list(User.objects.all())
+    list(User.objects.all())
@@ -0,0 +1,106 @@
+"""
+Tests for the cache invalidation bus.
+"""
+import json
+import time
+
+import pytest
+from django.core.cache import cache
+
+from core.bus import InvalidationBus, origin
+from user.permissions import user_version_key
+from user.user_factory import UserFactory
+
+
+@pytest.fixture
+def bus(settings):
+    settings.INVALIDATION_BUS_GAP_GRACE = 60
+    bus = InvalidationBus()
+    bus.calls = []
+    bus.subscribe('user', lambda key: bus.calls.append(('user', key)))
+    return bus
+
+
+def message(seq, topic='user', key='1', sender='other:1', age=0.0):
+    return json.dumps({
+        't': topic, 'k': key, 's': seq, 'ts': time.time() - age, 'o': sender,
+    })
+
+
+def test_publish_applies_locally(bus, db):
+    """Test publishing invalidates this process's caches right away."""
+    bus.publish('user', 7)
+    bus.publish('other', 8)
+
+    assert bus.calls == [('user', 7)]
+    assert bus.snapshot()['published'] == 2
+
+
+def test_publish_applies_again_on_commit(
+    bus, db, django_capture_on_commit_callbacks
+):
+    """Test caches refilled before the commit are invalidated again."""
+    with django_capture_on_commit_callbacks(execute=True):
+        bus.publish('user', 7)
+        assert bus.calls == [('user', 7)]
+
+    assert bus.calls == [('user', 7), ('user', 7)]
+
+
+def test_receive_applies_messages_from_other_processes(bus):
+    """Test received messages reach subscribers, own ones are skipped."""
+    bus.receive(message(1, key='5', age=0.05))
+    bus.receive(message(2, key=None))
+    bus.receive(message(3, sender=origin()))
+
+    assert bus.calls == [('user', 5), ('user', None)]
+    stats = bus.snapshot()
+    assert stats['received'] == 3
+    assert stats['latency_ms_max'] >= 50
+
+
+def test_late_message_fills_gap(bus):
+    """Test out of order messages within the grace period are fine."""
+    bus.receive(message(1))
+    bus.receive(message(3))
+    assert bus.snapshot()['missing'] == 1
+
+    bus.receive(message(2))
+
+    assert bus.snapshot()['missing'] == 0
+    assert bus.snapshot()['flushes'] == 0
+
+
+def test_overdue_gap_flushes_everything(bus, settings):
+    """Test a lost message drops everything from the caches."""
+    bus.receive(message(1))
+    bus.receive(message(3))
+    settings.INVALIDATION_BUS_GAP_GRACE = 0
+
+    bus.check(3)
+
+    assert bus.calls[-1] == ('user', None)
+    assert bus.snapshot()['gaps'] == 1
+
+
+def test_lost_last_message_is_noticed(bus, settings):
+    """Test polling the sequence catches a lost trailing message."""
+    settings.INVALIDATION_BUS_GAP_GRACE = 0
+    bus.receive(message(1))
+
+    bus.check(2)
+
+    assert bus.calls[-1] == ('user', None)
+
+
+def test_remote_user_change_invalidates_access(db, monkeypatch):
+    """Test the permission cache listens to the bus."""
+    from core.bus import bus
+
+    monkeypatch.setattr(bus, 'last_seq', None)
+    user = UserFactory(user_type='admin')
+    version = cache.get(user_version_key(user.pk), 0)
+
+    bus.receive(message(10 ** 6, key=str(user.pk)))
+
+    assert cache.get(user_version_key(user.pk)) == version + 1
@@ -0,0 +1,100 @@
+"""
+Tests for the response compression middleware.
+"""
+import gzip
+import json
+
+import pytest
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+
+from core.compression import CompressionMiddleware, cache, negotiate
+
+PAYLOAD = json.dumps([{'email': f'user{i}@example.com'} for i in range(200)])
+
+
+def run(response, accept_encoding='gzip', path='/api/v1/user/users/'):
+    request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda r: response)(request)
+
+
+def json_response(content=PAYLOAD):
+    return HttpResponse(content, content_type='application/json')
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, deflate', 'gzip'),
+    ('gzip;q=0', None),
+    ('*', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_negotiate(accept_encoding, expected):
+    """Test picking an encoding from the Accept-Encoding header."""
+    assert negotiate(accept_encoding) == expected
+
+
+def test_large_json_is_compressed():
+    """Test large JSON responses are gzip compressed."""
+    response = run(json_response())
+
+    assert response['Content-Encoding'] == 'gzip'
+    assert response['Vary'] == 'Accept-Encoding'
+    assert int(response['Content-Length']) < len(PAYLOAD)
+    assert gzip.decompress(response.content).decode() == PAYLOAD
+
+
+def test_small_and_binary_responses_are_left_alone():
+    """Test responses below the threshold or not text are not compressed."""
+    assert not run(json_response('{}')).has_header('Content-Encoding')
+    binary = HttpResponse(PAYLOAD, content_type='image/png')
+    assert not run(binary).has_header('Content-Encoding')
+
+
+def test_no_compression_without_accept_encoding():
+    """Test clients not accepting an encoding get the identity body."""
+    response = run(json_response(), accept_encoding='')
+
+    assert not response.has_header('Content-Encoding')
+    assert response['Vary'] == 'Accept-Encoding'
+
+
+def test_streaming_response_is_compressed():
+    """Test streaming responses are compressed chunk by chunk."""
+    chunks = [PAYLOAD[i:i + 500].encode() for i in range(0, len(PAYLOAD), 500)]
+    response = run(StreamingHttpResponse(
+        iter(chunks), content_type='application/x-ndjson'
+    ))
+
+    body = b''.join(response.streaming_content)
+    assert response['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(body).decode() == PAYLOAD
+
+
+@override_settings(
+    COMPRESSION_ROUTE_LEVELS={'/api/v1/schema/': {'gzip': 1}},
+    COMPRESSION_CACHE_ROUTES=['/api/v1/schema/'],
+)
+def test_cached_route_reuses_compressed_body():
+    """Test static payloads are compressed once per content."""
+    before = cache.snapshot()
+
+    first = run(json_response(), path='/api/v1/schema/')
+    second = run(json_response(), path='/api/v1/schema/')
+
+    after = cache.snapshot()
+    assert first.content == second.content
+    assert after['misses'] == before['misses'] + 1
+    assert after['hits'] == before['hits'] + 1
+
+
+def test_compression_benchmark_command(tmp_path, capsys):
+    """Test the benchmark reports every gzip level."""
+    payload = tmp_path / 'payload.json'
+    payload.write_text(PAYLOAD)
+
+    call_command('compression_benchmark', file=str(payload), repeat=1)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len([line for line in lines if line.startswith('gzip')]) == 4
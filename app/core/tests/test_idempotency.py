@@ -0,0 +1,260 @@
+"""
+Tests for Idempotency-Key support.
+"""
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import idempotency
+from core.models import IdempotencyKey
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+CREATE_USER_URL = reverse('user:user-list')
+
+
+def image_upload_url(user_id):
+    return reverse('user:user-upload-image', kwargs={'pk': user_id})
+
+
+def payload(**params):
+    defaults = {
+        'email': 'test@example.com',
+        'password': 'testpass123',
+        'name': 'Test Name',
+        'gender': 'M',
+        'user_type': 'home_seeker',
+    }
+    defaults.update(params)
+    return defaults
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def superuser(db):
+    user = UserFactory(user_type='admin', is_staff=True, is_superuser=True)
+    yield user
+    if user.image:
+        user.image.delete()
+
+
+@pytest.fixture
+def superuser_client(superuser):
+    client = APIClient()
+    client.force_authenticate(user=superuser)
+    return client
+
+
+@pytest.mark.django_db
+def test_create_replays_first_response(client):
+    """Test a retried create returns the stored response, creating once."""
+    first = client.post(CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc')
+    second = client.post(
+        CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc'
+    )
+
+    assert first.status_code == second.status_code == status.HTTP_201_CREATED
+    assert second.data == first.data
+    assert second['Idempotent-Replayed'] == 'true'
+    assert User.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_without_key_runs_every_time(client):
+    """Test requests without a key are not deduplicated."""
+    client.post(CREATE_USER_URL, payload())
+    res = client.post(CREATE_USER_URL, payload())
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    assert not IdempotencyKey.objects.exists()
+
+
+@pytest.mark.django_db
+def test_validation_errors_are_replayed(client):
+    """Test a rejected request is answered the same way again."""
+    first = client.post(
+        CREATE_USER_URL, payload(email='bad'), HTTP_IDEMPOTENCY_KEY='abc'
+    )
+    second = client.post(
+        CREATE_USER_URL, payload(email='bad'), HTTP_IDEMPOTENCY_KEY='abc'
+    )
+
+    assert first.status_code == status.HTTP_400_BAD_REQUEST
+    assert second.status_code == status.HTTP_400_BAD_REQUEST
+    assert second.data == first.data
+    assert second['Idempotent-Replayed'] == 'true'
+
+
+@pytest.mark.django_db
+def test_key_reused_for_another_request(client):
+    """Test a key sent with a different body is rejected."""
+    client.post(CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc')
+
+    res = client.post(
+        CREATE_USER_URL, payload(name='Other'), HTTP_IDEMPOTENCY_KEY='abc'
+    )
+
+    assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.django_db
+def test_in_flight_duplicate_waits_for_first(client, settings):
+    """Test a duplicate waits and replays the response of the first."""
+    client.post(CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc')
+    record = IdempotencyKey.objects.get()
+    done = (record.status, record.data)
+    IdempotencyKey.objects.update(status=None, data=None)
+
+    def finish(seconds):
+        IdempotencyKey.objects.update(status=done[0], data=done[1])
+
+    with patch.object(idempotency.time, 'sleep', side_effect=finish) as sleep:
+        res = client.post(
+            CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+    assert sleep.call_count == 1
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.data == done[1]
+    assert User.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_long_wait_stays_within_query_budget(client):
+    """Test polls for a slow first request are not counted as queries."""
+    client.post(CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc')
+    record = IdempotencyKey.objects.get()
+    done = (record.status, record.data)
+    IdempotencyKey.objects.update(status=None, data=None)
+    polls = []
+
+    def finish(seconds):
+        polls.append(seconds)
+        if len(polls) == 50:
+            IdempotencyKey.objects.update(status=done[0], data=done[1])
+
+    with patch.object(idempotency.time, 'sleep', side_effect=finish):
+        res = client.post(
+            CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+    assert len(polls) == 50
+    assert res.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+def test_in_flight_duplicate_times_out(client, settings):
+    """Test a duplicate gets a 409 when the first does not finish."""
+    settings.IDEMPOTENCY_WAIT = 0
+    IdempotencyKey.objects.create(
+        owner='', scope='user-create', key='abc',
+        fingerprint='x' * 64, expires_at=timezone.now() + timedelta(hours=1),
+    )
+    with patch.object(idempotency, 'fingerprint', return_value='x' * 64):
+        res = client.post(
+            CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+    assert res.status_code == status.HTTP_409_CONFLICT
+    assert not User.objects.exists()
+
+
+@pytest.mark.django_db
+def test_stale_and_expired_keys_are_taken_over(client):
+    """Test keys left by a crashed worker or expired run the view again."""
+    long_ago = timezone.now() - timedelta(hours=1)
+    IdempotencyKey.objects.create(
+        owner='', scope='user-create', key='stale',
+        fingerprint='x' * 64, locked_at=long_ago,
+        expires_at=timezone.now() + timedelta(hours=1),
+    )
+    IdempotencyKey.objects.create(
+        owner='', scope='user-create', key='expired', status=200,
+        fingerprint='y' * 64, expires_at=long_ago,
+    )
+
+    with patch.object(idempotency, 'fingerprint', return_value='x' * 64):
+        stale = client.post(
+            CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='stale'
+        )
+    expired = client.post(
+        CREATE_USER_URL, payload(email='other@example.com'),
+        HTTP_IDEMPOTENCY_KEY='expired',
+    )
+
+    assert stale.status_code == status.HTTP_201_CREATED
+    assert expired.status_code == status.HTTP_201_CREATED
+    assert User.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_keys_are_scoped_by_user(superuser, superuser_client, client):
+    """Test the same key from another user is a different request."""
+    superuser_client.post(
+        CREATE_USER_URL, payload(), HTTP_IDEMPOTENCY_KEY='abc'
+    )
+    res = client.post(
+        CREATE_USER_URL, payload(email='other@example.com'),
+        HTTP_IDEMPOTENCY_KEY='abc',
+    )
+
+    assert res.status_code == status.HTTP_201_CREATED
+    assert IdempotencyKey.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_upload_image_replayed(superuser, superuser_client):
+    """Test a retried upload does not process the image again."""
+    url = image_upload_url(superuser.id)
+    with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file, patch(
+        'user.views.process_user_image'
+    ) as process:
+        Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+        responses = []
+        for _ in range(2):
+            image_file.seek(0)
+            responses.append(superuser_client.post(
+                url, {'image': image_file}, format='multipart',
+                HTTP_IDEMPOTENCY_KEY='upload',
+            ))
+
+    superuser.refresh_from_db()
+    first, second = responses
+    assert first.status_code == second.status_code == status.HTTP_200_OK
+    assert second.data == first.data
+    assert second['Idempotent-Replayed'] == 'true'
+    assert os.path.exists(superuser.image.path)
+    process.enqueue.assert_called_once_with(user_id=superuser.id)
+
+
+@pytest.mark.django_db
+def test_clear_idempotency_keys():
+    """Test the command deletes expired keys only."""
+    now = timezone.now()
+    for key, expires_at in (('old', now), ('new', now + timedelta(hours=1))):
+        IdempotencyKey.objects.create(
+            owner='', scope='user-create', key=key,
+            fingerprint='x' * 64, expires_at=expires_at,
+        )
+
+    call_command('clear_idempotency_keys', stdout=StringIO())
+
+    assert list(IdempotencyKey.objects.values_list('key', flat=True)) == [
+        'new'
+    ]
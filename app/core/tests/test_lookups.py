@@ -0,0 +1,38 @@
+"""
+Tests for the custom lookups.
+"""
+import pytest
+from django.contrib.auth import get_user_model
+from django.db.backends.postgresql.base import DatabaseWrapper
+
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_any_lookup_filters():
+    """Test `__any` matches the given values and ignores None."""
+    users = UserFactory.create_batch(3)
+
+    matched = User.objects.filter(
+        pk__any=[users[0].pk, users[2].pk, None]
+    ).order_by('pk')
+
+    assert list(matched) == [users[0], users[2]]
+    assert not User.objects.filter(pk__any=[]).exists()
+
+
+def test_any_lookup_compiles_to_array_on_postgres():
+    """Test `__any` sends one array parameter on PostgreSQL."""
+    connection = DatabaseWrapper({
+        'NAME': 'test', 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+        'OPTIONS': {}, 'TIME_ZONE': None, 'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False, 'AUTOCOMMIT': True,
+    })
+    query = User.objects.filter(pk__any=[3, 1, 2]).only('pk').query
+
+    sql, params = query.get_compiler(connection=connection).as_sql()
+
+    assert sql.endswith('WHERE "user_user"."id" = ANY(%s)')
+    assert params == ([3, 1, 2],)
@@ -0,0 +1,142 @@
+"""
+Tests for the memory diagnostics.
+"""
+import os
+import signal
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import memory
+from user.user_factory import UserFactory
+
+MEMORY_URL = reverse('memory')
+
+
+@pytest.fixture(autouse=True)
+def snapshots():
+    yield memory.snapshots
+    memory.snapshots.stop()
+
+
+@pytest.fixture
+def superuser_client(db):
+    user = get_user_model().objects.create_superuser(
+        'super@example.com', 'pass12345'
+    )
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def test_diff_groups_growth_by_traceback(snapshots):
+    """Test the diff of two snapshots shows what was allocated."""
+    snapshots.take()
+    leak = [bytearray(1024) for _ in range(1000)]  # noqa: F841
+    snapshots.take()
+
+    diff = snapshots.diff()
+
+    assert diff[0]['size_diff'] >= 1000 * 1024
+    assert any('test_memory.py' in line for line in diff[0]['traceback'])
+
+
+def test_only_recent_snapshots_are_kept(snapshots, settings):
+    """Test old snapshots are dropped."""
+    settings.MEMORY_SNAPSHOTS_KEPT = 2
+    for _ in range(3):
+        snapshots.take()
+
+    assert len(snapshots.snapshot()['snapshots']) == 2
+
+
+def test_memory_endpoint(superuser_client):
+    """Test superusers can take snapshots and read the diff."""
+    superuser_client.post(MEMORY_URL, {'action': 'snapshot'})
+    res = superuser_client.post(MEMORY_URL, {'action': 'snapshot'})
+
+    assert res.status_code == 200
+    assert res.data['tracing'] is True
+    assert res.data['rss_bytes'] > 0
+    assert len(res.data['snapshots']) == 2
+    assert res.data['top']
+
+    res = superuser_client.post(MEMORY_URL, {'action': 'stop'})
+    assert res.data['tracing'] is False
+    res = superuser_client.post(MEMORY_URL, {'action': 'nope'})
+    assert res.status_code == 400
+
+
+def test_memory_endpoint_requires_superuser(db):
+    """Test other users cannot use the memory endpoint."""
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='admin'))
+
+    assert client.get(MEMORY_URL).status_code == 403
+
+
+def test_snapshot_signal(settings, snapshots):
+    """Test the snapshot signal takes a snapshot."""
+    previous = signal.getsignal(signal.SIGUSR2)
+    settings.MEMORY_SNAPSHOT_SIGNAL = 'SIGUSR2'
+    try:
+        memory.install()
+        os.kill(os.getpid(), signal.SIGUSR2)
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+
+    assert len(snapshots.snapshot()['snapshots']) == 1
+
+
+def test_watchdog_restarts_worker_over_limit(settings, snapshots):
+    """Test a worker over the RSS limit logs and restarts gracefully."""
+    settings.MEMORY_RSS_LIMIT_MB = 1
+    snapshots.start()
+    watchdog = memory.RSSWatchdog()
+
+    with patch.object(memory, 'uwsgi', object()), \
+            patch('os.kill') as kill:
+        watchdog.tick()
+        watchdog.tick()
+
+    kill.assert_called_once_with(os.getpid(), signal.SIGHUP)
+    assert len(snapshots.snapshot()['snapshots']) == 1
+
+
+def test_watchdog_idle_under_limit(settings):
+    """Test nothing happens under the limit."""
+    settings.MEMORY_RSS_LIMIT_MB = 1024 * 1024
+
+    with patch.object(memory, 'uwsgi', object()), \
+            patch('os.kill') as kill:
+        memory.RSSWatchdog().tick()
+
+    kill.assert_not_called()
+
+
+def test_watchdog_off_without_interval(settings):
+    """Test an interval of 0 neither starts a thread nor checks inline."""
+    settings.MEMORY_WATCHDOG_INTERVAL = 0
+    watchdog = memory.RSSWatchdog()
+
+    with patch.object(watchdog, 'tick') as tick:
+        assert not watchdog.start()
+
+    tick.assert_not_called()
+    assert watchdog.thread is None
+
+
+def test_watchdog_not_run_at_exit(settings):
+    """Test the watchdog thread registers no exit hook."""
+    settings.MEMORY_WATCHDOG_INTERVAL = 3600
+    watchdog = memory.RSSWatchdog()
+
+    with patch('atexit.register') as register:
+        assert watchdog.start()
+        assert not watchdog.start()
+
+    register.assert_not_called()
+    assert watchdog.thread.is_alive()
@@ -0,0 +1,116 @@
+"""
+Tests for per-request profiling.
+"""
+import os
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import profiling
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+USERS_URL = reverse('user:user-list')
+PROFILES_URL = reverse('admin-profiles')
+
+
+@pytest.fixture(autouse=True)
+def profiling_dir(settings, tmp_path):
+    settings.PROFILING_DIR = str(tmp_path / 'profiles')
+    return settings.PROFILING_DIR
+
+
+@pytest.fixture
+def superuser(db):
+    return User.objects.create_superuser('super@example.com', 'pass12345')
+
+
+def jwt_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+    )
+    return client
+
+
+def test_superuser_header_captures_profile(superuser, profiling_dir):
+    """Test a superuser can profile a request with the header."""
+    res = jwt_client(superuser).get(USERS_URL, HTTP_X_PROFILE='1')
+
+    name = res['X-Profile-Id']
+    assert sorted(os.listdir(profiling_dir)) == [
+        name + '.folded', name + '.json', name + '.pstats'
+    ]
+    [capture] = profiling.list_captures()
+    assert capture['route'] == 'api/v1/user/users/$'
+    assert capture['status'] == 200
+    assert capture['duration_ms'] > 0
+
+
+def test_header_ignored_for_other_users(db, profiling_dir):
+    """Test the header does nothing for non-superusers."""
+    admin = UserFactory(user_type='admin')
+
+    res = jwt_client(admin).get(USERS_URL, HTTP_X_PROFILE='1')
+
+    assert 'X-Profile-Id' not in res
+    assert profiling.list_captures() == []
+
+
+def test_sampled_requests_are_profiled(db, settings):
+    """Test a sampled fraction of requests is profiled."""
+    settings.PROFILING_SAMPLE_RATE = 1.0
+
+    res = APIClient().get(USERS_URL)
+
+    assert 'X-Profile-Id' not in res
+    assert len(profiling.list_captures()) == 1
+
+
+def test_captures_are_rotated(superuser, settings):
+    """Test only the newest captures are kept."""
+    settings.PROFILING_MAX_CAPTURES = 2
+    client = jwt_client(superuser)
+
+    names = [
+        client.get(USERS_URL, HTTP_X_PROFILE='1')['X-Profile-Id']
+        for _ in range(3)
+    ]
+
+    assert [c['name'] for c in profiling.list_captures()] == names[:0:-1]
+
+
+def test_sampler_folds_stacks():
+    """Test sampled stacks are written in the folded format."""
+    sampler = profiling.Sampler(0, 1)
+    sampler.stacks['a (x.py:1);b (x.py:2)'] += 3
+
+    assert sampler.folded() == 'a (x.py:1);b (x.py:2) 3\n'
+
+
+def test_admin_page_lists_profiles(superuser, client):
+    """Test the admin page lists captures and serves their files."""
+    name = jwt_client(superuser).get(
+        USERS_URL, HTTP_X_PROFILE='1'
+    )['X-Profile-Id']
+    client.force_login(superuser)
+
+    res = client.get(PROFILES_URL, {'o': 'duration'})
+    assert res.status_code == 200
+    assert name in res.content.decode()
+
+    res = client.get(reverse('admin-profile-file', args=[name + '.folded']))
+    assert res.status_code == 200
+    res = client.get(reverse('admin-profile-file', args=['missing.json']))
+    assert res.status_code == 404
+
+
+def test_admin_page_requires_superuser(db, client):
+    """Test staff users that are not superusers are refused."""
+    client.force_login(User.objects.create_user('staff@example.com', 'pw'))
+
+    assert client.get(PROFILES_URL).status_code == 403
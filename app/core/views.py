@@ -0,0 +1,102 @@
+"""
+Views for the core API.
+"""
+import os
+
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import memory, metrics, profiling
+from user.authentication import CachedJWTAuthentication
+from user.permissions import SUPERUSER, IsSuperUser, has_role
+
+
+class MetricsView(APIView):
+    """Return the metrics of the worker process serving the request."""
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return Response({'pid': os.getpid(), **metrics.snapshot()})
+
+
+class MemoryView(APIView):
+    """
+    Inspect the memory of the worker process serving the request.
+
+    POST `action` = `start` or `stop` turns tracemalloc on or off, and
+    `snapshot` takes a snapshot and returns the growth since the previous
+    one, grouped by traceback.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        return Response({
+            'pid': os.getpid(),
+            **memory.snapshots.snapshot(),
+            'top': memory.snapshots.top(limit),
+            'diff': memory.snapshots.diff(limit),
+        })
+
+    def post(self, request):
+        action = request.data.get('action')
+        if action == 'start':
+            memory.snapshots.start()
+        elif action == 'stop':
+            memory.snapshots.stop()
+        elif action == 'snapshot':
+            memory.snapshots.take()
+        else:
+            return Response(
+                {'action': 'Must be one of start, stop or snapshot.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.get(request)
+
+
+def superuser_admin_view(view):
+    """Wrap `view` as an admin page only superusers can open."""
+
+    def wrapped(request, *args, **kwargs):
+        if not has_role(request.user, SUPERUSER):
+            raise PermissionDenied
+        return view(request, *args, **kwargs)
+
+    return admin.site.admin_view(wrapped)
+
+
+@superuser_admin_view
+def profile_list(request):
+    """List the stored request profiles, slowest or newest first."""
+    captures = profiling.list_captures()
+    route = request.GET.get('route')
+    if route:
+        captures = [c for c in captures if c['route'] == route]
+    if request.GET.get('o') == 'duration':
+        captures.sort(key=lambda c: c['duration_ms'], reverse=True)
+    return render(request, 'admin/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'captures': captures,
+        'routes': sorted({c['route'] for c in profiling.list_captures()}),
+        'route': route,
+    })
+
+
+@superuser_admin_view
+def profile_file(request, filename):
+    """Download the pstats, folded stacks or metadata of a capture."""
+    path = profiling.capture_path(filename)
+    if path is None:
+        raise Http404('No such profile.')
+    return FileResponse(open(path, 'rb'), as_attachment=True)
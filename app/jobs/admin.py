@@ -0,0 +1,20 @@
+"""
+Django admin customization
+"""
+from django.contrib import admin
+
+from jobs import models
+
+
+class JobAdmin(admin.ModelAdmin):
+    """Define the admin pages for jobs."""
+    ordering = ['-id']
+    list_display = [
+        'id', 'task', 'queue', 'status', 'attempts', 'run_at', 'finished_at'
+    ]
+    list_filter = ['queue', 'status']
+    search_fields = ['task']
+    readonly_fields = ['created_at', 'locked_at', 'locked_by', 'finished_at']
+
+
+admin.site.register(models.Job, JobAdmin)
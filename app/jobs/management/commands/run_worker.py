@@ -0,0 +1,46 @@
+"""
+Django command to run a background job worker.
+"""
+import json
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import queue_stats
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    """Django command to process jobs until interrupted."""
+    help = 'Process background jobs; start more processes to scale out.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queues', default='default',
+            help='Comma separated queues to consume.',
+        )
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--metrics-interval', type=float, default=60.0)
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Print per-queue counts and throughput, then exit.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['stats']:
+            self.stdout.write(json.dumps(queue_stats(), indent=2))
+            return
+
+        worker = Worker(
+            queues=filter(None, options['queues'].split(',')),
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            metrics_interval=options['metrics_interval'],
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f'Worker {worker.worker_id} started.')
+        worker.run()
+        self.stdout.write(self.style.SUCCESS('Worker stopped.'))
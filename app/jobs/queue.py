@@ -0,0 +1,170 @@
+"""
+Enqueue, claim and settle background jobs.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name=None, queue='default', max_attempts=None):
+    """Register a function as a job task and give it an `enqueue` helper."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = func
+
+        def enqueue_task(run_at=None, delay=None, **payload):
+            return enqueue(
+                task_name, payload, queue=queue, run_at=run_at,
+                delay=delay, max_attempts=max_attempts,
+            )
+
+        func.task_name = task_name
+        func.enqueue = enqueue_task
+        return func
+
+    return decorator
+
+
+def enqueue(task_name, payload=None, queue='default', run_at=None,
+            delay=None, max_attempts=None):
+    """Create a queued job, optionally scheduled for later."""
+    if run_at is None:
+        run_at = timezone.now()
+    if delay is not None:
+        run_at += timedelta(seconds=delay)
+
+    return Job.objects.create(
+        task=task_name,
+        payload=payload or {},
+        queue=queue,
+        run_at=run_at,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def claim(queues, worker_id, limit=1):
+    """Lock up to `limit` due jobs, skipping rows other workers hold."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, queue__in=queues, run_at__lte=now)
+            .order_by('run_at', 'id')[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.status = Job.RUNNING
+        job.locked_by = worker_id
+        job.locked_at = now
+        job.attempts += 1
+
+    return jobs
+
+
+def heartbeat(job_ids, worker_id):
+    """Keep running jobs locked, so `requeue_stale` leaves them alone."""
+    return Job.objects.filter(
+        pk__in=job_ids, status=Job.RUNNING, locked_by=worker_id
+    ).update(locked_at=timezone.now())
+
+
+def requeue_stale():
+    """
+    Return jobs whose worker stopped sending heartbeats to the queue and
+    the number of jobs handled.
+
+    The lost run counts as an attempt, as it did when claimed, so a job
+    that keeps crashing its worker fails after `max_attempts`.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT),
+    )
+    error = f'No heartbeat for {settings.JOBS_LOCK_TIMEOUT} seconds.'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, last_error=error,
+        locked_by='', locked_at=None,
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, last_error=error, locked_by='', locked_at=None,
+    )
+    return failed + requeued
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts`, with jitter."""
+    delay = min(
+        settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_BACKOFF_MAX,
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+def execute(job):
+    """Run a claimed job and record the outcome, return True on success."""
+    func = registry.get(job.task)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task "{job.task}".')
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s failed: %s', job, error.splitlines()[-1])
+        fail(job, error, retry=func is not None)
+        return False
+
+    job.status = Job.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    return True
+
+
+def fail(job, error, retry=True):
+    """Schedule a retry with backoff or mark the job as failed."""
+    job.last_error = error
+    job.locked_by = ''
+    job.locked_at = None
+    if retry and job.attempts < job.max_attempts:
+        job.status = Job.QUEUED
+        job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+    else:
+        job.status = Job.FAILED
+        job.finished_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'run_at', 'finished_at', 'last_error',
+        'locked_by', 'locked_at',
+    ])
+
+
+def queue_stats(window=60):
+    """Per-queue job counts by status and jobs finished in `window` s."""
+    stats = {}
+    for row in Job.objects.values('queue', 'status').annotate(n=Count('id')):
+        stats.setdefault(row['queue'], {})[row['status']] = row['n']
+    since = timezone.now() - timedelta(seconds=window)
+    for row in (
+        Job.objects.filter(finished_at__gte=since)
+        .values('queue').annotate(n=Count('id'))
+    ):
+        stats.setdefault(row['queue'], {})['throughput'] = row['n'] / window
+
+    return stats
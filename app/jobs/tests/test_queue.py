@@ -0,0 +1,182 @@
+"""
+Tests for the background job queue.
+"""
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import (
+    claim, enqueue, execute, heartbeat, requeue_stale, task
+)
+from jobs.worker import Worker
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+@pytest.mark.django_db
+def test_enqueue_with_task_helper():
+    """Test a registered task enqueues a job with its payload."""
+    job = record.enqueue(value=1)
+
+    assert job.task == 'tests.record'
+    assert job.payload == {'value': 1}
+    assert job.status == Job.QUEUED
+
+
+@pytest.mark.django_db
+def test_claim_locks_due_jobs_only():
+    """Test claiming skips scheduled jobs and marks claimed ones running."""
+    due = enqueue('tests.record', {'value': 1})
+    enqueue('tests.record', {'value': 2}, delay=3600)
+
+    jobs = claim(['default'], 'worker-1', limit=5)
+
+    assert [job.pk for job in jobs] == [due.pk]
+    due.refresh_from_db()
+    assert due.status == Job.RUNNING
+    assert due.attempts == 1
+    assert due.locked_by == 'worker-1'
+    assert claim(['default'], 'worker-2', limit=5) == []
+
+
+@pytest.mark.django_db
+def test_claim_filters_queues():
+    """Test workers only claim jobs from their queues."""
+    enqueue('tests.record', {'value': 1}, queue='images')
+
+    assert claim(['default'], 'worker-1') == []
+    assert len(claim(['images'], 'worker-1')) == 1
+
+
+@pytest.mark.django_db
+def test_execute_success_marks_done():
+    """Test a successful job is marked done."""
+    record.enqueue(value='ok')
+    job = claim(['default'], 'worker-1')[0]
+
+    assert execute(job) is True
+
+    job.refresh_from_db()
+    assert calls == ['ok']
+    assert job.status == Job.DONE
+    assert job.finished_at is not None
+
+
+@pytest.mark.django_db
+def test_execute_failure_retries_with_backoff_then_fails():
+    """Test failing jobs are retried later until attempts run out."""
+    job = explode.enqueue()
+    job = claim(['default'], 'worker-1')[0]
+
+    assert execute(job) is False
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED
+    assert job.run_at > timezone.now()
+    assert 'boom' in job.last_error
+
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    job = claim(['default'], 'worker-1')[0]
+    execute(job)
+    job.refresh_from_db()
+    assert job.status == Job.FAILED
+    assert job.attempts == 2
+
+
+@pytest.mark.django_db
+def test_unknown_task_fails_without_retry():
+    """Test a job for an unregistered task fails immediately."""
+    enqueue('tests.missing')
+    job = claim(['default'], 'worker-1')[0]
+
+    execute(job)
+
+    job.refresh_from_db()
+    assert job.status == Job.FAILED
+
+
+@pytest.mark.django_db
+def test_requeue_stale_running_jobs():
+    """Test jobs locked by a dead worker go back to the queue."""
+    job = record.enqueue(value=1)
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.RUNNING,
+        locked_at=timezone.now() - timedelta(days=1),
+    )
+
+    assert requeue_stale() == 1
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED
+    assert 'heartbeat' in job.last_error
+
+
+@pytest.mark.django_db
+def test_stale_jobs_fail_after_max_attempts():
+    """Test a job that keeps losing its worker is not retried forever."""
+    job = explode.enqueue()
+    long_ago = timezone.now() - timedelta(days=1)
+    for _ in range(2):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        claim(['default'], 'worker-1')
+        Job.objects.filter(pk=job.pk).update(locked_at=long_ago)
+        requeue_stale()
+
+    job.refresh_from_db()
+    assert job.status == Job.FAILED
+    assert job.attempts == 2
+    assert job.finished_at is not None
+
+
+@pytest.mark.django_db
+def test_heartbeat_keeps_running_jobs_locked():
+    """Test jobs whose worker is alive are not requeued."""
+    record.enqueue(value=1)
+    job = claim(['default'], 'worker-1')[0]
+    Job.objects.filter(pk=job.pk).update(
+        locked_at=timezone.now() - timedelta(days=1)
+    )
+
+    assert heartbeat([job.pk], 'worker-2') == 0
+    assert heartbeat([job.pk], 'worker-1') == 1
+    assert requeue_stale() == 0
+    job.refresh_from_db()
+    assert job.status == Job.RUNNING
+
+
+@pytest.mark.django_db
+def test_worker_run_once_tracks_metrics():
+    """Test the worker processes a batch and counts it per queue."""
+    for i in range(3):
+        record.enqueue(value=i)
+    worker = Worker(['default'], concurrency=3)
+
+    assert worker.run_once() == 3
+    assert sorted(calls) == [0, 1, 2]
+    assert worker.metrics['default']['processed'] == 3
+
+
+@pytest.mark.django_db
+def test_run_worker_stats(capsys):
+    """Test the worker command prints queue statistics."""
+    record.enqueue(value=1)
+
+    call_command('run_worker', stats=True)
+
+    assert '"queued": 1' in capsys.readouterr().out
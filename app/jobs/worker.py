@@ -0,0 +1,148 @@
+"""
+Job worker claiming with `SELECT ... FOR UPDATE SKIP LOCKED`.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils.module_loading import autodiscover_modules
+
+from jobs import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Poll the given queues and run jobs on a pool of threads.
+
+    While `run` goes, a heartbeat thread refreshes the lock of the jobs
+    running every `JOBS_HEARTBEAT_INTERVAL` seconds, so only jobs of a
+    dead worker are requeued.
+    """
+
+    def __init__(self, queues, concurrency=1, poll_interval=1.0,
+                 metrics_interval=60.0):
+        autodiscover_modules('tasks')
+        self.queues = list(queues)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.metrics_interval = metrics_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.finished = threading.Event()
+        self.running = set()
+        self.slots = threading.Semaphore(concurrency)
+        self.lock = threading.Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.metrics = defaultdict(
+            lambda: {'processed': 0, 'failed': 0, 'seconds': 0.0}
+        )
+        self.metrics_started = time.monotonic()
+
+    def execute(self, job):
+        """Run one job and account for it in the per-queue metrics."""
+        started = time.monotonic()
+        with self.lock:
+            self.running.add(job.pk)
+        try:
+            ok = queue.execute(job)
+        finally:
+            with self.lock:
+                self.running.discard(job.pk)
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+        with self.lock:
+            metrics = self.metrics[job.queue]
+            metrics['processed'] += 1
+            metrics['failed'] += 0 if ok else 1
+            metrics['seconds'] += time.monotonic() - started
+        return ok
+
+    def run_once(self):
+        """Claim and run one batch of jobs in this thread."""
+        jobs = queue.claim(self.queues, self.worker_id, self.concurrency)
+        for job in jobs:
+            self.execute(job)
+        return len(jobs)
+
+    def run(self):
+        """Run until `stop` is called, keeping every thread busy."""
+        logger.info(
+            'Worker %s consuming %s with %d thread(s)',
+            self.worker_id, ', '.join(self.queues), self.concurrency,
+        )
+        next_metrics = time.monotonic() + self.metrics_interval
+        self.finished.clear()
+        threading.Thread(
+            target=self.beat, name='JobHeartbeat', daemon=True
+        ).start()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            while not self.stopping.is_set():
+                close_old_connections()
+                if time.monotonic() >= next_metrics:
+                    queue.requeue_stale()
+                    self.log_metrics()
+                    next_metrics = time.monotonic() + self.metrics_interval
+
+                free = 0
+                while self.slots.acquire(blocking=False):
+                    free += 1
+                if not free:
+                    self.slots.acquire()
+                    free = 1
+                jobs = queue.claim(self.queues, self.worker_id, free)
+                for _ in range(free - len(jobs)):
+                    self.slots.release()
+                for job in jobs:
+                    executor.submit(self.run_job, job)
+                if not jobs:
+                    self.stopping.wait(self.poll_interval)
+        self.finished.set()
+        self.log_metrics()
+
+    def beat(self):
+        """Refresh the locks of running jobs until `run` returns."""
+        try:
+            while not self.finished.wait(settings.JOBS_HEARTBEAT_INTERVAL):
+                with self.lock:
+                    running = list(self.running)
+                if not running:
+                    continue
+                try:
+                    queue.heartbeat(running, self.worker_id)
+                except Exception:
+                    logger.exception('Heartbeat of %s failed', running)
+        finally:
+            connection.close()
+
+    def run_job(self, job):
+        try:
+            self.execute(job)
+        finally:
+            self.slots.release()
+
+    def stop(self, *args):
+        """Stop claiming jobs; running jobs are allowed to finish."""
+        self.stopping.set()
+
+    def log_metrics(self):
+        """Log per-queue throughput since the last report and reset."""
+        with self.lock:
+            elapsed = max(time.monotonic() - self.metrics_started, 1e-9)
+            for name, metrics in sorted(self.metrics.items()):
+                processed = metrics['processed']
+                logger.info(
+                    'queue=%s processed=%d failed=%d rate=%.2f/s avg=%.1fms',
+                    name, processed, metrics['failed'], processed / elapsed,
+                    1000 * metrics['seconds'] / processed if processed else 0,
+                )
+            self.reset_metrics()
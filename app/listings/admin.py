@@ -0,0 +1,21 @@
+"""
+Django admin customization
+"""
+from django.contrib import admin
+
+from listings import models
+
+
+class ListingAdmin(admin.ModelAdmin):
+    """Define the admin pages for listings."""
+    ordering = ['-id']
+    list_display = [
+        'id', 'title', 'owner', 'price', 'rooms', 'is_active', 'created_at',
+    ]
+    list_filter = ['is_active', 'rooms']
+    search_fields = ['title', 'address', 'owner__email']
+    raw_id_fields = ['owner']
+    readonly_fields = ['cell', 'created_at', 'updated_at']
+
+
+admin.site.register(models.Listing, ListingAdmin)
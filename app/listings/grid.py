@@ -0,0 +1,64 @@
+"""
+Fixed latitude/longitude grid indexing listings without PostGIS.
+"""
+import math
+
+# Cells are 0.01 degrees, about 1.1 km north to south. Stored cell ids
+# depend on it, so changing it means recomputing every `Listing.cell`.
+# Multiplying by the integer count is exact where `// 0.01` is not.
+CELLS_PER_DEGREE = 100
+ROWS = 180 * CELLS_PER_DEGREE
+COLUMNS = 360 * CELLS_PER_DEGREE
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def row_of(latitude):
+    return min(math.floor((latitude + 90) * CELLS_PER_DEGREE), ROWS - 1)
+
+
+def column_of(longitude):
+    return min(
+        math.floor((longitude + 180) * CELLS_PER_DEGREE), COLUMNS - 1
+    )
+
+
+def cell_of(latitude, longitude):
+    """Id of the cell holding a point, numbered row by row from the SW."""
+    return row_of(latitude) * COLUMNS + column_of(longitude)
+
+
+def cell_ranges(south, west, north, east):
+    """
+    Inclusive (first, last) cell id ranges covering a bounding box.
+
+    Cells of one row are consecutive, so a box is one range per row, or
+    two when it crosses the antimeridian (`west > east`).
+    """
+    if west <= east:
+        columns = [(column_of(west), column_of(east))]
+    else:
+        columns = [(column_of(west), COLUMNS - 1), (0, column_of(east))]
+    return [
+        (row * COLUMNS + first, row * COLUMNS + last)
+        for row in range(row_of(south), row_of(north) + 1)
+        for first, last in columns
+    ]
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(south, west, north, east) of the box around a circle."""
+    delta = radius_km / KM_PER_DEGREE
+    south = max(latitude - delta, -90.0)
+    north = min(latitude + delta, 90.0)
+    widest = max(abs(south), abs(north))
+    if widest >= 90.0 - 1e-9:
+        # The circle covers a pole and so every longitude
+        return south, -180.0, north, 180.0
+    delta /= math.cos(math.radians(widest))
+    if delta >= 180.0:
+        return south, -180.0, north, 180.0
+    west = (longitude - delta + 180) % 360 - 180
+    east = (longitude + delta + 180) % 360 - 180
+    return south, west, north, east
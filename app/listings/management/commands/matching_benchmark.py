@@ -0,0 +1,107 @@
+"""
+Django command to measure listing ranking latency on synthetic data.
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.grid import KM_PER_DEGREE
+from listings.matching import Columns, rank
+
+
+def synthetic(rng, count, cities, spread_km, columns, sort_by=None):
+    """`Columns` of `count` rows scattered around `cities`."""
+    city = rng.integers(len(cities), size=count)
+    spread = spread_km / KM_PER_DEGREE
+    arrays = {
+        'latitude': np.clip(
+            cities[city, 0] + rng.normal(0, spread, count), -90, 90
+        ),
+        'longitude': (
+            cities[city, 1] + rng.normal(0, spread, count) + 180
+        ) % 360 - 180,
+    }
+    arrays.update({name: make(count) for name, make in columns.items()})
+    return Columns(
+        np.arange(1, count + 1, dtype=np.int64), np.ones(count, bool),
+        arrays, sort_by,
+    )
+
+
+class Command(BaseCommand):
+    """Django command to report ranking latency percentiles."""
+    help = (
+        'Benchmark listings.matching.rank on synthetic listings and home '
+        'seekers clustered in cities, without the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1_000_000)
+        parser.add_argument('--seekers', type=int, default=100_000)
+        parser.add_argument(
+            '--sample', type=int, default=1000,
+            help='Seekers to rank for, picked at random.',
+        )
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--cities', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if min(options['listings'], options['seekers'], options['sample'],
+               options['limit'], options['cities']) < 1:
+            raise CommandError('Counts must be positive.')
+        rng = np.random.default_rng(options['seed'])
+        cities = np.column_stack([
+            rng.uniform(-50, 60, options['cities']),
+            rng.uniform(-180, 180, options['cities']),
+        ])
+
+        started = time.perf_counter()
+        listings = synthetic(rng, options['listings'], cities, 15, {
+            'price': lambda n: np.round(rng.lognormal(7, 0.5, n), 2),
+            'rooms': lambda n: rng.integers(1, 7, n).astype(np.int16),
+        }, sort_by='latitude')
+        seekers = synthetic(rng, options['seekers'], cities, 10, {
+            'radius_km': lambda n: rng.uniform(2, 30, n),
+            'max_price': lambda n: np.round(rng.lognormal(7.3, 0.4, n), 2),
+            'min_rooms': lambda n: rng.integers(1, 5, n).astype(np.int16),
+            'distance_weight': lambda n: rng.uniform(0, 2, n),
+            'price_weight': lambda n: rng.uniform(0, 2, n),
+            'rooms_weight': lambda n: rng.uniform(0, 2, n),
+        })
+        self.stdout.write(
+            f'Generated {len(listings)} listings '
+            f'({listings.nbytes / 2 ** 20:.1f} MiB) and {len(seekers)} '
+            f'seekers ({seekers.nbytes / 2 ** 20:.1f} MiB) in '
+            f'{time.perf_counter() - started:.2f}s'
+        )
+
+        rows = rng.choice(
+            len(seekers), min(options['sample'], len(seekers)),
+            replace=False,
+        )
+        timings = np.empty(len(rows))
+        found = np.empty(len(rows))
+        for i, row in enumerate(rows):
+            seeker = {
+                name: array[row] for name, array in seekers.arrays.items()
+            }
+            started = time.perf_counter()
+            ranked, _ = rank(listings, seeker, options['limit'])
+            timings[i] = time.perf_counter() - started
+            found[i] = len(ranked)
+
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+        self.stdout.write(
+            f'Ranked top {options["limit"]} for {len(rows)} seekers: '
+            f'p50 {p50:.2f}ms p95 {p95:.2f}ms p99 {p99:.2f}ms '
+            f'max {timings.max() * 1000:.2f}ms, '
+            f'{found.mean():.1f} results on average'
+        )
+        self.stdout.write(
+            f'Throughput {len(rows) / timings.sum():.0f} rankings/s per '
+            f'core, all {len(seekers)} seekers in about '
+            f'{timings.mean() * len(seekers):.0f}s'
+        )
@@ -0,0 +1,111 @@
+"""
+Django command to measure listing search latency on synthetic data.
+"""
+import time
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from listings import grid, search
+from listings.models import Listing
+
+
+class Command(BaseCommand):
+    """Django command to report search latency percentiles."""
+    help = (
+        'Benchmark listings.search.search against the database on '
+        'synthetic listings clustered in cities, rolled back afterwards. '
+        'Fails when p99 is over --max-p99-ms.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100_000)
+        parser.add_argument(
+            '--sample', type=int, default=500,
+            help='Searches to run, half boxes and half circles.',
+        )
+        parser.add_argument('--cities', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--max-p99-ms', type=float, default=50,
+            help='Latency target of the search endpoint.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if min(options['listings'], options['sample'],
+               options['cities']) < 1:
+            raise CommandError('Counts must be positive.')
+        with transaction.atomic():
+            timings = self.measure(options)
+            # The synthetic rows are not kept
+            transaction.set_rollback(True)
+
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+        self.stdout.write(
+            f'Ran {len(timings)} searches: p50 {p50:.2f}ms '
+            f'p95 {p95:.2f}ms p99 {p99:.2f}ms '
+            f'max {timings.max() * 1000:.2f}ms'
+        )
+        if p99 > options['max_p99_ms']:
+            raise CommandError(
+                f'p99 {p99:.2f}ms is over {options["max_p99_ms"]}ms.'
+            )
+
+    def measure(self, options):
+        rng = np.random.default_rng(options['seed'])
+        cities = np.column_stack([
+            rng.uniform(-50, 60, options['cities']),
+            rng.uniform(-180, 180, options['cities']),
+        ])
+        owner = get_user_model().objects.create_user(
+            'search-benchmark@example.com', None,
+            user_type='property_owner',
+        )
+        count = options['listings']
+        city = rng.integers(len(cities), size=count)
+        spread = 15 / grid.KM_PER_DEGREE
+        latitude = np.clip(
+            cities[city, 0] + rng.normal(0, spread, count), -90, 90
+        )
+        longitude = (
+            cities[city, 1] + rng.normal(0, spread, count) + 180
+        ) % 360 - 180
+        price = np.round(rng.lognormal(7, 0.5, count), 2)
+        rooms = rng.integers(1, 7, count)
+        started = time.perf_counter()
+        Listing.objects.bulk_create(
+            (
+                Listing(
+                    owner=owner, title='Synthetic',
+                    latitude=float(latitude[i]),
+                    longitude=float(longitude[i]),
+                    price=f'{price[i]:.2f}', rooms=int(rooms[i]),
+                )
+                for i in range(count)
+            ),
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f'Generated {count} listings in '
+            f'{time.perf_counter() - started:.2f}s'
+        )
+
+        timings = np.empty(options['sample'])
+        for i in range(options['sample']):
+            lat, lon = cities[rng.integers(len(cities))] + rng.normal(
+                0, spread, 2
+            )
+            lat = float(np.clip(lat, -89, 89))
+            lon = float((lon + 180) % 360 - 180)
+            kwargs = {'max_price': float(np.round(rng.lognormal(7.3, 0.4)))}
+            if i % 2:
+                kwargs.update(point=(lat, lon), radius_km=5.0)
+            else:
+                kwargs['bbox'] = grid.bounding_box(lat, lon, 5)
+            started = time.perf_counter()
+            search.search(**kwargs)
+            timings[i] = time.perf_counter() - started
+        return timings
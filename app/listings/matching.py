@@ -0,0 +1,379 @@
+"""
+Rank listings for home seekers on NumPy column arrays.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from core import metrics
+from core.bus import bus
+from listings.grid import KM_PER_DEGREE
+from listings.models import Listing, Preference
+
+
+class Columns:
+    """
+    Column arrays of one store, `keys[i]` being the primary key of row
+    `i`. Rows not `alive` are free slots.
+
+    With `sort_by`, rows are also indexed in that column's order so
+    `between` is a binary search. Rows changed since the index was made
+    are kept in `recent` and always checked.
+    """
+
+    def __init__(self, keys, alive, arrays, sort_by=None):
+        self.keys = keys
+        self.alive = alive
+        self.arrays = arrays
+        self.sort_by = sort_by
+        self.order = self.sorted = None
+        self.recent = np.empty(0, np.int64)
+        if sort_by is not None:
+            self.sort()
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.alive.nbytes + sum(
+            array.nbytes for array in self.arrays.values()
+        )
+
+    def sort(self):
+        """Index every row in `sort_by` order, emptying `recent`."""
+        values = self.arrays[self.sort_by]
+        self.order = np.argsort(values, kind='stable')
+        self.sorted = values[self.order]
+        self.recent = np.empty(0, np.int64)
+
+    def touched(self, rows):
+        """Note rows whose `sort_by` value may have moved."""
+        if self.sort_by is None:
+            return
+        self.recent = np.union1d(self.recent, rows)
+        if len(self.recent) > settings.MATCHING_MAX_PENDING:
+            self.sort()
+
+    def between(self, low, high):
+        """Rows with a `sort_by` value from `low` to `high`, alive or not."""
+        values = self.arrays[self.sort_by]
+        if self.order is None:
+            return np.flatnonzero((values >= low) & (values <= high))
+        first = np.searchsorted(self.sorted, low, side='left')
+        last = np.searchsorted(self.sorted, high, side='right')
+        rows = self.order[first:last]
+        if len(self.recent):
+            # Indexed values of recently changed rows may be outdated
+            rows = np.union1d(rows, self.recent)
+            rows = rows[(values[rows] >= low) & (values[rows] <= high)]
+        return rows
+
+
+class ColumnStore:
+    """
+    Rows of a queryset as `Columns`, kept in memory by each worker.
+
+    Built on first use. Keys announced on the bus `topic` are reloaded
+    together on the next read, deleted or filtered out ones free their
+    row for reuse; a None key, or more than `MATCHING_MAX_PENDING`
+    changes, rebuilds everything. Updates happen in place, so a ranking
+    running meanwhile may see a row half way through its update: callers
+    recheck what they return against the database.
+    """
+    key = 'pk'
+    columns = {}
+    sort_by = None
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.data = None
+        self.rows = {}
+        self.free = []
+        self.size = 0
+        self.pending = set()
+        self.stale = False
+        self.stats = {'builds': 0, 'updates': 0, 'build_seconds': None}
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def changed(self, key=None):
+        with self.lock:
+            if key is None:
+                self.stale = True
+            else:
+                self.pending.add(int(key))
+
+    def load(self, queryset):
+        """Primary keys and column arrays of every row of `queryset`."""
+        rows = list(queryset.values_list(self.key, *self.columns))
+        keys = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+        return keys, {
+            name: np.fromiter(
+                (row[i] for row in rows), dtype, len(rows)
+            )
+            for i, (name, dtype) in enumerate(self.columns.items(), 1)
+        }
+
+    def build(self):
+        started = time.monotonic()
+        keys, arrays = self.load(self.get_queryset())
+        self.data = Columns(
+            keys, np.ones(len(keys), bool), arrays, self.sort_by
+        )
+        self.rows = dict(zip(keys.tolist(), range(len(keys))))
+        self.free = []
+        self.size = len(keys)
+        self.pending = set()
+        self.stale = False
+        self.stats['builds'] += 1
+        self.stats['build_seconds'] = round(time.monotonic() - started, 3)
+
+    def allocate(self):
+        """A free row, growing the arrays by half when full."""
+        if self.free:
+            return self.free.pop()
+        data = self.data
+        if self.size == len(data):
+            extra = max(len(data) // 2, 1024)
+            grown = Columns(
+                np.concatenate([data.keys, np.zeros(extra, np.int64)]),
+                np.concatenate([data.alive, np.zeros(extra, bool)]),
+                {
+                    name: np.concatenate(
+                        [array, np.zeros(extra, array.dtype)]
+                    )
+                    for name, array in data.arrays.items()
+                },
+            )
+            # New rows are only found through `recent` until resorted
+            grown.sort_by = data.sort_by
+            grown.order, grown.sorted = data.order, data.sorted
+            grown.recent = data.recent
+            self.data = data = grown
+        self.size += 1
+        return self.size - 1
+
+    def update(self, pending):
+        keys, arrays = self.load(
+            self.get_queryset().filter(**{f'{self.key}__in': pending})
+        )
+        for key in pending - set(keys.tolist()):
+            row = self.rows.pop(key, None)
+            if row is not None:
+                self.data.alive[row] = False
+                self.data.keys[row] = 0
+                self.free.append(row)
+        touched = []
+        for i, key in enumerate(keys.tolist()):
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = self.allocate()
+                self.data.keys[row] = key
+            for name, array in arrays.items():
+                self.data.arrays[name][row] = array[i]
+            self.data.alive[row] = True
+            touched.append(row)
+        self.data.touched(np.array(touched, np.int64))
+        self.stats['updates'] += len(pending)
+
+    def current(self):
+        """The `Columns` with every announced change applied."""
+        with self.lock:
+            if (
+                self.data is None or self.stale or
+                len(self.pending) > settings.MATCHING_MAX_PENDING
+            ):
+                self.build()
+            elif self.pending:
+                pending, self.pending = self.pending, set()
+                self.update(pending)
+            return self.data
+
+    def get(self, key):
+        """The values of one row by primary key, None if missing."""
+        data = self.current()
+        with self.lock:
+            row = self.rows.get(key)
+            if row is None:
+                return None
+            return {name: array[row] for name, array in data.arrays.items()}
+
+    def reset(self):
+        with self.lock:
+            self.data = None
+            self.rows = {}
+            self.pending = set()
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            if self.data is not None:
+                stats.update({
+                    'rows': len(self.rows),
+                    'capacity': len(self.data),
+                    'bytes': self.data.nbytes,
+                    'pending': len(self.pending),
+                })
+        return stats
+
+
+class ListingStore(ColumnStore):
+    """Active listings of active owners, indexed by latitude."""
+    sort_by = 'latitude'
+    columns = {
+        'latitude': np.float64,
+        'longitude': np.float64,
+        'price': np.float64,
+        'rooms': np.int16,
+    }
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.owners = set()
+
+    def get_queryset(self):
+        return Listing.objects.filter(
+            is_active=True,
+            owner__is_active=True,
+            owner__deleted_at__isnull=True,
+        )
+
+    def owner_changed(self, key=None):
+        """Reload the listings of an owner on their next read."""
+        with self.lock:
+            if key is None:
+                self.stale = True
+            else:
+                self.owners.add(int(key))
+
+    def current(self):
+        with self.lock:
+            owners, self.owners = self.owners, set()
+        if owners:
+            # Deactivated owners' listings drop out, reactivated ones return
+            keys = Listing.objects.filter(
+                owner_id__in=owners
+            ).values_list('pk', flat=True)
+            with self.lock:
+                self.pending.update(keys)
+        return super().current()
+
+    def reset(self):
+        super().reset()
+        with self.lock:
+            self.owners = set()
+
+
+class SeekerStore(ColumnStore):
+    """Preferences of active home seekers, by user id."""
+    key = 'user_id'
+    columns = {
+        'latitude': np.float64,
+        'longitude': np.float64,
+        'radius_km': np.float64,
+        'max_price': np.float64,
+        'min_rooms': np.int16,
+        'distance_weight': np.float64,
+        'price_weight': np.float64,
+        'rooms_weight': np.float64,
+    }
+
+    def get_queryset(self):
+        return Preference.objects.filter(
+            user__is_active=True,
+            user__deleted_at__isnull=True,
+            user__user_type='home_seeker',
+        )
+
+
+listings = ListingStore('listings')
+seekers = SeekerStore('seekers')
+bus.subscribe('listing', listings.changed)
+bus.subscribe('preference', seekers.changed)
+# Deactivated or deleted users drop out of the stores
+bus.subscribe('user', seekers.changed)
+bus.subscribe('user', listings.owner_changed)
+
+
+def snapshot():
+    return {
+        'listings': listings.snapshot(),
+        'seekers': seekers.snapshot(),
+    }
+
+
+metrics.register('matching', snapshot)
+
+
+def rank(columns, seeker, limit):
+    """
+    Row indexes and scores of the `limit` listings of `columns` best for
+    a `seeker` preference, best first.
+
+    The latitude band of the radius is a binary search on the sorted
+    index, leaving few candidates to filter by price and rooms, and only
+    those get distances and scores. The top `limit` are picked with
+    `argpartition` before sorting them. Scores go from 0 to 1 and weigh
+    closeness, cheapness and extra rooms.
+    """
+    latitude, longitude = seeker['latitude'], seeker['longitude']
+    radius = seeker['radius_km']
+    band = radius / KM_PER_DEGREE
+    rows = columns.between(latitude - band, latitude + band)
+    rows = rows[
+        columns.alive[rows] &
+        (columns['price'][rows] <= seeker['max_price']) &
+        (columns['rooms'][rows] >= seeker['min_rooms'])
+    ]
+
+    # Equirectangular distances, accurate enough at city scale
+    north = columns['latitude'][rows] - latitude
+    east = (columns['longitude'][rows] - longitude + 180) % 360 - 180
+    east *= np.cos(np.radians(latitude))
+    distance = KM_PER_DEGREE * np.hypot(north, east)
+    near = distance <= radius
+    rows, distance = rows[near], distance[near]
+
+    weights = np.array([
+        seeker['distance_weight'], seeker['price_weight'],
+        seeker['rooms_weight'],
+    ])
+    if not weights.sum():
+        weights = np.ones(3)
+    extra_rooms = columns['rooms'][rows] - seeker['min_rooms']
+    scores = (
+        weights[0] * (1 - distance / radius if radius else 1) +
+        weights[1] * (
+            1 - columns['price'][rows] / seeker['max_price']
+            if seeker['max_price'] else 1
+        ) +
+        weights[2] * extra_rooms / (extra_rooms + 1)
+    ) / weights.sum()
+
+    if len(rows) > limit:
+        best = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        best = np.arange(len(rows))
+    best = best[np.argsort(-scores[best], kind='stable')]
+    return rows[best], scores[best]
+
+
+def recommend(user_id, limit):
+    """
+    Listing ids and scores best for a home seeker, best first, or None
+    without preferences.
+    """
+    seeker = seekers.get(user_id)
+    if seeker is None:
+        return None
+    columns = listings.current()
+    rows, scores = rank(columns, seeker, limit)
+    return columns.keys[rows].tolist(), scores.tolist()
@@ -0,0 +1,137 @@
+"""
+Database models for property listings.
+"""
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models
+
+from core.bus import bus
+from listings import grid
+
+
+class ListingQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill in the grid cells `save` would have set."""
+        objs = list(objs)
+        for listing in objs:
+            listing.cell = grid.cell_of(listing.latitude, listing.longitude)
+        created = super().bulk_create(objs, *args, **kwargs)
+        # bulk_create sends no signals
+        bus.publish('listing')
+        return created
+
+
+class Listing(models.Model):
+    """
+    A home a property owner offers.
+
+    `cell` is the `listings.grid` cell of the location, kept by `save`, so
+    location searches are B-tree range scans over (cell, price, id).
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='listings',
+        # Covered by `listing_owner_idx`
+        db_index=False,
+    )
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    address = models.CharField(max_length=255, blank=True)
+    latitude = models.FloatField(
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    cell = models.IntegerField(editable=False)
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2,
+        validators=[MinValueValidator(0)],
+    )
+    rooms = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1)]
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ListingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Searches by location: one range of cells per grid row
+            models.Index(
+                fields=['cell', 'price', 'id'],
+                name='listing_cell_price_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # Searches without a location, and boxes too wide for cells
+            models.Index(
+                fields=['price', 'id'],
+                name='listing_price_idx',
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=['owner', 'id'],
+                name='listing_owner_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.cell = grid.cell_of(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and (
+            {'latitude', 'longitude'} & set(update_fields)
+        ):
+            kwargs['update_fields'] = {*update_fields, 'cell'}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.title
+
+
+class Preference(models.Model):
+    """
+    What a home seeker looks for, matched against listings by
+    `listings.matching`.
+
+    Listings farther than `radius_km`, dearer than `max_price` or with
+    fewer than `min_rooms` are left out; the weights rank the others by
+    closeness, cheapness and extra rooms.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='listing_preference',
+    )
+    latitude = models.FloatField(
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    radius_km = models.FloatField(
+        default=10,
+        validators=[MinValueValidator(0.1), MaxValueValidator(100)],
+    )
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2,
+        validators=[MinValueValidator(0)],
+    )
+    min_rooms = models.PositiveSmallIntegerField(default=1)
+    distance_weight = models.FloatField(
+        default=1, validators=[MinValueValidator(0), MaxValueValidator(10)]
+    )
+    price_weight = models.FloatField(
+        default=1, validators=[MinValueValidator(0), MaxValueValidator(10)]
+    )
+    rooms_weight = models.FloatField(
+        default=1, validators=[MinValueValidator(0), MaxValueValidator(10)]
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Preference of {self.user_id}'
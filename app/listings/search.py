@@ -0,0 +1,111 @@
+"""
+Listing search by location, price and rooms with keyset pagination.
+"""
+import base64
+import binascii
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+from listings import grid
+from listings.models import Listing
+
+
+def encode_cursor(listing):
+    """Opaque cursor pointing just after `listing` in price order."""
+    raw = f'{listing.price}|{listing.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (price, id) pair of a cursor or raise ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        price, pk = raw.rsplit('|', 1)
+        return Decimal(price), int(pk)
+    except (binascii.Error, UnicodeDecodeError, InvalidOperation,
+            ValueError):
+        raise ValueError('Invalid cursor.')
+
+
+def within_box(queryset, south, west, north, east):
+    """
+    Listings inside a bounding box.
+
+    Boxes spanning at most `LISTING_SEARCH_MAX_CELL_ROWS` grid rows are
+    looked up by cell ranges; wider ones scan by price, as the cells
+    would then cover a large part of the table anyway. The exact bounds
+    drop what the edge cells hold outside the box.
+    """
+    if grid.row_of(north) - grid.row_of(south) < (
+        settings.LISTING_SEARCH_MAX_CELL_ROWS
+    ):
+        queryset = queryset.filter(reduce(or_, [
+            Q(cell__range=cells)
+            for cells in grid.cell_ranges(south, west, north, east)
+        ]))
+    queryset = queryset.filter(latitude__range=(south, north))
+    if west <= east:
+        return queryset.filter(longitude__range=(west, east))
+    return queryset.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+
+
+def distance_km(latitude, longitude):
+    """Haversine distance from a point, as a database expression."""
+    half_lat = (Radians(F('latitude')) - Radians(latitude)) / 2
+    half_lon = (Radians(F('longitude')) - Radians(longitude)) / 2
+    return 2 * grid.EARTH_RADIUS_KM * ASin(Sqrt(
+        Power(Sin(half_lat), 2) +
+        Cos(Radians(latitude)) * Cos(Radians(F('latitude'))) *
+        Power(Sin(half_lon), 2)
+    ))
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """Listings at most `radius_km` from a point, with their `distance`."""
+    queryset = within_box(
+        queryset, *grid.bounding_box(latitude, longitude, radius_km)
+    )
+    return queryset.annotate(
+        distance=distance_km(latitude, longitude)
+    ).filter(distance__lte=radius_km)
+
+
+def search(bbox=None, point=None, radius_km=None, min_price=None,
+           max_price=None, min_rooms=None, max_rooms=None, after=None,
+           limit=50):
+    """
+    Return up to `limit` active listings of active owners matching every
+    filter given, cheapest first, after the (price, id) position `after`,
+    and whether more follow.
+    """
+    queryset = Listing.objects.filter(
+        is_active=True,
+        owner__is_active=True,
+        owner__deleted_at__isnull=True,
+    )
+    if bbox is not None:
+        queryset = within_box(queryset, *bbox)
+    if point is not None:
+        queryset = within_radius(queryset, *point, radius_km)
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+    if min_rooms is not None:
+        queryset = queryset.filter(rooms__gte=min_rooms)
+    if max_rooms is not None:
+        queryset = queryset.filter(rooms__lte=max_rooms)
+    if after is not None:
+        price, pk = after
+        # The redundant bound lets the index drive the scan, as in
+        # `user.changes.changes_after`
+        queryset = queryset.filter(price__gte=price).filter(
+            Q(price__gt=price) | Q(id__gt=pk)
+        )
+    listings = list(queryset.order_by('price', 'id')[:limit + 1])
+    return listings[:limit], len(listings) > limit
@@ -0,0 +1,139 @@
+"""
+Serializers for the listings API View
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from listings import search
+from listings.models import Listing, Preference
+
+
+class ListingSerializer(serializers.ModelSerializer):
+    """Serializer for the listings of their owner."""
+
+    class Meta:
+        model = Listing
+        fields = [
+            'id', 'title', 'description', 'address', 'latitude',
+            'longitude', 'price', 'rooms', 'is_active', 'created_at',
+            'updated_at',
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class ListingSearchResultSerializer(serializers.ModelSerializer):
+    """Serializer for listings found by a search."""
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Listing
+        fields = [
+            'id', 'owner', 'title', 'description', 'address', 'latitude',
+            'longitude', 'price', 'rooms', 'distance',
+        ]
+        read_only_fields = fields
+
+
+class ListingRecommendationSerializer(serializers.ModelSerializer):
+    """Serializer for listings recommended to a home seeker."""
+    score = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Listing
+        fields = [
+            'id', 'owner', 'title', 'description', 'address', 'latitude',
+            'longitude', 'price', 'rooms', 'score',
+        ]
+        read_only_fields = fields
+
+
+class PreferenceSerializer(serializers.ModelSerializer):
+    """Serializer for the listing preferences of a home seeker."""
+
+    class Meta:
+        model = Preference
+        fields = [
+            'latitude', 'longitude', 'radius_km', 'max_price', 'min_rooms',
+            'distance_weight', 'price_weight', 'rooms_weight', 'updated_at',
+        ]
+        read_only_fields = ['updated_at']
+
+
+class ListingSearchSerializer(serializers.Serializer):
+    """
+    Serializer for search filters.
+
+    A location is either a whole bounding box (`south`, `west`, `north`,
+    `east`; `west > east` crosses the antimeridian) or a circle (`lat`,
+    `lon`, `radius` in km).
+    """
+    south = serializers.FloatField(min_value=-90, max_value=90,
+                                   required=False)
+    west = serializers.FloatField(min_value=-180, max_value=180,
+                                  required=False)
+    north = serializers.FloatField(min_value=-90, max_value=90,
+                                   required=False)
+    east = serializers.FloatField(min_value=-180, max_value=180,
+                                  required=False)
+    lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    lon = serializers.FloatField(min_value=-180, max_value=180,
+                                 required=False)
+    radius = serializers.FloatField(min_value=0, required=False)
+    min_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False
+    )
+    max_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False
+    )
+    min_rooms = serializers.IntegerField(min_value=0, required=False)
+    max_rooms = serializers.IntegerField(min_value=0, required=False)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+    BOX = ['south', 'west', 'north', 'east']
+    CIRCLE = ['lat', 'lon', 'radius']
+
+    def validate_radius(self, value):
+        limit = settings.LISTING_SEARCH_MAX_RADIUS_KM
+        if value > limit:
+            raise serializers.ValidationError(f'At most {limit} km.')
+        return value
+
+    def validate_cursor(self, value):
+        try:
+            return search.decode_cursor(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_limit(self, value):
+        return min(value, settings.LISTING_SEARCH_MAX_LIMIT)
+
+    def validate(self, attrs):
+        for group in (self.BOX, self.CIRCLE):
+            given = [name for name in group if name in attrs]
+            if given and len(given) < len(group):
+                raise serializers.ValidationError(
+                    f'Provide all of {", ".join(group)} or none.'
+                )
+        if 'south' in attrs and attrs['south'] > attrs['north']:
+            raise serializers.ValidationError(
+                'south must not be above north.'
+            )
+        return attrs
+
+    def search_kwargs(self):
+        """Keyword arguments of `listings.search.search`."""
+        data = self.validated_data
+        kwargs = {
+            name: data[name]
+            for name in ['min_price', 'max_price', 'min_rooms', 'max_rooms']
+            if name in data
+        }
+        if 'south' in data:
+            kwargs['bbox'] = tuple(data[name] for name in self.BOX)
+        if 'lat' in data:
+            kwargs['point'] = (data['lat'], data['lon'])
+            kwargs['radius_km'] = data['radius']
+        kwargs['after'] = data.get('cursor')
+        kwargs['limit'] = data.get('limit', 50)
+        return kwargs
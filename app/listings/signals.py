@@ -0,0 +1,21 @@
+"""
+Signal handlers for the listings app.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.bus import bus
+from listings.models import Listing, Preference
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def publish_listing(sender, instance, **kwargs):
+    """Refresh the listing in the matching stores of every worker."""
+    bus.publish('listing', instance.pk)
+
+
+@receiver(post_save, sender=Preference)
+@receiver(post_delete, sender=Preference)
+def publish_preference(sender, instance, **kwargs):
+    bus.publish('preference', instance.pk)
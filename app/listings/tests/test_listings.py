@@ -0,0 +1,274 @@
+"""
+Tests for listings and their search.
+"""
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from listings import grid
+from listings.models import Listing
+from user.user_factory import UserFactory
+
+LISTINGS_URL = reverse('listings:listing-list')
+SEARCH_URL = reverse('listings:listing-search')
+
+
+def detail_url(listing_id):
+    return reverse('listings:listing-detail', args=[listing_id])
+
+
+@pytest.fixture
+def owner(db):
+    return UserFactory(user_type='property_owner')
+
+
+@pytest.fixture
+def owner_client(owner):
+    client = APIClient()
+    client.force_authenticate(user=owner)
+    return client
+
+
+@pytest.fixture
+def seeker_client(db):
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='home_seeker'))
+    return client
+
+
+def make_listing(owner, latitude, longitude, price=1000, rooms=2, **kwargs):
+    return Listing.objects.create(
+        owner=owner, title='Flat', latitude=latitude, longitude=longitude,
+        price=price, rooms=rooms, **kwargs
+    )
+
+
+def ids(res):
+    return [listing['id'] for listing in res.data['results']]
+
+
+def test_cells_and_ranges():
+    """Test cells are numbered row by row and boxes become row ranges."""
+    assert grid.cell_of(-90, -180) == 0
+    assert grid.cell_of(-90, -179.995) == 0
+    assert grid.cell_of(-89.99, -180) == grid.COLUMNS
+    assert grid.cell_of(90, 180) == grid.ROWS * grid.COLUMNS - 1
+
+    ranges = grid.cell_ranges(0, 10, 0.015, 10.025)
+    assert len(ranges) == 2
+    assert ranges[1][0] - ranges[0][0] == grid.COLUMNS
+    assert ranges[0][1] - ranges[0][0] == 2
+
+    wrapped = grid.cell_ranges(0, 179.99, 0, -179.99)
+    assert wrapped == [
+        (grid.cell_of(0, 179.99), grid.cell_of(0, 180)),
+        (grid.cell_of(0, -180), grid.cell_of(0, -179.99)),
+    ]
+
+
+def test_bounding_box():
+    """Test circle boxes widen with latitude and wrap or cover poles."""
+    south, west, north, east = grid.bounding_box(0, 0, grid.KM_PER_DEGREE)
+    assert (south, north) == pytest.approx((-1, 1))
+    assert (west, east) == pytest.approx((-1, 1), rel=1e-3)
+
+    _, west, _, east = grid.bounding_box(60, 0, grid.KM_PER_DEGREE)
+    assert east > 2
+
+    _, west, _, east = grid.bounding_box(0, 179.5, grid.KM_PER_DEGREE)
+    assert west > east
+
+    assert grid.bounding_box(89.5, 0, 100)[1::2] == (-180, 180)
+
+
+@pytest.mark.django_db
+def test_cells_are_kept_on_save_and_bulk_create(owner):
+    """Test the grid cell follows the location."""
+    listing = make_listing(owner, 30.05, 31.23)
+    assert listing.cell == grid.cell_of(30.05, 31.23)
+
+    listing.latitude = 29.97
+    listing.save(update_fields=['latitude'])
+    listing.refresh_from_db()
+    assert listing.cell == grid.cell_of(29.97, 31.23)
+
+    [bulk] = Listing.objects.bulk_create([
+        Listing(owner=owner, title='Bulk', latitude=1, longitude=2,
+                price=1, rooms=1),
+    ])
+    assert Listing.objects.get(pk=bulk.pk).cell == grid.cell_of(1, 2)
+
+
+def test_owner_manages_own_listings(owner_client, owner):
+    """Test property owners create, list and update only their listings."""
+    res = owner_client.post(LISTINGS_URL, {
+        'title': 'Nile view', 'latitude': 30.05, 'longitude': 31.23,
+        'price': '1500.00', 'rooms': 3,
+    })
+    assert res.status_code == status.HTTP_201_CREATED
+    listing = Listing.objects.get(pk=res.data['id'])
+    assert listing.owner == owner
+    other = make_listing(UserFactory(user_type='property_owner'), 0, 0)
+
+    res = owner_client.get(LISTINGS_URL)
+    assert [row['id'] for row in res.data['results']] == [listing.pk]
+
+    res = owner_client.patch(detail_url(listing.pk), {'is_active': False})
+    assert res.status_code == status.HTTP_200_OK
+    assert owner_client.get(detail_url(other.pk)).status_code == (
+        status.HTTP_404_NOT_FOUND
+    )
+
+
+def test_listing_rejects_bad_locations(owner_client):
+    """Test coordinates are validated."""
+    res = owner_client.post(LISTINGS_URL, {
+        'title': 'Nowhere', 'latitude': 91, 'longitude': 0,
+        'price': '1', 'rooms': 1,
+    })
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'latitude' in res.data
+
+
+def test_roles_are_enforced(owner_client, seeker_client):
+    """Test only owners manage listings and only seekers search."""
+    assert seeker_client.get(LISTINGS_URL).status_code == (
+        status.HTTP_403_FORBIDDEN
+    )
+    assert owner_client.get(SEARCH_URL).status_code == (
+        status.HTTP_403_FORBIDDEN
+    )
+
+
+def test_search_box_and_filters(seeker_client, owner):
+    """Test a box search applies price and room filters, cheapest first."""
+    cheap = make_listing(owner, 30.05, 31.23, price=900, rooms=2)
+    dear = make_listing(owner, 30.06, 31.24, price=2000, rooms=4)
+    make_listing(owner, 30.07, 31.25, price=1200, rooms=1)
+    make_listing(owner, 31.5, 31.23, price=800, rooms=2)
+    make_listing(owner, 30.05, 31.23, price=700, rooms=2, is_active=False)
+    box = {'south': 30, 'west': 31.2, 'north': 30.1, 'east': 31.3}
+
+    res = seeker_client.get(SEARCH_URL, {**box, 'min_rooms': 2})
+    assert res.status_code == status.HTTP_200_OK
+    assert ids(res) == [cheap.pk, dear.pk]
+
+    res = seeker_client.get(SEARCH_URL, {**box, 'max_price': '1500'})
+    assert len(ids(res)) == 2
+    assert cheap.pk in ids(res)
+
+
+def test_search_hides_listings_of_inactive_owners(seeker_client, owner):
+    """Test deactivated and deleted owners' listings are not found."""
+    listing = make_listing(owner, 30, 31)
+    banned = UserFactory(user_type='property_owner', is_active=False)
+    make_listing(banned, 30, 31)
+    deleted = UserFactory(user_type='property_owner')
+    make_listing(deleted, 30, 31)
+    deleted.soft_delete()
+
+    res = seeker_client.get(SEARCH_URL)
+
+    assert ids(res) == [listing.pk]
+
+
+def test_search_box_across_antimeridian(seeker_client, owner):
+    """Test a box with west > east wraps around longitude 180."""
+    east = make_listing(owner, -17, 179.5)
+    west = make_listing(owner, -17, -179.5)
+    make_listing(owner, -17, 0)
+
+    res = seeker_client.get(SEARCH_URL, {
+        'south': -18, 'west': 179, 'north': -16, 'east': -179,
+    })
+
+    assert sorted(ids(res)) == sorted([east.pk, west.pk])
+
+
+def test_search_radius(seeker_client, owner):
+    """Test radius searches drop the box corners and return distances."""
+    center = make_listing(owner, 30.0, 31.0)
+    near = make_listing(owner, 30.05, 31.0)
+    # In the bounding box of a 10 km circle but about 12 km away
+    make_listing(owner, 30.08, 31.08)
+
+    res = seeker_client.get(SEARCH_URL, {'lat': 30, 'lon': 31, 'radius': 10})
+
+    assert sorted(ids(res)) == sorted([center.pk, near.pk])
+    distances = {row['id']: row['distance'] for row in res.data['results']}
+    assert distances[center.pk] == pytest.approx(0, abs=1e-6)
+    assert distances[near.pk] == pytest.approx(5.56, abs=0.01)
+
+
+def test_wide_box_matches_cell_search(seeker_client, owner, settings):
+    """Test boxes too wide for cell lookups find the same listings."""
+    inside = [make_listing(owner, lat, 31) for lat in (20, 25, 29.9)]
+    make_listing(owner, 35, 31)
+    box = {'south': 19, 'west': 30, 'north': 30, 'east': 32}
+
+    by_cells = ids(seeker_client.get(SEARCH_URL, box))
+    settings.LISTING_SEARCH_MAX_CELL_ROWS = 1
+    by_price = ids(seeker_client.get(SEARCH_URL, box))
+
+    assert by_cells == by_price == [listing.pk for listing in inside]
+
+
+def test_search_pages_with_cursor(seeker_client, owner):
+    """Test keyset pages cover ties on price once each."""
+    listings = [
+        make_listing(owner, 30, 31, price=price)
+        for price in (500, 500, 500, 700, 900)
+    ]
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        res = seeker_client.get(SEARCH_URL, params)
+        seen += ids(res)
+        cursor = res.data['next_cursor']
+        if not res.data['has_more']:
+            break
+
+    assert seen == [listing.pk for listing in listings]
+    assert Decimal(res.data['results'][-1]['price']) == 900
+
+
+@pytest.mark.parametrize('params', [
+    {'south': 1, 'west': 1, 'north': 2},
+    {'south': 2, 'west': 1, 'north': 1, 'east': 2},
+    {'lat': 1, 'lon': 1},
+    {'lat': 1, 'lon': 1, 'radius': 10000},
+    {'cursor': 'nonsense'},
+])
+def test_search_rejects_bad_filters(seeker_client, params):
+    """Test partial locations, oversized circles and bad cursors."""
+    res = seeker_client.get(SEARCH_URL, params)
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_search_benchmark_command():
+    """Test the benchmark reports percentiles and leaves no rows."""
+    out = StringIO()
+    call_command(
+        'search_benchmark', listings=500, sample=10, max_p99_ms=10000,
+        stdout=out,
+    )
+
+    assert 'Generated 500 listings' in out.getvalue()
+    assert 'p99' in out.getvalue()
+    assert not Listing.objects.exists()
+    with pytest.raises(CommandError):
+        call_command(
+            'search_benchmark', listings=10, sample=2, max_p99_ms=0,
+            stdout=StringIO(),
+        )
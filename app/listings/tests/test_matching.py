@@ -0,0 +1,270 @@
+"""
+Tests for the listing matching engine.
+"""
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from listings import matching
+from listings.models import Listing, Preference
+from user.user_factory import UserFactory
+
+PREFERENCES_URL = reverse('listings:listing-preferences')
+RECOMMENDATIONS_URL = reverse('listings:listing-recommendations')
+
+SEEKER = {
+    'latitude': 30.0, 'longitude': 31.0, 'radius_km': 10.0,
+    'max_price': 2000.0, 'min_rooms': 2, 'distance_weight': 1.0,
+    'price_weight': 1.0, 'rooms_weight': 1.0,
+}
+
+
+@pytest.fixture
+def owner(db):
+    return UserFactory(user_type='property_owner')
+
+
+@pytest.fixture
+def seeker(db):
+    return UserFactory(user_type='home_seeker')
+
+
+@pytest.fixture
+def seeker_client(seeker):
+    client = APIClient()
+    client.force_authenticate(user=seeker)
+    return client
+
+
+def make_listing(owner, latitude=30.0, longitude=31.0, price=1000, rooms=2,
+                 **kwargs):
+    return Listing.objects.create(
+        owner=owner, title='Flat', latitude=latitude, longitude=longitude,
+        price=price, rooms=rooms, **kwargs
+    )
+
+
+def make_preference(user, **kwargs):
+    values = {
+        name: value for name, value in SEEKER.items()
+        if name not in kwargs
+    }
+    return Preference.objects.create(user=user, **values, **kwargs)
+
+
+def random_columns(rng, count):
+    return matching.Columns(
+        np.arange(1, count + 1, dtype=np.int64), np.ones(count, bool), {
+            'latitude': 30 + rng.normal(0, 0.1, count),
+            'longitude': 31 + rng.normal(0, 0.1, count),
+            'price': rng.uniform(500, 3000, count),
+            'rooms': rng.integers(1, 6, count).astype(np.int16),
+        }, 'latitude',
+    )
+
+
+def brute_force(columns, seeker):
+    """Score every listing one by one, the slow way."""
+    scored = []
+    for row in range(len(columns)):
+        north = columns['latitude'][row] - seeker['latitude']
+        east = (columns['longitude'][row] - seeker['longitude']) * np.cos(
+            np.radians(seeker['latitude'])
+        )
+        distance = matching.KM_PER_DEGREE * np.hypot(north, east)
+        price, rooms = columns['price'][row], columns['rooms'][row]
+        if (
+            distance > seeker['radius_km'] or
+            price > seeker['max_price'] or rooms < seeker['min_rooms']
+        ):
+            continue
+        extra = rooms - seeker['min_rooms']
+        scored.append(((
+            1 - distance / seeker['radius_km'] +
+            1 - price / seeker['max_price'] +
+            extra / (extra + 1)
+        ) / 3, row))
+    return sorted(scored, key=lambda pair: -pair[0])
+
+
+def test_rank_matches_brute_force():
+    """Test vectorized top-k ranking agrees with scoring one by one."""
+    columns = random_columns(np.random.default_rng(1), 5000)
+
+    rows, scores = matching.rank(columns, SEEKER, 25)
+
+    expected = brute_force(columns, SEEKER)
+    assert len(expected) > 25
+    assert rows.tolist() == [row for _, row in expected[:25]]
+    assert scores == pytest.approx([score for score, _ in expected[:25]])
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_rank_skips_free_rows_and_sees_recent_changes():
+    """Test dead rows are ignored and moved rows are found again."""
+    columns = random_columns(np.random.default_rng(2), 1000)
+    best = matching.rank(columns, SEEKER, 1)[0][0]
+
+    columns.alive[best] = False
+    assert best not in matching.rank(columns, SEEKER, 1000)[0]
+
+    far = int(np.argmax(columns['latitude'] - 30))
+    columns['latitude'][far] = 30.0
+    columns['longitude'][far] = 31.0
+    columns['price'][far] = 0
+    columns['rooms'][far] = 5
+    columns.touched(np.array([far]))
+    assert matching.rank(columns, SEEKER, 1)[0][0] == far
+
+
+def test_store_updates_rows_incrementally(owner):
+    """Test changes reload single rows and deletes free their slot."""
+    listings = [make_listing(owner, price=price) for price in (900, 1100)]
+    store = matching.listings
+    store.current()
+    builds = store.stats['builds']
+
+    make_listing(owner, price=800)
+    listings[0].price = 1500
+    listings[0].save()
+    listings[1].delete()
+    columns = store.current()
+
+    assert store.stats['builds'] == builds
+    assert sorted(columns.keys[columns.alive].tolist()) == sorted(
+        Listing.objects.values_list('pk', flat=True)
+    )
+    assert columns['price'][store.rows[listings[0].pk]] == 1500
+    # The new listing took the row of the deleted one
+    assert len(columns) == 2
+
+    make_listing(owner, is_active=False)
+    store.current()
+    assert len(store.rows) == 2
+
+
+def test_store_grows_and_rebuilds(owner, settings):
+    """Test arrays grow for new rows and many changes rebuild."""
+    settings.MATCHING_MAX_PENDING = 5
+    make_listing(owner)
+    store = matching.listings
+    store.current()
+    builds = store.stats['builds']
+
+    for _ in range(3):
+        make_listing(owner)
+    assert len(store.current()) > 4
+    assert store.stats['builds'] == builds
+
+    Listing.objects.bulk_create([
+        Listing(owner=owner, title='Bulk', latitude=30, longitude=31,
+                price=1, rooms=1)
+        for _ in range(3)
+    ])
+    assert len(store.current().keys) == 7
+    assert store.stats['builds'] == builds + 1
+
+
+def test_preferences_are_created_and_updated(seeker_client, seeker):
+    """Test the first PUT creates preferences and PATCH changes them."""
+    assert seeker_client.get(PREFERENCES_URL).status_code == (
+        status.HTTP_404_NOT_FOUND
+    )
+
+    res = seeker_client.put(PREFERENCES_URL, {
+        'latitude': 30, 'longitude': 31, 'max_price': '1500',
+    })
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['radius_km'] == 10
+
+    res = seeker_client.patch(PREFERENCES_URL, {'min_rooms': 3})
+    assert res.status_code == status.HTTP_200_OK
+    assert Preference.objects.get(user=seeker).min_rooms == 3
+
+
+def test_recommendations_rank_listings(seeker_client, seeker, owner):
+    """Test listings come best first and follow preference changes."""
+    far = make_listing(owner, latitude=30.08, price=500, rooms=2)
+    near = make_listing(owner, price=1000, rooms=3)
+    make_listing(owner, price=2500)
+    make_listing(owner, rooms=1)
+    make_preference(seeker)
+
+    res = seeker_client.get(RECOMMENDATIONS_URL)
+
+    assert res.status_code == status.HTTP_200_OK
+    assert [row['id'] for row in res.data['results']] == [near.pk, far.pk]
+    assert 0 < res.data['results'][1]['score'] < (
+        res.data['results'][0]['score']
+    )
+
+    seeker_client.patch(PREFERENCES_URL, {'radius_km': 5})
+    res = seeker_client.get(RECOMMENDATIONS_URL, {'limit': 5})
+    assert [row['id'] for row in res.data['results']] == [near.pk]
+
+
+def test_recommendations_drop_listings_of_deactivated_owners(
+    seeker_client, seeker, owner
+):
+    """Test listings the store still holds are rechecked."""
+    make_listing(owner)
+    make_preference(seeker)
+    assert len(seeker_client.get(RECOMMENDATIONS_URL).data['results']) == 1
+    owner.is_active = False
+    owner.save()
+
+    res = seeker_client.get(RECOMMENDATIONS_URL)
+
+    assert res.data['results'] == []
+
+
+def test_store_follows_owner_deactivation(owner):
+    """Test owners' listings leave and rejoin the store with them."""
+    listing = make_listing(owner)
+    store = matching.listings
+    store.current()
+    builds = store.stats['builds']
+
+    owner.is_active = False
+    owner.save()
+    store.current()
+    assert listing.pk not in store.rows
+
+    owner.is_active = True
+    owner.save()
+    columns = store.current()
+    assert columns.alive[store.rows[listing.pk]]
+    assert store.stats['builds'] == builds
+
+
+def test_recommendations_need_preferences_and_role(seeker_client, owner):
+    """Test seekers set preferences first and other roles are refused."""
+    assert seeker_client.get(RECOMMENDATIONS_URL).status_code == (
+        status.HTTP_404_NOT_FOUND
+    )
+
+    client = APIClient()
+    client.force_authenticate(user=owner)
+    assert client.get(RECOMMENDATIONS_URL).status_code == (
+        status.HTTP_403_FORBIDDEN
+    )
+    assert client.get(PREFERENCES_URL).status_code == (
+        status.HTTP_403_FORBIDDEN
+    )
+
+
+def test_matching_benchmark_command():
+    """Test the benchmark reports latency percentiles."""
+    out = StringIO()
+    call_command(
+        'matching_benchmark', listings=2000, seekers=100, sample=20,
+        stdout=out,
+    )
+
+    assert 'Generated 2000 listings' in out.getvalue()
+    assert 'p99' in out.getvalue()
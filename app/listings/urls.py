@@ -0,0 +1,31 @@
+"""
+URL mappings for the listings API.
+"""
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from listings import views
+
+app_name = 'listings'
+
+router = DefaultRouter()
+router.register('listings', views.ListingViewSet, basename='listing')
+
+urlpatterns = [
+    path(
+        'listings/search/',
+        views.ListingSearchView.as_view(),
+        name='listing-search',
+    ),
+    path(
+        'listings/recommendations/',
+        views.RecommendationView.as_view(),
+        name='listing-recommendations',
+    ),
+    path(
+        'listings/preferences/',
+        views.PreferenceView.as_view(),
+        name='listing-preferences',
+    ),
+    path('', include(router.urls)),
+]
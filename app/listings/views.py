@@ -0,0 +1,132 @@
+"""
+Views for the listings API.
+"""
+from django.conf import settings
+from django.http import Http404
+from rest_framework import generics, status, viewsets
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from core.budget import query_budget
+from listings import matching, search
+from listings.models import Listing, Preference
+from listings.serializers import (
+    ListingRecommendationSerializer,
+    ListingSearchResultSerializer,
+    ListingSearchSerializer,
+    ListingSerializer,
+    PreferenceSerializer,
+)
+from user.authentication import CachedJWTAuthentication
+from user.permissions import IsHomeSeeker, IsPropertyOwner
+
+
+class ListingPagination(CursorPagination):
+    """Keyset pagination, newest listings first."""
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
+
+
+@query_budget(queries=6, seconds=0.5)
+class ListingViewSet(viewsets.ModelViewSet):
+    """Create and manage the listings of a property owner."""
+    serializer_class = ListingSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsPropertyOwner]
+    pagination_class = ListingPagination
+
+    def get_queryset(self):
+        return Listing.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+@query_budget(queries=4, seconds=0.05)
+class ListingSearchView(generics.GenericAPIView):
+    """
+    Search active listings for home seekers, cheapest first.
+
+    Filters: a bounding box (`south`, `west`, `north`, `east`) or a
+    circle (`lat`, `lon`, `radius` km), `min_price`, `max_price`,
+    `min_rooms` and `max_rooms`. Pass back `next_cursor` as `cursor` for
+    the next page.
+    """
+    serializer_class = ListingSearchResultSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsHomeSeeker]
+
+    def get(self, request):
+        filters = ListingSearchSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        listings, has_more = search.search(**filters.search_kwargs())
+        if listings:
+            next_cursor = search.encode_cursor(listings[-1])
+        else:
+            next_cursor = request.query_params.get('cursor')
+        return Response({
+            'results': self.get_serializer(listings, many=True).data,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        })
+
+
+@query_budget(queries=6, seconds=0.5)
+class PreferenceView(generics.RetrieveUpdateAPIView):
+    """Manage the listing preferences of the authenticated home seeker."""
+    serializer_class = PreferenceSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsHomeSeeker]
+
+    def get_object(self):
+        try:
+            return Preference.objects.get(user=self.request.user)
+        except Preference.DoesNotExist:
+            if self.request.method == 'GET':
+                raise Http404
+            # The first PUT creates them
+            return Preference(user=self.request.user)
+
+
+@query_budget(queries=4, seconds=0.5)
+class RecommendationView(generics.GenericAPIView):
+    """
+    Listings best matching the preferences of the authenticated home
+    seeker, best first, at most `limit`.
+
+    Ranking runs on the in-memory `listings.matching` stores; only the
+    listings picked are read from the database.
+    """
+    serializer_class = ListingRecommendationSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsHomeSeeker]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
+        limit = min(max(limit, 1), settings.MATCHING_MAX_LIMIT)
+        ranked = matching.recommend(request.user.pk, limit)
+        if ranked is None:
+            return Response(
+                {'detail': 'Set your listing preferences first.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        ids, scores = ranked
+        # Listings deactivated since the store last heard of them drop out
+        found = Listing.objects.filter(
+            is_active=True,
+            owner__is_active=True,
+            owner__deleted_at__isnull=True,
+        ).in_bulk(ids)
+        listings = []
+        for pk, score in zip(ids, scores):
+            if pk in found:
+                found[pk].score = round(score, 6)
+                listings.append(found[pk])
+        return Response({
+            'results': self.get_serializer(listings, many=True).data,
+        })
@@ -0,0 +1,24 @@
+"""
+Django admin customization
+"""
+from django.contrib import admin
+
+from outbox import models
+
+
+class EventAdmin(admin.ModelAdmin):
+    """Define the admin pages for outbox events."""
+    ordering = ['-id']
+    list_display = [
+        'id', 'type', 'user_id', 'partition', 'attempts', 'created_at',
+        'dispatched_at',
+    ]
+    list_filter = ['type', 'partition']
+    search_fields = ['user_id']
+    readonly_fields = [
+        'created_at', 'attempts', 'next_attempt_at', 'last_error',
+        'dispatched_at',
+    ]
+
+
+admin.site.register(models.Event, EventAdmin)
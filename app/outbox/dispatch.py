@@ -0,0 +1,281 @@
+"""
+Deliver outbox events to sinks, partition by partition.
+"""
+import logging
+import math
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from outbox.models import Event
+
+logger = logging.getLogger(__name__)
+
+# First key of the `pg_try_advisory_lock(int, int)` partition locks
+LOCK_NAMESPACE = 0x0b0c
+# First key of the locks each live dispatcher holds one of
+MEMBER_NAMESPACE = 0x0b0d
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts`, with jitter."""
+    delay = min(
+        settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.OUTBOX_RETRY_BACKOFF_MAX,
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+def try_lock(partition):
+    """Own a partition for this database session, False if taken."""
+    if connection.vendor != 'postgresql':
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_try_advisory_lock(%s, %s)', [LOCK_NAMESPACE, partition]
+        )
+        return cursor.fetchone()[0]
+
+
+def unlock(partition):
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_unlock(%s, %s)', [LOCK_NAMESPACE, partition]
+        )
+
+
+def join():
+    """Register this session as a live dispatcher, return its slot."""
+    if connection.vendor != 'postgresql':
+        return 0
+    slot = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                'SELECT pg_try_advisory_lock(%s, %s)', [MEMBER_NAMESPACE, slot]
+            )
+            if cursor.fetchone()[0]:
+                return slot
+            slot += 1
+
+
+def leave(slot):
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_unlock(%s, %s)', [MEMBER_NAMESPACE, slot]
+        )
+
+
+def live_dispatchers():
+    """How many dispatchers hold a membership lock on this database."""
+    if connection.vendor != 'postgresql':
+        return 1
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+            'AND granted AND objsubid = 2 AND classid::bigint = %s '
+            'AND database = ('
+            'SELECT oid FROM pg_database WHERE datname = current_database()'
+            ')',
+            [MEMBER_NAMESPACE],
+        )
+        return max(cursor.fetchone()[0], 1)
+
+
+def dispatch_batch(partition, sinks, batch_size):
+    """
+    Send the next `batch_size` pending events of a partition to every sink.
+
+    Returns how many were delivered. A failed batch is retried with
+    backoff and blocks its partition meanwhile, so events of one user are
+    never delivered out of order. A batch failing after some sinks took
+    it is sent to all of them again: delivery is at least once.
+    """
+    now = timezone.now()
+    events = list(
+        Event.objects.filter(partition=partition, dispatched_at__isnull=True)
+        .order_by('id')[:batch_size]
+    )
+    if not events or events[0].next_attempt_at > now:
+        return 0
+    ids = [event.pk for event in events]
+    messages = [event.message() for event in events]
+    try:
+        for sink in sinks:
+            sink.send(messages)
+    except Exception:
+        error = traceback.format_exc()
+        attempts = events[0].attempts + 1
+        logger.warning(
+            'Outbox partition %d failed attempt %d: %s',
+            partition, attempts, error.splitlines()[-1],
+        )
+        Event.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=backoff(attempts)),
+            last_error=error,
+        )
+        return 0
+    Event.objects.filter(pk__in=ids).update(dispatched_at=timezone.now())
+    return len(events)
+
+
+def purge():
+    """Delete events delivered more than `OUTBOX_RETENTION` seconds ago."""
+    cutoff = timezone.now() - timedelta(seconds=settings.OUTBOX_RETENTION)
+    return Event.objects.filter(dispatched_at__lt=cutoff).delete()[0]
+
+
+def outbox_stats():
+    """Pending events and the age of the oldest one, per partition."""
+    now = timezone.now()
+    return {
+        row['partition']: {
+            'pending': row['n'],
+            'oldest_seconds': (now - row['oldest']).total_seconds(),
+            'retrying': row['retrying'],
+        }
+        for row in Event.objects.filter(dispatched_at__isnull=True)
+        .values('partition')
+        .annotate(
+            n=Count('id'),
+            oldest=Min('created_at'),
+            retrying=Count('id', filter=Q(attempts__gt=0)),
+        )
+        .order_by('partition')
+    }
+
+
+class Dispatcher:
+    """
+    Deliver the partitions this process can lock, in rounds.
+
+    Each partition is owned by one dispatcher at a time through a session
+    advisory lock on PostgreSQL, so more processes (up to
+    `OUTBOX_PARTITIONS`) add throughput without reordering events. Live
+    dispatchers also hold a membership lock each; every round a
+    dispatcher takes at most its fair share of the partitions and gives
+    back any extra, so newcomers find partitions to take.
+    """
+
+    def __init__(self, sinks, partitions=None, batch_size=100,
+                 poll_interval=1.0, metrics_interval=60.0):
+        self.sinks = list(sinks)
+        self.partitions = sorted(
+            range(settings.OUTBOX_PARTITIONS) if partitions is None
+            else partitions
+        )
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.metrics_interval = metrics_interval
+        self.dispatcher_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.held = set()
+        self.slot = None
+        self.stopping = threading.Event()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.metrics = {'dispatched': 0, 'rounds': 0}
+        self.metrics_started = time.monotonic()
+
+    def share(self):
+        return math.ceil(len(self.partitions) / live_dispatchers())
+
+    def acquire(self):
+        if self.slot is None:
+            self.slot = join()
+        share = self.share()
+        for partition in sorted(self.held)[share:]:
+            unlock(partition)
+            self.held.discard(partition)
+        for partition in self.partitions:
+            if len(self.held) >= share:
+                break
+            if partition not in self.held and try_lock(partition):
+                self.held.add(partition)
+
+    def release(self):
+        for partition in sorted(self.held):
+            try:
+                unlock(partition)
+            except DatabaseError:
+                pass
+        self.held = set()
+        if self.slot is not None:
+            try:
+                leave(self.slot)
+            except DatabaseError:
+                pass
+            self.slot = None
+
+    def run_once(self):
+        """Deliver one batch of every partition held, return the count."""
+        self.acquire()
+        dispatched = sum(
+            dispatch_batch(partition, self.sinks, self.batch_size)
+            for partition in sorted(self.held)
+        )
+        self.metrics['dispatched'] += dispatched
+        self.metrics['rounds'] += 1
+        return dispatched
+
+    def drain(self):
+        """Deliver until nothing is ready, return the count."""
+        total = 0
+        while True:
+            dispatched = self.run_once()
+            if not dispatched:
+                return total
+            total += dispatched
+
+    def run(self):
+        """Run until `stop` is called."""
+        logger.info(
+            'Outbox dispatcher %s delivering to %s',
+            self.dispatcher_id, ', '.join(map(str, self.sinks)),
+        )
+        next_metrics = time.monotonic() + self.metrics_interval
+        while not self.stopping.is_set():
+            try:
+                dispatched = self.run_once()
+                if time.monotonic() >= next_metrics:
+                    purge()
+                    self.log_metrics()
+                    next_metrics = time.monotonic() + self.metrics_interval
+            except DatabaseError:
+                # Session locks die with the connection, start over
+                logger.exception('Outbox dispatcher lost its connection')
+                self.held = set()
+                self.slot = None
+                connection.close()
+                dispatched = 0
+            if not dispatched:
+                self.stopping.wait(self.poll_interval)
+        self.release()
+        self.log_metrics()
+
+    def stop(self, *args):
+        """Stop after the batch in flight."""
+        self.stopping.set()
+
+    def log_metrics(self):
+        elapsed = max(time.monotonic() - self.metrics_started, 1e-9)
+        logger.info(
+            'outbox partitions=%s dispatched=%d rate=%.2f/s',
+            ','.join(map(str, sorted(self.held))) or '-',
+            self.metrics['dispatched'], self.metrics['dispatched'] / elapsed,
+        )
+        self.reset_metrics()
@@ -0,0 +1,52 @@
+"""
+Write user lifecycle events to the outbox.
+"""
+from django.conf import settings
+
+from outbox.models import Event
+
+USER_FIELDS = ['email', 'name', 'gender', 'user_type', 'is_active']
+
+
+def partition_of(user_id):
+    """Events of one user always share a partition, keeping their order."""
+    return user_id % settings.OUTBOX_PARTITIONS
+
+
+def user_payload(user, **extra):
+    payload = {field: getattr(user, field) for field in USER_FIELDS}
+    payload['image'] = user.image.name or None
+    payload['updated_at'] = user.updated_at
+    payload.update(extra)
+    return payload
+
+
+def emit(event_type, user, **extra):
+    """
+    Record an event about `user`.
+
+    Call it inside the transaction changing the user so the event is
+    committed or rolled back with the change.
+    """
+    return Event.objects.create(
+        type=event_type,
+        user_id=user.pk,
+        partition=partition_of(user.pk),
+        payload=user_payload(user, **extra),
+    )
+
+
+def emit_many(event_type, users, **extra):
+    """
+    Record an event for each of `users` changed by a bulk update, with
+    the payload `emit` would give it.
+    """
+    return Event.objects.bulk_create([
+        Event(
+            type=event_type,
+            user_id=user.pk,
+            partition=partition_of(user.pk),
+            payload=user_payload(user, **extra),
+        )
+        for user in users
+    ])
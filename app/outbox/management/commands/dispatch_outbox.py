@@ -0,0 +1,94 @@
+"""
+Django command to deliver outbox events.
+"""
+import json
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from outbox.dispatch import Dispatcher, outbox_stats
+from outbox.sinks import load_sink
+
+
+class Command(BaseCommand):
+    """Django command to deliver outbox events until interrupted."""
+    help = (
+        'Deliver user events to the configured sinks; start more processes '
+        'to spread the partitions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sinks', default=None,
+            help='Comma separated sink URIs, defaults to OUTBOX_SINKS.',
+        )
+        parser.add_argument(
+            '--partitions', default=None,
+            help='Comma separated partitions to deliver, defaults to all.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE,
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--metrics-interval', type=float, default=60.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Deliver everything ready, then exit.',
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Print pending events per partition, then exit.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox_stats(), indent=2))
+            return
+
+        uris = (
+            settings.OUTBOX_SINKS if options['sinks'] is None
+            else list(filter(None, options['sinks'].split(',')))
+        )
+        if not uris:
+            raise CommandError('No outbox sinks configured.')
+        try:
+            sinks = [load_sink(uri) for uri in uris]
+            partitions = None
+            if options['partitions'] is not None:
+                partitions = [
+                    int(partition)
+                    for partition in options['partitions'].split(',')
+                ]
+        except ValueError as e:
+            raise CommandError(str(e))
+        if partitions is not None and not all(
+            0 <= partition < settings.OUTBOX_PARTITIONS
+            for partition in partitions
+        ):
+            raise CommandError(
+                f'Partitions go from 0 to {settings.OUTBOX_PARTITIONS - 1}.'
+            )
+
+        dispatcher = Dispatcher(
+            sinks, partitions=partitions,
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            metrics_interval=options['metrics_interval'],
+        )
+        if options['once']:
+            try:
+                total = dispatcher.drain()
+            finally:
+                dispatcher.release()
+            self.stdout.write(
+                self.style.SUCCESS(f'Dispatched {total} events.')
+            )
+            return
+
+        signal.signal(signal.SIGTERM, dispatcher.stop)
+        signal.signal(signal.SIGINT, dispatcher.stop)
+        self.stdout.write(f'Dispatcher {dispatcher.dispatcher_id} started.')
+        dispatcher.run()
+        self.stdout.write(self.style.SUCCESS('Dispatcher stopped.'))
@@ -0,0 +1,60 @@
+"""
+Database models for the transactional outbox.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Event(models.Model):
+    """
+    A user lifecycle event, written in the transaction of the change and
+    delivered by `dispatch_outbox` in id order per partition.
+    """
+    USER_CREATED = 'user.created'
+    USER_UPDATED = 'user.updated'
+    USER_DEACTIVATED = 'user.deactivated'
+    USER_IMAGE_CHANGED = 'user.image_changed'
+    TYPE_CHOICES = [
+        (USER_CREATED, 'User created'),
+        (USER_UPDATED, 'User updated'),
+        (USER_DEACTIVATED, 'User deactivated'),
+        (USER_IMAGE_CHANGED, 'User image changed'),
+    ]
+
+    type = models.CharField(max_length=32, choices=TYPE_CHOICES)
+    user_id = models.BigIntegerField()
+    partition = models.PositiveSmallIntegerField()
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['partition', 'id'],
+                name='outbox_event_pending_idx',
+                condition=models.Q(dispatched_at__isnull=True),
+            ),
+            models.Index(
+                fields=['dispatched_at'],
+                name='outbox_event_dispatched_idx',
+                condition=models.Q(dispatched_at__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.type} #{self.pk}'
+
+    def message(self):
+        """The event as delivered to sinks; `id` lets consumers dedupe."""
+        return {
+            'id': self.pk,
+            'type': self.type,
+            'user_id': self.user_id,
+            'created_at': self.created_at,
+            'data': self.payload,
+        }
@@ -0,0 +1,91 @@
+"""
+Destinations outbox events are delivered to.
+"""
+import hashlib
+import hmac
+import json
+import os
+import socket
+import urllib.request
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def ndjson(messages):
+    return b''.join(
+        json.dumps(message, cls=DjangoJSONEncoder).encode() + b'\n'
+        for message in messages
+    )
+
+
+class WebhookSink:
+    """POST each batch as a JSON array, signed with HMAC-SHA256."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def __str__(self):
+        return self.url
+
+    def send(self, messages):
+        body = json.dumps(messages, cls=DjangoJSONEncoder).encode()
+        request = urllib.request.Request(
+            self.url, data=body, method='POST',
+            headers={'Content-Type': 'application/json'},
+        )
+        if settings.OUTBOX_WEBHOOK_SECRET:
+            signature = hmac.new(
+                settings.OUTBOX_WEBHOOK_SECRET.encode(), body, hashlib.sha256
+            ).hexdigest()
+            request.add_header('X-Outbox-Signature', f'sha256={signature}')
+        # Anything but a 2xx raises HTTPError
+        with urllib.request.urlopen(
+            request, timeout=settings.OUTBOX_WEBHOOK_TIMEOUT
+        ) as response:
+            response.read()
+
+
+class FileSink:
+    """Append each batch to an NDJSON file, synced before it counts."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return f'file://{self.path}'
+
+    def send(self, messages):
+        with open(self.path, 'ab') as f:
+            f.write(ndjson(messages))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class SocketSink:
+    """Write each batch as NDJSON to a local Unix socket."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return f'unix://{self.path}'
+
+    def send(self, messages):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(settings.OUTBOX_WEBHOOK_TIMEOUT)
+            sock.connect(self.path)
+            sock.sendall(ndjson(messages))
+
+
+def load_sink(uri):
+    """Build a sink from `https://...`, `file:///path` or `unix:///path`."""
+    parsed = urlparse(uri)
+    if parsed.scheme in ('http', 'https'):
+        return WebhookSink(uri)
+    if parsed.scheme == 'file' and parsed.path:
+        return FileSink(parsed.path)
+    if parsed.scheme == 'unix' and parsed.path:
+        return SocketSink(parsed.path)
+    raise ValueError(f'Unsupported outbox sink "{uri}".')
@@ -0,0 +1,334 @@
+"""
+Tests for the transactional outbox.
+"""
+import hashlib
+import hmac
+import json
+import os
+import socketserver
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from outbox import dispatch
+from outbox.dispatch import Dispatcher, dispatch_batch, purge
+from outbox.models import Event
+from outbox.sinks import FileSink, SocketSink, WebhookSink, load_sink
+from user.tasks import deactivate_users
+
+User = get_user_model()
+
+
+class FailingSink:
+
+    def __init__(self):
+        self.calls = 0
+
+    def send(self, messages):
+        self.calls += 1
+        raise ConnectionError('sink down')
+
+
+class ListSink:
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, messages):
+        self.messages.extend(messages)
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        'seeker@example.com', 'sample123', user_type='home_seeker'
+    )
+
+
+@pytest.fixture
+def ndjson_path():
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, 'events.ndjson')
+
+
+def read_ndjson(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.django_db
+def test_create_user_writes_event(user, settings):
+    """Test creating a user records a created event in its partition."""
+    event = Event.objects.get()
+
+    assert event.type == Event.USER_CREATED
+    assert event.user_id == user.pk
+    assert event.partition == user.pk % settings.OUTBOX_PARTITIONS
+    assert event.payload['email'] == 'seeker@example.com'
+    assert 'password' not in event.payload
+
+
+@pytest.mark.django_db
+def test_rolled_back_change_writes_no_event():
+    """Test events are committed or rolled back with the change."""
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            User.objects.create_user('gone@example.com', 'sample123')
+            raise RuntimeError
+
+    assert not Event.objects.exists()
+
+
+@pytest.mark.django_db
+def test_profile_update_and_image_write_events(user):
+    """Test updates through the API and image uploads are recorded."""
+    client = APIClient()
+    client.force_authenticate(user=user)
+    client.patch(reverse('user:me'), {'name': 'New', 'password': 'x' * 8})
+    with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+        Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+        image_file.seek(0)
+        client.patch(
+            reverse('user:my-image'), {'image': image_file},
+            format='multipart',
+        )
+    user.refresh_from_db()
+    user.image.delete()
+
+    updated, image = Event.objects.exclude(
+        type=Event.USER_CREATED
+    ).order_by('id')
+    assert updated.type == Event.USER_UPDATED
+    assert updated.payload['name'] == 'New'
+    assert updated.payload['changed'] == ['name', 'password']
+    assert image.type == Event.USER_IMAGE_CHANGED
+    assert image.payload['image']
+
+
+@pytest.mark.django_db
+def test_deactivation_writes_events(user):
+    """Test bulk deactivation and soft deletion are recorded."""
+    other = User.objects.create_user('other@example.com', 'sample123')
+
+    deactivate_users([user.pk])
+    other.soft_delete()
+
+    events = Event.objects.filter(type=Event.USER_DEACTIVATED)
+    assert sorted(events.values_list('user_id', flat=True)) == [
+        user.pk, other.pk,
+    ]
+    bulk, single = events.get(user_id=user.pk), events.get(user_id=other.pk)
+    assert single.payload['deleted'] is True
+    # Both carry the whole user, whichever way it was deactivated
+    assert set(bulk.payload) == set(single.payload) - {'deleted'}
+    assert bulk.payload['is_active'] is False
+    assert bulk.payload['email'] == user.email
+
+
+@pytest.mark.django_db
+def test_dispatch_delivers_in_order_once(user, ndjson_path):
+    """Test events are delivered in id order and marked dispatched."""
+    user.soft_delete()
+    partition = Event.objects.first().partition
+
+    assert dispatch_batch(partition, [FileSink(ndjson_path)], 10) == 2
+    assert dispatch_batch(partition, [FileSink(ndjson_path)], 10) == 0
+
+    messages = read_ndjson(ndjson_path)
+    assert [m['type'] for m in messages] == [
+        Event.USER_CREATED, Event.USER_DEACTIVATED,
+    ]
+    assert messages[0]['id'] < messages[1]['id']
+    assert not Event.objects.filter(dispatched_at__isnull=True).exists()
+
+
+@pytest.mark.django_db
+def test_failed_batch_is_retried_and_blocks_partition(user):
+    """Test a failure schedules a retry and holds back later events."""
+    partition = Event.objects.get().partition
+    failing = FailingSink()
+
+    assert dispatch_batch(partition, [failing], 10) == 0
+    event = Event.objects.get()
+    assert event.attempts == 1
+    assert event.next_attempt_at > timezone.now()
+    assert 'sink down' in event.last_error
+
+    user.soft_delete()
+    sink = ListSink()
+    assert dispatch_batch(partition, [sink], 10) == 0
+    assert sink.messages == []
+
+    Event.objects.update(next_attempt_at=timezone.now())
+    assert dispatch_batch(partition, [sink], 10) == 2
+    assert [m['type'] for m in sink.messages] == [
+        Event.USER_CREATED, Event.USER_DEACTIVATED,
+    ]
+
+
+@pytest.mark.django_db
+def test_dispatcher_drains_every_partition(settings):
+    """Test a dispatcher covers all partitions in batches."""
+    settings.OUTBOX_PARTITIONS = 3
+    for i in range(7):
+        User.objects.create_user(f'user{i}@example.com', 'sample123')
+    sink = ListSink()
+
+    assert Dispatcher([sink], batch_size=2).drain() == 7
+    assert sorted(m['id'] for m in sink.messages) == list(
+        Event.objects.order_by('id').values_list('id', flat=True)
+    )
+
+
+def test_dispatchers_share_partitions(settings, monkeypatch):
+    """Test a dispatcher gives back partitions above its fair share."""
+    settings.OUTBOX_PARTITIONS = 4
+    locks = set()
+    live = [1]
+
+    def try_lock(partition):
+        if partition in locks:
+            return False
+        locks.add(partition)
+        return True
+
+    monkeypatch.setattr(dispatch, 'try_lock', try_lock)
+    monkeypatch.setattr(dispatch, 'unlock', locks.discard)
+    monkeypatch.setattr(dispatch, 'live_dispatchers', lambda: live[0])
+    first, second = Dispatcher([]), Dispatcher([])
+
+    first.acquire()
+    assert first.held == {0, 1, 2, 3}
+
+    live[0] = 2
+    second.acquire()
+    assert second.held == set()
+    first.acquire()
+    second.acquire()
+    assert first.held == {0, 1}
+    assert second.held == {2, 3}
+
+    live[0] = 1
+    first.release()
+    second.acquire()
+    assert second.held == {0, 1, 2, 3}
+
+
+@pytest.mark.django_db
+def test_purge_keeps_recent_events(user, settings):
+    """Test only events delivered before the retention are deleted."""
+    settings.OUTBOX_RETENTION = 60
+    user.soft_delete()
+    old, recent = Event.objects.order_by('id')
+    Event.objects.filter(pk=old.pk).update(
+        dispatched_at=timezone.now() - timedelta(hours=1)
+    )
+    Event.objects.filter(pk=recent.pk).update(dispatched_at=timezone.now())
+
+    assert purge() == 1
+    assert list(Event.objects.all()) == [recent]
+
+
+def test_webhook_sink_signs_batches(settings):
+    """Test webhook batches are posted as signed JSON."""
+    settings.OUTBOX_WEBHOOK_SECRET = 'secret'
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append((self.headers['X-Outbox-Signature'], body))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    try:
+        WebhookSink(f'http://127.0.0.1:{server.server_port}/').send(
+            [{'id': 1}]
+        )
+    finally:
+        thread.join()
+        server.server_close()
+
+    signature, body = received[0]
+    assert json.loads(body) == [{'id': 1}]
+    assert signature == 'sha256=' + hmac.new(
+        b'secret', body, hashlib.sha256
+    ).hexdigest()
+
+
+def test_socket_sink_writes_ndjson():
+    """Test batches are written as NDJSON to a Unix socket."""
+    received = []
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            received.extend(json.loads(line) for line in self.rfile)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'outbox.sock')
+        with socketserver.UnixStreamServer(path, Handler) as server:
+            thread = threading.Thread(target=server.handle_request)
+            thread.start()
+            SocketSink(path).send([{'id': 1}, {'id': 2}])
+            thread.join()
+
+    assert received == [{'id': 1}, {'id': 2}]
+
+
+def test_load_sink():
+    """Test sinks are built from their URIs."""
+    assert isinstance(load_sink('https://example.com/hook'), WebhookSink)
+    assert load_sink('file:///tmp/events.ndjson').path == (
+        '/tmp/events.ndjson'
+    )
+    assert isinstance(load_sink('unix:///run/outbox.sock'), SocketSink)
+    with pytest.raises(ValueError):
+        load_sink('ftp://example.com')
+
+
+@pytest.mark.django_db
+def test_dispatch_outbox_command(user, ndjson_path):
+    """Test the command delivers everything once and reports stats."""
+    out = StringIO()
+    call_command('dispatch_outbox', once=True, sinks=f'file://{ndjson_path}',
+                 stdout=out)
+
+    assert 'Dispatched 1 events' in out.getvalue()
+    assert len(read_ndjson(ndjson_path)) == 1
+
+    user.soft_delete()
+    out = StringIO()
+    call_command('dispatch_outbox', stats=True, stdout=out)
+    stats = json.loads(out.getvalue())
+    assert [partition['pending'] for partition in stats.values()] == [1]
+
+
+@pytest.mark.django_db
+def test_dispatch_outbox_rejects_bad_options(settings):
+    """Test missing sinks and unknown partitions are reported."""
+    settings.OUTBOX_SINKS = []
+    with pytest.raises(CommandError):
+        call_command('dispatch_outbox', once=True)
+    with pytest.raises(CommandError):
+        call_command(
+            'dispatch_outbox', once=True, sinks='file:///tmp/x',
+            partitions=str(settings.OUTBOX_PARTITIONS),
+        )
@@ -0,0 +1,77 @@
+"""
+Write-coalesced tracking of user logins and activity.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+from core.background import BackgroundFlusher
+
+
+class ActivityTracker(BackgroundFlusher):
+    """
+    Buffer last login / last seen times and write them in batches.
+
+    Each user appears at most once per flush no matter how many requests
+    they made, so `USER_ACTIVITY_FLUSH_INTERVAL` bounds the write rate.
+    """
+    interval_setting = 'USER_ACTIVITY_FLUSH_INTERVAL'
+
+    def __init__(self):
+        super().__init__()
+        self.pending = {}
+
+    def record_login(self, user_id, when=None):
+        when = when or timezone.now()
+        with self.lock:
+            self.pending[user_id] = (when, when)
+        self.schedule()
+
+    def record_seen(self, user_id, when=None):
+        when = when or timezone.now()
+        with self.lock:
+            last_login, _ = self.pending.get(user_id, (None, None))
+            self.pending[user_id] = (last_login, when)
+        self.schedule()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        rows = [
+            (user_id, last_login, last_seen)
+            for user_id, (last_login, last_seen) in pending.items()
+        ]
+        batch_size = settings.USER_ACTIVITY_BATCH_SIZE
+        for start in range(0, len(rows), batch_size):
+            self.write(rows[start:start + batch_size])
+
+    def write(self, rows):
+        """Apply one batch with a single `UPDATE ... FROM (VALUES ...)`."""
+        User = get_user_model()
+        if connection.vendor != 'postgresql':
+            for user_id, last_login, last_seen in rows:
+                changes = {'last_seen': last_seen}
+                if last_login:
+                    changes['last_login'] = last_login
+                User.objects.filter(pk=user_id).update(**changes)
+            return
+
+        table = connection.ops.quote_name(User._meta.db_table)
+        values = ', '.join(
+            ['(%s, %s::timestamptz, %s::timestamptz)'] * len(rows)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {table} AS u SET
+                    last_login = GREATEST(u.last_login, v.last_login),
+                    last_seen = GREATEST(u.last_seen, v.last_seen)
+                FROM (VALUES {values}) AS v (id, last_login, last_seen)
+                WHERE u.id = v.id
+                """,
+                [value for row in rows for value in row],
+            )
+
+
+tracker = ActivityTracker()
@@ -6,11 +6,28 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
 from user import models
+from user.tasks import deactivate_users
+
+
+@admin.action(description=_('Deactivate selected users in the background'))
+def deactivate_selected(modeladmin, request, queryset):
+    user_ids = list(queryset.values_list('id', flat=True))
+    deactivate_users.enqueue(user_ids=user_ids)
+    modeladmin.message_user(
+        request, _('Queued deactivation of %d user(s).') % len(user_ids)
+    )
+
+
+@admin.action(description=_('Soft delete selected users'))
+def soft_delete_selected(modeladmin, request, queryset):
+    for user in queryset.filter(deleted_at__isnull=True):
+        user.soft_delete()
 
 
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users."""
     ordering = ['id']
+    actions = [deactivate_selected, soft_delete_selected]
     list_display = ['email', 'name', 'gender', 'user_type']
     fieldsets = (
         (
@@ -34,9 +51,12 @@ class UserAdmin(BaseUserAdmin):
                 )
             }
         ),
-        (_('Important dates'), {'fields': ('last_login',)}),
+        (
+            _('Important dates'),
+            {'fields': ('last_login', 'last_seen', 'updated_at', 'deleted_at')}
+        ),
     )
-    readonly_fields = ['last_login']
+    readonly_fields = ['last_login', 'last_seen', 'updated_at', 'deleted_at']
 
     add_fieldsets = (
         (None, {
@@ -0,0 +1,209 @@
+"""
+Cold storage for long inactive users.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken, OutstandingToken
+)
+
+from listings.models import Listing, Preference
+from outbox import events
+from outbox.models import Event
+from user.models import ArchivedUser, User
+
+
+def candidates(now=None):
+    """
+    Users idle for `USER_ARCHIVE_IDLE_DAYS` or deactivated for
+    `USER_ARCHIVE_INACTIVE_DAYS`. Administrators are never archived, nor
+    are owners of listings or seekers with listing preferences, which
+    deleting the user would cascade to.
+    """
+    now = now or timezone.now()
+    idle = now - timedelta(days=settings.USER_ARCHIVE_IDLE_DAYS)
+    inactive = now - timedelta(days=settings.USER_ARCHIVE_INACTIVE_DAYS)
+    return (
+        User.objects
+        .exclude(user_type='admin')
+        .filter(is_staff=False, is_superuser=False)
+        .exclude(Exists(Listing.objects.filter(owner=OuterRef('pk'))))
+        .exclude(Exists(Preference.objects.filter(user=OuterRef('pk'))))
+        .annotate(last_active=Coalesce('last_seen', 'last_login'))
+        .filter(
+            Q(is_active=False, updated_at__lt=inactive) |
+            Q(updated_at__lt=idle) & (
+                Q(last_active__isnull=True) | Q(last_active__lt=idle)
+            )
+        )
+    )
+
+
+def dump_user(user, groups, permissions):
+    data = {
+        field.attname: (
+            None if field.value_from_object(user) is None
+            else field.value_to_string(user)
+        )
+        for field in User._meta.concrete_fields
+    }
+    data['groups'] = groups
+    data['user_permissions'] = permissions
+    return data
+
+
+def load_user(data):
+    user = User()
+    for field in User._meta.concrete_fields:
+        # Columns added since the user was archived keep their default
+        if field.attname in data:
+            value = data[field.attname]
+            setattr(
+                user, field.attname,
+                None if value is None else field.to_python(value),
+            )
+    return user
+
+
+def related_ids(through, field, user_ids):
+    ids = defaultdict(list)
+    for user_id, pk in through.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', field):
+        ids[user_id].append(pk)
+    return ids
+
+
+def archive_batch(batch_size, lock_timeout=None, now=None):
+    """
+    Move up to `batch_size` candidates and their outstanding tokens to
+    the archive in one transaction, returning how many were moved. A
+    `user.deactivated` event is recorded for each.
+
+    Rows locked by a concurrent write are skipped rather than waited on,
+    and on PostgreSQL any other lock is waited on for at most
+    `lock_timeout` milliseconds before `OperationalError` is raised.
+    """
+    with transaction.atomic():
+        if lock_timeout and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL lock_timeout = %s', [f'{int(lock_timeout)}ms']
+                )
+        users = list(
+            candidates(now)
+            .select_for_update(skip_locked=True)
+            .order_by('pk')[:batch_size]
+        )
+        if not users:
+            return 0
+        user_ids = [user.pk for user in users]
+        groups = related_ids(User.groups.through, 'group_id', user_ids)
+        permissions = related_ids(
+            User.user_permissions.through, 'permission_id', user_ids
+        )
+        tokens = defaultdict(list)
+        for row in OutstandingToken.objects.filter(
+            user_id__in=user_ids
+        ).values(
+            'user_id', 'jti', 'token', 'created_at', 'expires_at',
+            'blacklistedtoken__blacklisted_at',
+        ):
+            user_id = row.pop('user_id')
+            row['blacklisted_at'] = row.pop('blacklistedtoken__blacklisted_at')
+            tokens[user_id].append(row)
+
+        ArchivedUser.objects.bulk_create([
+            ArchivedUser(
+                id=user.pk,
+                email=user.email,
+                data=dump_user(
+                    user, groups[user.pk], permissions[user.pk]
+                ),
+                tokens=tokens[user.pk],
+            )
+            for user in users
+        ])
+        # Blacklist entries go with their tokens
+        OutstandingToken.objects.filter(user_id__in=user_ids).delete()
+        User.objects.filter(pk__in=user_ids).delete()
+        # Mirrors drop the users; the change feed has the archived rows
+        events.emit_many(Event.USER_DEACTIVATED, users, archived=True)
+    return len(users)
+
+
+def unarchive(archived):
+    """Move an archived user and their unexpired tokens back."""
+    user = load_user(archived.data)
+    user.save(force_insert=True)
+    user.groups.set(archived.data.get('groups', []))
+    user.user_permissions.set(archived.data.get('user_permissions', []))
+
+    now = timezone.now()
+    tokens = [
+        row for row in archived.tokens
+        if parse_datetime(row['expires_at']) > now
+    ]
+    OutstandingToken.objects.bulk_create(
+        [
+            OutstandingToken(
+                user_id=user.pk,
+                jti=row['jti'],
+                token=row['token'],
+                created_at=parse_datetime(row['created_at']),
+                expires_at=parse_datetime(row['expires_at']),
+            )
+            for row in tokens
+        ],
+        ignore_conflicts=True,
+    )
+    blacklisted = {
+        row['jti']: parse_datetime(row['blacklisted_at'])
+        for row in tokens if row['blacklisted_at']
+    }
+    if blacklisted:
+        BlacklistedToken.objects.bulk_create(
+            [
+                BlacklistedToken(
+                    token=token, blacklisted_at=blacklisted[token.jti]
+                )
+                for token in OutstandingToken.objects.filter(
+                    jti__in=list(blacklisted)
+                )
+            ],
+            ignore_conflicts=True,
+        )
+    archived.delete()
+    return user
+
+
+def restore(email, password):
+    """
+    Restore the archived user with `email` if `password` is theirs.
+
+    Returns the restored user, or None when there is no such archived
+    user or the password is wrong.
+    """
+    archived = ArchivedUser.objects.filter(email__lower=email.lower()).first()
+    if archived is None:
+        # Run the hasher anyway to keep the timing of both paths equal
+        make_password(password)
+        return None
+    if not check_password(password, archived.data['password']):
+        return None
+    with transaction.atomic():
+        locked = ArchivedUser.objects.select_for_update().filter(
+            pk=archived.pk
+        ).first()
+        if locked is None:
+            # Restored by a concurrent login
+            return User.objects.filter(pk=archived.pk).first()
+        return unarchive(locked)
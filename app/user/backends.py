@@ -0,0 +1,35 @@
+"""
+Authentication backends for the user app.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from user import archive
+
+
+class CaseInsensitiveEmailBackend(ModelBackend):
+    """
+    Authenticate by email regardless of its case.
+
+    The lookup is `LOWER(email) = %s`, an index probe on the unique
+    `user_email_lower_uniq` index rather than an `ILIKE` scan. Users moved
+    to the archive by `archive_users` are restored when they log in.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        User = get_user_model()
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Archived users come back on their first successful login
+            user = archive.restore(username, password)
+            if user is None:
+                return None
+            return user if self.user_can_authenticate(user) else None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
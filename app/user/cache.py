@@ -0,0 +1,151 @@
+"""
+Read-through, in-process caches of users and their logouts by primary key.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from core import metrics
+from core.bus import bus
+
+
+class UserCache:
+    """
+    LRU of user rows as field tuples, bounded by `USER_CACHE_SIZE` entries
+    and `USER_CACHE_TTL` seconds.
+
+    Every `get` builds a fresh `User`, so callers never share an instance.
+    Entries are dropped on `user` invalidations from the bus, which every
+    save (password, image, deactivation...) publishes. Activity fields
+    written by `ActivityTracker` may lag by up to the TTL.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # Bumped on every invalidation so a load racing one is not stored
+        self.epoch = 0
+        self.stats = {
+            'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0,
+        }
+
+    @property
+    def fields(self):
+        return [
+            field.attname for field in get_user_model()._meta.concrete_fields
+        ]
+
+    def get(self, pk):
+        """Return the user with `pk`, or None if there is none."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(pk)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(pk)
+                self.stats['hits'] += 1
+                return self.build(entry[1])
+            self.stats['misses'] += 1
+            epoch = self.epoch
+
+        fields = self.fields
+        values = get_user_model().objects.filter(pk=pk).values_list(
+            *fields
+        ).first()
+        if values is None:
+            return None
+        with self.lock:
+            if self.epoch == epoch:
+                self.entries[pk] = (now + settings.USER_CACHE_TTL, values)
+                self.entries.move_to_end(pk)
+                while len(self.entries) > settings.USER_CACHE_SIZE:
+                    self.entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+        return self.build(values)
+
+    def build(self, values):
+        User = get_user_model()
+        return User.from_db(DEFAULT_DB_ALIAS, self.fields, values)
+
+    def invalidate(self, pk=None):
+        """Drop one user, or every user when `pk` is None."""
+        with self.lock:
+            self.epoch += 1
+            self.stats['invalidations'] += 1
+            if pk is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(pk, None)
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, 'size': len(self.entries)}
+
+
+class LogoutCache:
+    """
+    LRU of each user's latest logout, the last time one of their tokens
+    was blacklisted, bounded like the `UserCache`.
+
+    Entries are dropped on `token` invalidations from the bus, which every
+    blacklisting publishes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.epoch = 0
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        """When `user_id` last logged out, None if never."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+            epoch = self.epoch
+
+        logged_out = BlacklistedToken.objects.filter(
+            token__user_id=user_id
+        ).aggregate(last=Max('blacklisted_at'))['last']
+        with self.lock:
+            if self.epoch == epoch:
+                self.entries[user_id] = (
+                    now + settings.USER_CACHE_TTL, logged_out
+                )
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > settings.USER_CACHE_SIZE:
+                    self.entries.popitem(last=False)
+        return logged_out
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or every user when `user_id` is None."""
+        with self.lock:
+            self.epoch += 1
+            self.stats['invalidations'] += 1
+            if user_id is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(user_id, None)
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, 'size': len(self.entries)}
+
+
+user_cache = UserCache()
+bus.subscribe('user', user_cache.invalidate)
+metrics.register('user_cache', user_cache.snapshot)
+
+logout_cache = LogoutCache()
+bus.subscribe('token', logout_cache.invalidate)
+metrics.register('logout_cache', logout_cache.snapshot)
@@ -0,0 +1,193 @@
+"""
+Per-worker Bloom filter of the emails in use.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.functions import Lower
+
+from core import metrics
+from core.bloom import BloomFilter
+from core.bus import bus
+from user.models import ArchivedUser, User
+
+
+class EmailFilter:
+    """
+    Bloom filter of every lowercased user and archived user email.
+
+    It is built in the background on first use and rebuilt every
+    `USER_EMAIL_FILTER_REBUILD_INTERVAL` seconds, once over capacity and
+    after a lost bus message, which also forgets emails no longer in use.
+    New emails are added from the `email` bus topic in every worker.
+    Until the first build and after a lost message, when the filter may
+    miss emails, there is no filter to answer from.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter = None
+        self.backlog = None
+        self.stale = False
+        self.resyncs = 0
+        self.built_at = None
+        self.stats = {
+            'checks': 0,
+            'definitely_free': 0,
+            'maybe_taken': 0,
+            'false_positives': 0,
+            'builds': 0,
+            'build_seconds': None,
+        }
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def add(self, email):
+        """Add an email, or schedule a rebuild when `email` is None."""
+        with self.lock:
+            if email is None:
+                self.stale = True
+                self.resyncs += 1
+                return
+            if self.backlog is not None:
+                self.backlog.append(email)
+            if self.filter is not None:
+                self.filter.add(email)
+                if self.filter.count > self.filter.capacity:
+                    self.stale = True
+
+    def build(self):
+        """Load every email into a new filter and swap it in."""
+        with self.lock:
+            if self.backlog is not None:
+                return
+            # Emails added while loading are replayed into the new filter
+            self.backlog = []
+            resyncs = self.resyncs
+        started = time.monotonic()
+        try:
+            users = User.objects.values_list(Lower('email'), flat=True)
+            archived = ArchivedUser.objects.values_list(
+                Lower('email'), flat=True
+            )
+            bloom = BloomFilter(
+                max(
+                    settings.USER_EMAIL_FILTER_CAPACITY,
+                    2 * (users.count() + archived.count()),
+                ),
+                settings.USER_EMAIL_FILTER_ERROR_RATE,
+            )
+            for queryset in (users, archived):
+                for email in queryset.iterator(chunk_size=10000):
+                    bloom.add(email)
+        except Exception:
+            with self.lock:
+                self.backlog = None
+            raise
+        with self.lock:
+            for email in self.backlog:
+                bloom.add(email)
+            self.filter = bloom
+            self.backlog = None
+            # A message lost while loading may not be in the new filter
+            self.stale = self.resyncs != resyncs
+            self.built_at = time.monotonic()
+            self.stats['builds'] += 1
+            self.stats['build_seconds'] = round(
+                time.monotonic() - started, 3
+            )
+
+    def rebuild_in_background(self):
+        if not settings.USER_EMAIL_FILTER_BACKGROUND:
+            self.build()
+            return
+
+        def rebuild():
+            try:
+                self.build()
+            finally:
+                connection.close()
+
+        threading.Thread(
+            target=rebuild, name='EmailFilter', daemon=True
+        ).start()
+
+    def current(self):
+        """
+        The filter to answer from, None while the first one is building or
+        while stale, starting a rebuild when due.
+        """
+        if self.backlog is None and (
+            self.filter is None or self.stale or
+            time.monotonic() - self.built_at >=
+            settings.USER_EMAIL_FILTER_REBUILD_INTERVAL
+        ):
+            self.rebuild_in_background()
+        with self.lock:
+            return None if self.stale else self.filter
+
+    def definitely_free(self, email):
+        """True only when no user or archived user has `email`."""
+        self.count('checks')
+        bloom = self.current()
+        if bloom is not None and email.lower() not in bloom:
+            self.count('definitely_free')
+            return True
+        self.count('maybe_taken')
+        return False
+
+    def reset(self):
+        with self.lock:
+            self.filter = None
+            self.backlog = None
+            self.stale = False
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            bloom = self.filter
+        free = stats['definitely_free'] + stats['false_positives']
+        stats['observed_error_rate'] = (
+            round(stats['false_positives'] / free, 6) if free else None
+        )
+        if bloom is not None:
+            stats.update({
+                'capacity': bloom.capacity,
+                'emails': bloom.count,
+                'bits': bloom.bits,
+                'bytes': len(bloom.array),
+                'hashes': bloom.hashes,
+                'target_error_rate': bloom.error_rate,
+                'estimated_error_rate': round(
+                    bloom.estimated_error_rate(), 6
+                ),
+            })
+        return stats
+
+
+email_filter = EmailFilter()
+bus.subscribe('email', email_filter.add)
+metrics.register('email_filter', email_filter.snapshot)
+
+
+def is_available(email):
+    """
+    Whether `email` is free in any letter case.
+
+    Emails the filter rules out cost no query; the others are checked on
+    the `Lower(email)` unique indexes.
+    """
+    email = email.lower()
+    if email_filter.definitely_free(email):
+        return True
+    taken = (
+        User.objects.filter(email__lower=email).exists() or
+        ArchivedUser.objects.filter(email__lower=email).exists()
+    )
+    if not taken:
+        email_filter.count('false_positives')
+    return not taken
@@ -0,0 +1,182 @@
+"""
+Streaming export of users.
+"""
+import csv
+import io
+import json
+import zlib
+
+EXPORT_FIELDS = [
+    'id', 'email', 'name', 'gender', 'user_type', 'is_active', 'image',
+]
+SUPERUSER_EXPORT_FIELDS = EXPORT_FIELDS + [
+    'is_staff', 'is_superuser', 'last_login',
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def parse_fields(value, allowed):
+    """Return the requested export columns, `id` always first."""
+    if not value:
+        return list(allowed)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(unknown)}.')
+    return ['id'] + [field for field in fields if field != 'id']
+
+
+def iter_rows(queryset, fields, after_id=None, chunk_size=2000):
+    """Yield value tuples ordered by id through a server-side cursor."""
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    return (
+        queryset.order_by('id')
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _text(value):
+    """Render a value the way PostgreSQL `COPY ... CSV` does."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return value
+
+
+def encode_csv(rows, fields, chunk_size=2000):
+    """Encode rows as CSV with a header line."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(fields)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_text(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def encode_ndjson(rows, fields, chunk_size=2000):
+    """Encode rows as newline delimited JSON objects."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(fields, row)), default=str))
+        if len(lines) == chunk_size:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object handing written bytes back to the caller."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_schema(model, fields):
+    """Build an Arrow schema for the exported model fields."""
+    import pyarrow as pa
+
+    types = {
+        'BigAutoField': pa.int64(),
+        'BooleanField': pa.bool_(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([
+        (
+            name,
+            types.get(
+                model._meta.get_field(name).get_internal_type(), pa.string()
+            ),
+        )
+        for name in fields
+    ])
+
+
+def encode_parquet(rows, fields, schema, chunk_size=2000):
+    """Encode rows as Parquet, one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def batch_table(batch):
+        columns = list(zip(*batch))
+        return pa.table(
+            [
+                pa.array(
+                    [str(v) if v is not None else None for v in column]
+                    if schema.field(i).type == pa.string() else column,
+                    type=schema.field(i).type,
+                )
+                for i, column in enumerate(columns)
+            ],
+            schema=schema,
+        )
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == chunk_size:
+            writer.write_table(batch_table(batch))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(batch_table(batch))
+    writer.close()
+    yield sink.drain()
+
+
+def gzip_stream(chunks, level=6):
+    """Compress a byte stream into gzip format on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_users(queryset, fields, output='csv', after_id=None,
+                 compress=False, chunk_size=2000):
+    """Yield the encoded export of `queryset` in constant memory."""
+    rows = iter_rows(queryset, fields, after_id, chunk_size)
+    if output == 'csv':
+        chunks = encode_csv(rows, fields, chunk_size)
+    elif output == 'ndjson':
+        chunks = encode_ndjson(rows, fields, chunk_size)
+    elif output == 'parquet':
+        schema = parquet_schema(queryset.model, fields)
+        chunks = encode_parquet(rows, fields, schema, chunk_size)
+    else:
+        raise ValueError(f'Unsupported output "{output}".')
+
+    return gzip_stream(chunks) if compress else chunks
@@ -0,0 +1,293 @@
+"""
+On-demand resized user images, cached on disk.
+"""
+import fcntl
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+)
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+from PIL import Image, ImageOps
+
+from core import metrics
+
+FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+re_range = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class VariantCache:
+    """
+    Size bounded LRU of rendered variants under `USER_IMAGE_CACHE_DIR`.
+
+    Recency is the file mtime, touched on every hit, so the cache survives
+    restarts and is shared by every worker on the host. So is the count
+    of bytes in use, kept in a `.usage` file updated under `flock` and
+    recounted from the directory on eviction. Renders of the same variant
+    are serialized with a thread lock plus `flock`, so concurrent misses
+    produce a single render.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.size = None
+        self.stats = {'hits': 0, 'misses': 0, 'renders': 0, 'evicted': 0}
+
+    @property
+    def root(self):
+        return settings.USER_IMAGE_CACHE_DIR
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get_or_render(self, path, render):
+        """Return `path`, rendering it with `render(file)` if missing."""
+        if self.touch(path):
+            self.count('hits')
+            return path
+        self.count('misses')
+        with self.variant_lock(path):
+            if self.touch(path):
+                return path
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    render(f)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self.count('renders')
+        self.added(path)
+        return path
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @contextmanager
+    def variant_lock(self, path):
+        with self.lock:
+            entry = self.key_locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                os.makedirs(self.root, exist_ok=True)
+                # 256 striped lock files rather than one per variant
+                stripe = hashlib.md5(path.encode()).digest()[0]
+                lock_path = os.path.join(self.root, f'.{stripe:02x}.lock')
+                with open(lock_path, 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.key_locks[path]
+
+    def files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    @contextmanager
+    def usage(self):
+        """The `.usage` file of the host's cache, locked."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.usage'), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def added(self, path):
+        """Account for a new variant and evict once over budget."""
+        size = os.path.getsize(path)
+        with self.usage() as f:
+            total = f.read()
+            if total:
+                total = int(total) + size
+                f.truncate(0)
+                f.write(str(total))
+        with self.lock:
+            self.size = total or None
+        if not total or total > settings.USER_IMAGE_CACHE_MAX_BYTES:
+            self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Delete least recently used variants until under budget."""
+        with self.usage() as f:
+            files = sorted(self.files())
+            total = sum(size for _, size, _ in files)
+            evicted = 0
+            for _, size, path in files:
+                if total <= settings.USER_IMAGE_CACHE_MAX_BYTES:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            f.truncate(0)
+            f.write(str(total))
+        with self.lock:
+            self.size = total
+            self.stats['evicted'] += evicted
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, 'bytes': self.size}
+
+
+cache = VariantCache()
+metrics.register('user_image_cache', cache.snapshot)
+
+
+def render_variant(original, size, image_format):
+    """Return a callable writing `original` fitted into `size` pixels."""
+
+    def render(f):
+        with original.open('rb') as src:
+            img = Image.open(src)
+            img = ImageOps.exif_transpose(img)
+            if image_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            img.thumbnail((size, size))
+            img.save(f, format=image_format)
+
+    return render
+
+
+def variant_path(image, size, ext):
+    """
+    Cache path of a variant, versioned by the original's name and mtime.
+
+    Returns the path and the version, which doubles as the ETag.
+    """
+    mtime = image.storage.get_modified_time(image.name).timestamp()
+    version = hashlib.blake2b(
+        f'{image.name}:{mtime}:{size}:{ext}'.encode(), digest_size=8
+    ).hexdigest()
+    user_id = image.instance.pk
+    return (
+        os.path.join(
+            settings.USER_IMAGE_CACHE_DIR, str(user_id % 256),
+            str(user_id), f'{size}-{version}.{ext}',
+        ),
+        version,
+    )
+
+
+def ranged(request, path, content_type):
+    """Serve one `Range: bytes=` slice of `path`, or None for all of it."""
+    match = re_range.match(request.headers.get('Range', ''))
+    if not match or not any(match.groups()):
+        return None
+    length = os.path.getsize(path)
+    first, last = match.groups()
+    if first:
+        start, end = int(first), int(last) if last else length - 1
+    else:
+        start, end = max(length - int(last), 0), length - 1
+    end = min(end, length - 1)
+    if start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{length}'
+        return response
+    with open(path, 'rb') as f:
+        f.seek(start)
+        response = HttpResponse(
+            f.read(end - start + 1), status=206, content_type=content_type
+        )
+    response['Content-Range'] = f'bytes {start}-{end}/{length}'
+    return response
+
+
+def deliver(request, path, content_type):
+    """Hand the file to the front server or stream it with sendfile."""
+    delivery = settings.USER_IMAGE_DELIVERY
+    if delivery == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.USER_IMAGE_ACCEL_PREFIX +
+            os.path.relpath(path, settings.USER_IMAGE_CACHE_DIR)
+        )
+        return response
+    if delivery == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    response = ranged(request, path, content_type)
+    if response is None:
+        # FileResponse uses the server's `wsgi.file_wrapper` (sendfile)
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def user_image(request, user_id, size, ext):
+    """Serve a user's image fitted into `size` pixels as `ext`."""
+    if size not in settings.USER_IMAGE_SIZES or ext not in FORMATS:
+        raise Http404('Unsupported image variant.')
+    user = get_user_model().objects.alive().filter(pk=user_id).only(
+        'image'
+    ).first()
+    if user is None or not user.image:
+        raise Http404('No image.')
+    image_format, content_type = FORMATS[ext]
+    try:
+        path, version = variant_path(user.image, size, ext)
+    except FileNotFoundError:
+        raise Http404('No image.')
+
+    etag = quote_etag(version)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        cache.get_or_render(
+            path, render_variant(user.image, size, image_format)
+        )
+        response = deliver(request, path, content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f'public, max-age={settings.USER_IMAGE_MAX_AGE}'
+    )
+    return response
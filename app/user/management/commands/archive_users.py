@@ -0,0 +1,93 @@
+"""
+Django command to move long inactive users to cold storage.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+from django.utils import timezone
+
+from user import archive
+from user.models import ArchivedUser
+
+
+class Command(BaseCommand):
+    """Django command to archive or restore users."""
+    help = (
+        'Archive users idle or deactivated for long in throttled batches. '
+        'Archived users are restored on their next login.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.USER_ARCHIVE_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=settings.USER_ARCHIVE_SLEEP,
+            help='Minimum seconds between batches; never less than the '
+                 'previous batch took.',
+        )
+        parser.add_argument(
+            '--lock-timeout', type=int,
+            default=settings.USER_ARCHIVE_LOCK_TIMEOUT,
+            help='Milliseconds to wait for a lock before skipping a batch.',
+        )
+        parser.add_argument('--max-batches', type=int, default=0)
+        parser.add_argument('--max-retries', type=int, default=5)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the users that would be archived.',
+        )
+        parser.add_argument(
+            '--restore', type=int, nargs='+', metavar='ID',
+            help='Restore these archived users instead.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['restore']:
+            self.restore(options['restore'])
+            return
+        now = timezone.now()
+        if options['dry_run']:
+            count = archive.candidates(now).count()
+            self.stdout.write(f'{count} users would be archived.')
+            return
+
+        total = batches = failures = 0
+        while not options['max_batches'] or batches < options['max_batches']:
+            started = time.monotonic()
+            try:
+                moved = archive.archive_batch(
+                    options['batch_size'], options['lock_timeout'], now
+                )
+            except OperationalError as e:
+                failures += 1
+                if failures > options['max_retries']:
+                    raise CommandError(f'Giving up after {total} users: {e}')
+                self.stderr.write(f'Batch skipped, will retry: {e}')
+            else:
+                if not moved:
+                    break
+                failures = 0
+                total += moved
+                self.stdout.write(f'Archived {total} users.')
+            batches += 1
+            # Sleep at least as long as the batch ran, for a duty cycle
+            # of at most one half
+            time.sleep(max(options['sleep'], time.monotonic() - started))
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} users.'))
+
+    def restore(self, ids):
+        for pk in ids:
+            with transaction.atomic():
+                archived = ArchivedUser.objects.select_for_update().filter(
+                    pk=pk
+                ).first()
+                if archived is None:
+                    self.stderr.write(f'No archived user {pk}.')
+                    continue
+                archive.unarchive(archived)
+            self.stdout.write(f'Restored {archived.email}.')
@@ -0,0 +1,89 @@
+"""
+Django command to export users as CSV, NDJSON or Parquet.
+"""
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from user import export
+from user.models import User
+
+
+class Command(BaseCommand):
+    """Django command to stream the user table to a file."""
+    help = 'Export users in constant memory, resumable by last seen id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Destination file, "-" for stdout.',
+        )
+        parser.add_argument(
+            '--format', dest='output_format', default='csv',
+            choices=list(export.CONTENT_TYPES),
+        )
+        parser.add_argument(
+            '--fields', default='',
+            help='Comma separated columns, defaults to all exportable.',
+        )
+        parser.add_argument(
+            '--after-id', type=int, default=None,
+            help='Resume after this user id.',
+        )
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            fields = export.parse_fields(
+                options['fields'], export.SUPERUSER_EXPORT_FIELDS
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output'] == '-':
+            target = sys.stdout.buffer
+        else:
+            target = open(options['output'], 'wb')
+        try:
+            if options['gzip']:
+                with gzip.GzipFile(fileobj=target, mode='wb') as stream:
+                    self.write(stream, fields, options)
+            else:
+                self.write(target, fields, options)
+        except ImportError:
+            raise CommandError('Parquet export requires pyarrow.')
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+    def write(self, stream, fields, options):
+        """Write the export to a binary stream."""
+        queryset = User.objects.all()
+        if (
+            options['output_format'] == 'csv' and
+            connection.vendor == 'postgresql'
+        ):
+            self.copy_to(stream, queryset, fields, options['after_id'])
+            return
+
+        for chunk in export.stream_users(
+            queryset, fields, options['output_format'],
+            options['after_id'], chunk_size=options['chunk_size'],
+        ):
+            stream.write(chunk)
+
+    def copy_to(self, stream, queryset, fields, after_id):
+        """Let PostgreSQL render the CSV through `COPY ... TO STDOUT`."""
+        if after_id is not None:
+            queryset = queryset.filter(id__gt=after_id)
+        queryset = queryset.order_by('id').values_list(*fields)
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            query = cursor.mogrify(sql, params).decode()
+            cursor.copy_expert(
+                f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)', stream
+            )
@@ -0,0 +1,201 @@
+"""
+Django command to seed the database with synthetic users.
+"""
+import io
+import random
+import secrets
+import time
+
+from faker import Faker
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from user.models import User
+
+
+def parse_distribution(value, choices):
+    """Parse `key=weight,...` into a {key: weight} dict limited to choices."""
+    allowed = [choice[0] for choice in choices]
+    weights = {}
+    for item in filter(None, value.split(',')):
+        key, _, weight = item.partition('=')
+        key = key.strip()
+        if key not in allowed:
+            raise CommandError(
+                f'Unknown value "{key}", expected one of {allowed}.'
+            )
+        try:
+            weights[key] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for "{key}": "{weight}".')
+    if not weights or sum(weights.values()) <= 0:
+        raise CommandError(f'Distribution "{value}" has no positive weight.')
+
+    return weights
+
+
+def copy_value(value):
+    """Encode a value for the text format of `COPY FROM STDIN`."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+class Command(BaseCommand):
+    """Django command to bulk load Faker generated users."""
+    help = 'Seed the user table with synthetic users in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--password', default='defaultpassword')
+        parser.add_argument(
+            '--roles',
+            default='home_seeker=70,property_owner=29,admin=1',
+            help='Weighted user types, e.g. "home_seeker=3,property_owner=1"',
+        )
+        parser.add_argument(
+            '--genders',
+            default='M=1,F=1',
+            help='Weighted genders, e.g. "M=1,F=1"',
+        )
+        parser.add_argument(
+            '--no-defer-indexes',
+            action='store_false',
+            dest='defer_indexes',
+            help='Keep secondary indexes in place while loading.',
+        )
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        count = options['count']
+        batch_size = options['batch_size']
+        if count < 1 or batch_size < 1:
+            raise CommandError('count and batch size must be positive.')
+
+        roles = parse_distribution(options['roles'], User.USER_TYPE_CHOICES)
+        genders = parse_distribution(options['genders'], User.GENDER_CHOICES)
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker()
+        self.fake.seed_instance(options['seed'])
+        self.token = secrets.token_hex(3)
+        self.password = make_password(options['password'])
+        self.fields = [
+            field for field in User._meta.concrete_fields
+            if not field.primary_key
+        ]
+
+        use_copy = connection.vendor == 'postgresql'
+        started = time.monotonic()
+        with transaction.atomic():
+            dropped = []
+            if use_copy and options['defer_indexes']:
+                dropped = self.drop_indexes()
+            created = 0
+            while created < count:
+                size = min(batch_size, count - created)
+                users = self.build_users(created, size, roles, genders)
+                if use_copy:
+                    self.copy_users(users)
+                else:
+                    User.objects.bulk_create(users)
+                created += size
+                self.stdout.write(f'Loaded {created}/{count} users...')
+            if dropped:
+                self.restore_indexes(dropped)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {count} users in {elapsed:.1f}s.'
+        ))
+
+    def build_users(self, offset, size, roles, genders):
+        """Return `size` unsaved users sharing one password hash."""
+        user_types = self.rng.choices(
+            list(roles), weights=list(roles.values()), k=size
+        )
+        user_genders = self.rng.choices(
+            list(genders), weights=list(genders.values()), k=size
+        )
+        users = []
+        for i in range(size):
+            user_type = user_types[i]
+            users.append(User(
+                email=(
+                    f'{self.fake.user_name()}.{self.token}{offset + i}'
+                    f'@{self.fake.free_email_domain()}'
+                ),
+                name=self.fake.name(),
+                gender=user_genders[i],
+                user_type=user_type,
+                is_staff=user_type == 'admin',
+                password=self.password,
+            ))
+
+        return users
+
+    def copy_users(self, users):
+        """Stream one batch of users through `COPY FROM STDIN`."""
+        buffer = io.StringIO()
+        for user in users:
+            buffer.write('\t'.join(
+                copy_value(field.get_db_prep_save(
+                    field.pre_save(user, True), connection
+                ))
+                for field in self.fields
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in self.fields
+        )
+        table = connection.ops.quote_name(User._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN', buffer
+            )
+
+    def drop_indexes(self):
+        """Drop indexes that do not back a constraint, return definitions."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.relname, pg_get_indexdef(i.indexrelid)
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = %s::regclass
+                  AND NOT EXISTS (
+                    SELECT 1 FROM pg_constraint con
+                    WHERE con.conindid = i.indexrelid
+                  )
+                """,
+                [User._meta.db_table],
+            )
+            indexes = cursor.fetchall()
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        if indexes:
+            self.stdout.write(f'Deferred {len(indexes)} index(es).')
+
+        return [definition for _, definition in indexes]
+
+    def restore_indexes(self, definitions):
+        """Recreate deferred indexes and refresh planner statistics."""
+        self.stdout.write('Rebuilding deferred indexes...')
+        with connection.cursor() as cursor:
+            for definition in definitions:
+                cursor.execute(definition)
+            cursor.execute(
+                f'ANALYZE {connection.ops.quote_name(User._meta.db_table)}'
+            )
@@ -0,0 +1,19 @@
+"""
+Middleware for users.
+"""
+from user.activity import tracker
+
+
+class ActivityMiddleware:
+    """Record when authenticated users were last seen."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF copies the user it authenticated back onto the HttpRequest.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            tracker.record_seen(user.pk)
+        return response
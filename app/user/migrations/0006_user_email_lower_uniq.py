@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:58
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def check_collisions(apps, schema_editor):
+    """Abort with a report if emails collide when compared without case."""
+    User = apps.get_model('user', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    collisions = (
+        users
+        .values(email_lower=django.db.models.functions.text.Lower('email'))
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+        .order_by('email_lower')
+    )
+    report = [
+        f"{row['email_lower']}: " + ', '.join(
+            f'{pk} ({email})' for pk, email in users.filter(
+                email__iexact=row['email_lower']
+            ).order_by('pk').values_list('pk', 'email')
+        )
+        for row in collisions
+    ]
+    if report:
+        raise RuntimeError(
+            'Cannot make emails case-insensitive, merge or rename these '
+            'users first:\n' + '\n'.join(report)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_user_updated_at_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_collisions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='user_email_lower_uniq'),
+        ),
+    ]
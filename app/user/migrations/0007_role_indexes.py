@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+INDEXES = [
+    models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['user_type', 'id'], name='user_role_alive_idx'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    """Build the indexes without blocking writes on PostgreSQL."""
+    User = apps.get_model('user', 'User')
+    for index in INDEXES:
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.add_index(User, index, concurrently=True)
+        else:
+            schema_editor.add_index(User, index)
+
+
+def drop_indexes(apps, schema_editor):
+    User = apps.get_model('user', 'User')
+    for index in INDEXES:
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.remove_index(User, index, concurrently=True)
+        else:
+            schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('user', '0006_user_email_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='user', index=index)
+                for index in INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:18
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.functions.text
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_role_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedUser',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('email', models.EmailField(max_length=255)),
+                ('data', models.JSONField()),
+                ('tokens', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='archiveduser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='archived_user_email_lower_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_archiveduser'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archiveduser',
+            index=models.Index(fields=['archived_at', 'id'], name='archived_user_archived_at_idx'),
+        ),
+    ]
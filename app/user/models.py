@@ -4,13 +4,19 @@ Database User models.
 import os
 import uuid
 \
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
 
+from outbox import events
+from outbox.models import Event
+
 
 def user_image_file_path(instance, filename):
     """Generate file path for a new recipe image."""
@@ -48,10 +54,20 @@ class UserManager(BaseUserManager):
         user.set_password(password)
         user.gender = gender
         user.user_type = user_type
-        user.save(using=self._db)
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
+            events.emit(Event.USER_CREATED, user)
 
         return user
 
+    def get_by_natural_key(self, email):
+        """Case-insensitive email lookup, probing the `Lower(email)` index."""
+        return self.get(email__lower=email.lower())
+
+    def alive(self):
+        """Users that have not been soft deleted."""
+        return self.filter(deleted_at__isnull=True)
+
     def create_superuser(self, email, password=None, **extra_fields):
         """Create, save and return a new user."""
         user = self.create_user(email, password)
@@ -91,10 +107,85 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
 
     image = models.ImageField(null=True, upload_to=user_image_file_path)
+    last_seen = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    # Saves touching only these fields do not bump `updated_at`.
+    ACTIVITY_FIELDS = {'last_login', 'last_seen'}
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['updated_at', 'id'],
+                name='user_updated_at_id_idx',
+            ),
+            # Role scoped scans read only the rows of one role, much as a
+            # partition of `user_type` would
+            models.Index(
+                fields=['user_type', 'id'],
+                name='user_role_alive_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        ]
+        constraints = [
+            # Emails are unique regardless of case
+            models.UniqueConstraint(
+                Lower('email'), name='user_email_lower_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return self.email
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if (
+            update_fields is not None and
+            not set(update_fields) <= self.ACTIVITY_FIELDS
+        ):
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        """Deactivate the user and leave a tombstone for the change feed."""
+        self.is_active = False
+        self.deleted_at = timezone.now()
+        with transaction.atomic():
+            self.save(update_fields=['is_active', 'deleted_at'])
+            events.emit(Event.USER_DEACTIVATED, self, deleted=True)
+
+
+class ArchivedUser(models.Model):
+    """
+    A long inactive user moved out of the user table, see `user.archive`.
+
+    `data` holds the user's column values and group and permission ids,
+    `tokens` their outstanding tokens, so the user comes back unchanged.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    email = models.EmailField(max_length=255)
+    data = models.JSONField()
+    tokens = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Archived users are tombstones of the change feed
+            models.Index(
+                fields=['archived_at', 'id'],
+                name='archived_user_archived_at_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                Lower('email'), name='archived_user_email_lower_uniq',
+            ),
+        ]
+
     def __str__(self):
         return self.email
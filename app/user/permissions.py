@@ -1,62 +1,148 @@
 """
 Customized user permissions
 """
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
 from rest_framework import permissions
 
+from core.bus import bus
 
-class IsAdminUser(permissions.BasePermission):
+ADMIN = 'admin'
+SUPERUSER = 'superuser'
+HOME_SEEKER = 'home_seeker'
+PROPERTY_OWNER = 'property_owner'
+
+GLOBAL_VERSION_KEY = 'user-access:version'
+
+
+class Access:
     """
-    Allows access only to admin users.
+    Effective roles and Django permissions of one user.
+
+    Roles come from the user row, permissions are only resolved when first
+    checked and are then cached across requests until the user, their
+    groups or any group or permission changes.
     """
 
-    def has_permission(self, request, view):
-        return bool(
-            request.user and
-            request.user.is_authenticated and
-            request.user.user_type == 'admin' and
-            request.user.is_active
-        )
+    def __init__(self, user=None):
+        self.user = user
+        self.roles = frozenset(get_roles(user)) if user else frozenset()
+        self._perms = None if user else frozenset()
+
+    @property
+    def perms(self):
+        if self._perms is None:
+            self._perms = frozenset(get_perms(self.user))
+        return self._perms
+
+    def has_role(self, role):
+        return role in self.roles
+
+    def has_perm(self, perm):
+        return SUPERUSER in self.roles or perm in self.perms
+
+
+NO_ACCESS = Access()
 
 
-class IsSuperUser(permissions.BasePermission):
+def user_version_key(user_id):
+    return f'user-access:version:{user_id}'
+
+
+def bump_version(user_id=None):
     """
-    Allows access only to super users.
+    Invalidate cached access for one user, or for everyone.
+
+    Entries are keyed by version, so bumping it is enough and stale
+    entries simply expire.
     """
+    key = GLOBAL_VERSION_KEY if user_id is None else user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
 
-    def has_permission(self, request, view):
-        return bool(
-            request.user and
-            request.user.is_authenticated and
-            request.user.user_type == 'admin' and
-            request.user.is_active and
-            request.user.is_staff and
-            request.user.is_superuser
-        )
+
+# Also reaches the local cache of every other worker
+bus.subscribe('user', bump_version)
+bus.subscribe('access', bump_version)
+
+
+def get_roles(user):
+    roles = {user.user_type}
+    if (
+        user.user_type == ADMIN and user.is_staff and user.is_superuser
+    ):
+        roles.add(SUPERUSER)
+    return roles
+
+
+def get_perms(user):
+    user_key = user_version_key(user.pk)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    key = 'user-access:{}:{}:{}'.format(
+        user.pk, versions.get(GLOBAL_VERSION_KEY, 0),
+        versions.get(user_key, 0),
+    )
+    perms = cache.get(key)
+    if perms is None:
+        perms = ModelBackend().get_all_permissions(user)
+        cache.set(key, perms, settings.USER_ACCESS_CACHE_TIMEOUT)
+    return perms
 
 
-class IsHomeSeeker(permissions.BasePermission):
+def get_access(user):
+    """Resolve the access of `user`, memoized for the request."""
+    if not user or not user.is_authenticated or not user.is_active:
+        return NO_ACCESS
+    access = getattr(user, '_access', None)
+    if access is None:
+        access = user._access = Access(user)
+    return access
+
+
+def has_role(user, role):
+    return get_access(user).has_role(role)
+
+
+def has_perm(user, perm):
+    return get_access(user).has_perm(perm)
+
+
+class RolePermission(permissions.BasePermission):
     """
-    Allows access only to admin users.
+    Allows access only to active users with `role`.
     """
+    role = None
 
     def has_permission(self, request, view):
-        return bool(
-            request.user and
-            request.user.is_authenticated and
-            request.user.user_type == 'home_seeker' and
-            request.user.is_active
-        )
+        return has_role(request.user, self.role)
 
 
-class IsPropertyOwner(permissions.BasePermission):
+class IsAdminUser(RolePermission):
     """
     Allows access only to admin users.
     """
+    role = ADMIN
 
-    def has_permission(self, request, view):
-        return bool(
-            request.user and
-            request.user.is_authenticated and
-            request.user.user_type == 'property_owner' and
-            request.user.is_active
-        )
+
+class IsSuperUser(RolePermission):
+    """
+    Allows access only to super users.
+    """
+    role = SUPERUSER
+
+
+class IsHomeSeeker(RolePermission):
+    """
+    Allows access only to home seekers.
+    """
+    role = HOME_SEEKER
+
+
+class IsPropertyOwner(RolePermission):
+    """
+    Allows access only to property owners.
+    """
+    role = PROPERTY_OWNER
@@ -1,16 +1,65 @@
 """
 Serializers for the user API View
 """
+from django.conf import settings
 from django.contrib.auth import (
     get_user_model,
     # authenticate,  # token related
 )
+from django.db import transaction
 # from django.utils.translation import gettext as _  # token related
 
-from rest_framework import serializers
+from rest_framework import exceptions, permissions, serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings
 
+from audit.models import AuditEvent
+from audit.recorder import recorder
+from outbox import events
+from outbox.models import Event
+from user.activity import tracker
+from user.models import ArchivedUser
+from user.tokens import RefreshToken
 
-class UserSerializer(serializers.ModelSerializer):
+
+def parse_field_list(value):
+    """Split a comma separated `?fields=` style parameter into a set."""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Trim the output of GET requests to `?fields=` and drop `?omit=`.
+
+    Only readable fields can be selected, so write-only fields such as the
+    password are rejected rather than exposed. `id` is always kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return
+        kept = self.sparse_field_names(request.query_params)
+        for name in set(self.fields) - kept:
+            self.fields.pop(name)
+
+    def sparse_field_names(self, params):
+        readable = {
+            name for name, field in self.fields.items()
+            if not field.write_only
+        }
+        fields = parse_field_list(params.get('fields'))
+        omit = parse_field_list(params.get('omit'))
+        unknown = (fields | omit) - readable
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': f'Unknown field(s): {", ".join(sorted(unknown))}.'
+            })
+        return ((fields or readable) - omit) | {'id'}
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for the user object."""
 
     class Meta:
@@ -24,6 +73,20 @@ class UserSerializer(serializers.ModelSerializer):
             'user_type': {'required': True},
         }
 
+    def validate_email(self, value):
+        """Reject emails taken by another user in any letter case."""
+        users = get_user_model().objects.filter(email__lower=value.lower())
+        if self.instance is not None:
+            users = users.exclude(pk=self.instance.pk)
+        # Archived users keep their email until they log in again
+        if users.exists() or ArchivedUser.objects.filter(
+            email__lower=value.lower()
+        ).exists():
+            raise serializers.ValidationError(
+                'user with this email already exists.'
+            )
+        return value
+
     def create(self, validated_data):
         """Create and return a user with encrypted password."""
         return get_user_model().objects.create_user(**validated_data)
@@ -31,15 +94,53 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update and return user."""
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        was_active = instance.is_active
+        with transaction.atomic():
+            user = super().update(instance, validated_data)
 
-        if password:
-            user.set_password(password)
-            user.save()
+            if password:
+                user.set_password(password)
+                user.save()
+
+            changed = set(validated_data)
+            if password:
+                changed.add('password')
+            if was_active and not user.is_active:
+                event_type = Event.USER_DEACTIVATED
+            else:
+                event_type = Event.USER_UPDATED
+            events.emit(event_type, user, changed=sorted(changed))
 
         return user
 
 
+class UserChangeSerializer(UserSerializer):
+    """
+    Serializer for the user change feed, tombstones for deletions and,
+    with the `hide_admins` context, for admins.
+    """
+    deleted = serializers.SerializerMethodField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['updated_at', 'deleted']
+
+    def get_deleted(self, obj):
+        return obj.deleted_at is not None
+
+    def to_representation(self, instance):
+        if instance.deleted_at is not None or (
+            instance.user_type == 'admin' and self.context.get('hide_admins')
+        ):
+            return {
+                'id': instance.id,
+                'updated_at': serializers.DateTimeField().to_representation(
+                    instance.updated_at
+                ),
+                'deleted': True,
+            }
+        return super().to_representation(instance)
+
+
 class UserImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to users."""
 
@@ -49,12 +150,80 @@ class UserImageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
 
+    def update(self, instance, validated_data):
+        """Replace the image and record the change in the outbox."""
+        with transaction.atomic():
+            user = super().update(instance, validated_data)
+            events.emit(Event.USER_IMAGE_CHANGED, user)
+        return user
+
 
-class SuperUserSerializer(serializers.ModelSerializer):
+class SuperUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for the user objects to superuser auth."""
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ['is_staff', 'is_superuser']
 
 
+class UserBatchLookupSerializer(serializers.Serializer):
+    """Serializer for looking up many users by id or by email."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False
+    )
+    emails = serializers.ListField(
+        child=serializers.EmailField(), required=False
+    )
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('emails' in attrs):
+            raise serializers.ValidationError(
+                'Provide either ids or emails.'
+            )
+        identifiers = attrs.get('ids', attrs.get('emails'))
+        limit = settings.USER_BATCH_LOOKUP_LIMIT
+        if len(identifiers) > limit:
+            raise serializers.ValidationError(
+                f'At most {limit} users can be looked up at once.'
+            )
+        return attrs
+
+
+class EmailAvailabilitySerializer(serializers.Serializer):
+    """Serializer for checking whether an email can sign up."""
+    email = serializers.EmailField()
+
+
 class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """Obtain a token pair and record the login without a write."""
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        try:
+            data = super().validate(attrs)
+        except exceptions.AuthenticationFailed:
+            recorder.record(
+                AuditEvent.LOGIN_FAILED, request,
+                email=attrs.get(self.username_field),
+            )
+            raise
+        tracker.record_login(self.user.pk)
+        recorder.record(AuditEvent.LOGIN, request, user=self.user)
+        return data
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Refresh an access token and audit the refresh."""
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = self.token_class(attrs['refresh'], verify=False)
+        recorder.record(
+            AuditEvent.TOKEN_REFRESH, self.context.get('request'),
+            user=refresh.get(api_settings.USER_ID_CLAIM),
+        )
+        return data
@@ -0,0 +1,59 @@
+"""
+Signal handlers for the user app.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from core.bus import bus
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    instance.__dict__.pop('_access', None)
+    if update_fields and set(update_fields) <= User.ACTIVITY_FIELDS:
+        return
+    bus.publish('user', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def publish_email(sender, instance, created, update_fields=None, **kwargs):
+    """Feed new emails to the email filters of every worker."""
+    if created or update_fields is None or 'email' in update_fields:
+        bus.publish('email', instance.email.lower())
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_member_access(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bus.publish('access', instance.pk)
+    elif pk_set is None:
+        # Cleared from the group or permission side, members unknown
+        bus.publish('access')
+    else:
+        for pk in pk_set:
+            bus.publish('access', pk)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_all_access(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        bus.publish('access')
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_tokens(sender, instance, **kwargs):
+    bus.publish('token', instance.token.user_id)
@@ -0,0 +1,67 @@
+"""
+Background tasks for users.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from PIL import ExifTags, Image, ImageOps
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from core.bus import bus
+from jobs.queue import task
+from outbox import events
+from outbox.models import Event
+
+User = get_user_model()
+
+
+@task(queue='images')
+def process_user_image(user_id):
+    """Apply EXIF orientation and downscale an uploaded user image."""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or not user.image:
+        return
+
+    max_size = settings.USER_IMAGE_MAX_SIZE
+    with user.image.open('rb') as f:
+        img = Image.open(f)
+        img.load()
+    img_format = img.format
+    orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+    if orientation == 1 and max(img.size) <= max_size:
+        return
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_size, max_size))
+
+    with user.image.storage.open(user.image.name, 'wb') as f:
+        img.save(f, format=img_format)
+
+
+@task()
+def flush_expired_tokens(user_id):
+    """Delete a user's expired outstanding (and blacklisted) tokens."""
+    OutstandingToken.objects.filter(
+        user_id=user_id, expires_at__lte=timezone.now()
+    ).delete()
+
+
+@task()
+def deactivate_users(user_ids):
+    """Deactivate the given users."""
+    with transaction.atomic():
+        deactivated = list(
+            User.objects.filter(pk__in=user_ids, is_active=True)
+            .select_for_update()
+        )
+        now = timezone.now()
+        User.objects.filter(pk__in=[user.pk for user in deactivated]).update(
+            is_active=False, updated_at=now
+        )
+        for user in deactivated:
+            user.is_active = False
+            user.updated_at = now
+        events.emit_many(Event.USER_DEACTIVATED, deactivated)
+    # update() sends no signals, deactivated users must be denied promptly
+    for user_id in user_ids:
+        bus.publish('user', user_id)
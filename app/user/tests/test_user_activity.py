@@ -0,0 +1,74 @@
+"""
+Tests for the user activity tracking.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from user.activity import ActivityTracker
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+ACCESS_TOKEN_URL = reverse('user:token_obtain_pair')
+ME_URL = reverse('user:me')
+
+
+@pytest.mark.django_db
+def test_token_obtain_records_last_login():
+    """Test obtaining a token updates last login."""
+    User.objects.create_user(email='test@example.com', password='pass12345')
+    client = APIClient()
+
+    res = client.post(ACCESS_TOKEN_URL, {
+        'email': 'test@example.com', 'password': 'pass12345'
+    })
+
+    user = User.objects.get(email='test@example.com')
+    assert res.status_code == 200
+    assert user.last_login is not None
+    assert user.last_seen == user.last_login
+
+
+@pytest.mark.django_db
+def test_authenticated_request_records_last_seen():
+    """Test API requests update last seen for the authenticated user."""
+    user = UserFactory(user_type='home_seeker')
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    client.get(ME_URL)
+
+    user.refresh_from_db()
+    assert user.last_seen is not None
+    assert user.last_login is None
+
+
+@pytest.mark.django_db
+def test_tracker_coalesces_writes_per_user():
+    """Test many records for a user collapse into one buffered row."""
+    users = UserFactory.create_batch(2, user_type='home_seeker')
+    start = timezone.now()
+    tracker = ActivityTracker()
+
+    with patch.object(tracker, 'schedule'):
+        tracker.record_login(users[0].id, start)
+        for i in range(5):
+            tracker.record_seen(users[0].id, start + timedelta(seconds=i))
+            tracker.record_seen(users[1].id, start + timedelta(seconds=i))
+
+    assert len(tracker.pending) == 2
+    tracker.flush()
+
+    assert tracker.pending == {}
+    users[0].refresh_from_db()
+    users[1].refresh_from_db()
+    assert users[0].last_login == start
+    assert users[0].last_seen == start + timedelta(seconds=4)
+    assert users[1].last_login is None
+    assert users[1].last_seen == start + timedelta(seconds=4)
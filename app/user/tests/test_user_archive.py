@@ -0,0 +1,196 @@
+"""
+Tests for archiving inactive users.
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken, OutstandingToken
+)
+
+from listings.models import Listing, Preference
+from outbox.models import Event
+from user.models import ArchivedUser
+from user.tokens import recorder, RefreshToken
+
+User = get_user_model()
+
+ACCESS_TOKEN_URL = reverse('user:token_obtain_pair')
+CREATE_USER_URL = reverse('user:user-list')
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+def make_user(email, days_idle, **fields):
+    user = User.objects.create_user(
+        email, 'sample123', user_type='home_seeker', **fields
+    )
+    long_ago = timezone.now() - timedelta(days=days_idle)
+    User.objects.filter(pk=user.pk).update(
+        updated_at=long_ago, last_login=long_ago
+    )
+    return user
+
+
+@pytest.fixture
+def idle(db):
+    user = make_user('Idle@example.com', 1000, name='Idle')
+    user.groups.add(Group.objects.create(name='tenants'))
+    live = RefreshToken.for_user(user)
+    revoked = RefreshToken.for_user(user)
+    recorder.flush()
+    revoked.blacklist()
+    return user, live, revoked
+
+
+@pytest.mark.django_db
+def test_archive_users_moves_qualifying_users(idle):
+    """Test idle and long deactivated users are archived, others are not."""
+    user, live, revoked = idle
+    inactive = make_user('inactive@example.com', 200, is_active=False)
+    recent = make_user('recent@example.com', 10)
+    admin = make_user('admin@example.com', 1000)
+    User.objects.filter(pk=admin.pk).update(user_type='admin')
+
+    call_command('archive_users', batch_size=1, sleep=0, stdout=StringIO())
+
+    assert set(ArchivedUser.objects.values_list('pk', flat=True)) == {
+        user.pk, inactive.pk,
+    }
+    assert set(User.objects.values_list('pk', flat=True)) == {
+        recent.pk, admin.pk,
+    }
+    assert not OutstandingToken.objects.filter(user_id=user.pk).exists()
+    archived = ArchivedUser.objects.get(pk=user.pk)
+    assert archived.email == 'Idle@example.com'
+    assert len(archived.tokens) == 2
+    assert set(Event.objects.filter(
+        type=Event.USER_DEACTIVATED, payload__archived=True
+    ).values_list('user_id', flat=True)) == {user.pk, inactive.pk}
+
+
+@pytest.mark.django_db
+def test_listing_owners_and_seekers_are_not_archived(idle):
+    """Test idle users keep their account, listings and preferences."""
+    owner = make_user('owner@example.com', 1000)
+    Listing.objects.create(
+        owner=owner, title='Flat', latitude=30, longitude=31, price=900,
+        rooms=2,
+    )
+
+    seeker = make_user('seeker@example.com', 1000)
+    Preference.objects.create(
+        user=seeker, latitude=30, longitude=31, max_price=1000,
+    )
+
+    call_command('archive_users', sleep=0, stdout=StringIO())
+
+    assert User.objects.filter(pk=owner.pk).exists()
+    assert Listing.objects.filter(owner=owner).exists()
+    assert Preference.objects.filter(user=seeker).exists()
+    assert ArchivedUser.objects.filter(pk=idle[0].pk).exists()
+
+
+@pytest.mark.django_db
+def test_archive_users_limits_batches(idle):
+    """Test batches are bounded by size and count."""
+    make_user('other@example.com', 1000)
+
+    call_command(
+        'archive_users', batch_size=1, max_batches=1, sleep=0,
+        stdout=StringIO(),
+    )
+
+    assert ArchivedUser.objects.count() == 1
+    assert User.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_archive_users_dry_run(idle):
+    """Test a dry run only counts."""
+    out = StringIO()
+
+    call_command('archive_users', dry_run=True, stdout=out)
+
+    assert '1 users would be archived' in out.getvalue()
+    assert not ArchivedUser.objects.exists()
+
+
+@pytest.mark.django_db
+def test_login_restores_archived_user(client, idle):
+    """Test logging in brings back the user, groups and tokens."""
+    user, live, revoked = idle
+    call_command('archive_users', sleep=0, stdout=StringIO())
+
+    res = client.post(
+        ACCESS_TOKEN_URL,
+        {'email': 'idle@EXAMPLE.com', 'password': 'sample123'},
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    restored = User.objects.get(pk=user.pk)
+    assert restored.email == 'Idle@example.com'
+    assert restored.name == 'Idle'
+    assert restored.user_type == 'home_seeker'
+    assert list(restored.groups.values_list('name', flat=True)) == [
+        'tenants'
+    ]
+    assert not ArchivedUser.objects.exists()
+    assert OutstandingToken.objects.filter(jti=live['jti']).exists()
+    assert BlacklistedToken.objects.filter(token__jti=revoked['jti']).exists()
+    assert not BlacklistedToken.objects.filter(token__jti=live['jti']).exists()
+
+
+@pytest.mark.django_db
+def test_wrong_password_keeps_user_archived(client, idle):
+    """Test a failed login does not restore the user."""
+    call_command('archive_users', sleep=0, stdout=StringIO())
+
+    res = client.post(
+        ACCESS_TOKEN_URL,
+        {'email': 'idle@example.com', 'password': 'wrong'},
+    )
+
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+    assert ArchivedUser.objects.count() == 1
+    assert not User.objects.exists()
+
+
+@pytest.mark.django_db
+def test_archived_email_cannot_register(client, idle):
+    """Test an archived user's email stays taken."""
+    call_command('archive_users', sleep=0, stdout=StringIO())
+
+    res = client.post(CREATE_USER_URL, {
+        'email': 'IDLE@example.com',
+        'password': 'sample123',
+        'name': 'Impostor',
+        'gender': 'M',
+        'user_type': 'home_seeker',
+    })
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'email' in res.data
+
+
+@pytest.mark.django_db
+def test_archive_users_restore(idle):
+    """Test archived users can be restored by id."""
+    user = idle[0]
+    call_command('archive_users', sleep=0, stdout=StringIO())
+
+    call_command('archive_users', restore=[user.pk], stdout=StringIO())
+
+    assert User.objects.get(pk=user.pk).check_password('sample123')
+    assert not ArchivedUser.objects.exists()
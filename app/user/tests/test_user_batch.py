@@ -0,0 +1,96 @@
+"""
+Tests for the batch user lookup.
+"""
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+BATCH_URL = reverse('user:user-batch')
+
+
+@pytest.fixture
+def admin_client(db):
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='admin'))
+    return client
+
+
+@pytest.fixture
+def superuser_client(db):
+    user = User.objects.create_superuser('super@example.com', 'pass12345')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def test_batch_by_ids(admin_client, django_assert_num_queries):
+    """Test looking up users by id with not-found and hidden users."""
+    seeker = UserFactory(user_type='home_seeker')
+    owner = UserFactory(user_type='property_owner')
+    admin = UserFactory(user_type='admin')
+    ids = [owner.id, 999999, seeker.id, admin.id]
+
+    # One lookup query plus the inline last_seen flush
+    with django_assert_num_queries(2):
+        res = admin_client.post(BATCH_URL, {'ids': ids}, format='json')
+
+    assert res.status_code == status.HTTP_200_OK
+    results = res.data['results']
+    assert list(results) == [str(i) for i in ids]
+    assert results[str(owner.id)]['email'] == owner.email
+    assert results[str(seeker.id)]['email'] == seeker.email
+    assert results['999999'] is None
+    assert results[str(admin.id)] is None
+    assert 'password' not in results[str(owner.id)]
+
+
+def test_batch_by_emails(superuser_client):
+    """Test looking up users by email, admins are visible to superusers."""
+    admin = UserFactory(user_type='admin')
+
+    res = superuser_client.post(
+        BATCH_URL,
+        {'emails': [admin.email.upper(), 'missing@example.com']},
+        format='json',
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['results'][admin.email.upper()]['is_staff'] is False
+    assert res.data['results']['missing@example.com'] is None
+
+
+@pytest.mark.parametrize('payload', [
+    {},
+    {'ids': [1], 'emails': ['a@example.com']},
+    {'ids': ['x']},
+])
+def test_batch_invalid_payload(admin_client, payload):
+    """Test exactly one valid identifier list is required."""
+    res = admin_client.post(BATCH_URL, payload, format='json')
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@override_settings(USER_BATCH_LOOKUP_LIMIT=2)
+def test_batch_limit(admin_client):
+    """Test the number of identifiers is capped."""
+    res = admin_client.post(BATCH_URL, {'ids': [1, 2, 3]}, format='json')
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_batch_requires_admin(db):
+    """Test non-admin users cannot use the batch lookup."""
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='home_seeker'))
+
+    res = client.post(BATCH_URL, {'ids': [1]}, format='json')
+
+    assert res.status_code == status.HTTP_403_FORBIDDEN
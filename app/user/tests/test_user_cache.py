@@ -0,0 +1,114 @@
+"""
+Tests for the user cache and cached JWT authentication.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.cache import user_cache
+from user.tasks import deactivate_users
+from user.user_factory import UserFactory
+
+ME_URL = reverse('user:me')
+
+
+@pytest.fixture
+def user(db):
+    return UserFactory(user_type='home_seeker', name='Before')
+
+
+def jwt_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+    )
+    return client
+
+
+def user_selects(queries):
+    return [
+        q['sql'] for q in queries
+        if q['sql'].startswith('SELECT') and 'FROM "user_user"' in q['sql']
+    ]
+
+
+def test_read_through(user, django_assert_num_queries):
+    """Test users are loaded once and then served from memory."""
+    before = user_cache.snapshot()
+    first = user_cache.get(user.pk)
+
+    with django_assert_num_queries(0):
+        second = user_cache.get(user.pk)
+
+    assert second == first and second is not first
+    assert second.name == 'Before'
+    assert user_cache.get(0) is None
+    stats = user_cache.snapshot()
+    assert stats['hits'] - before['hits'] == 1
+    assert stats['misses'] - before['misses'] == 2
+
+
+def test_save_invalidates(user):
+    """Test saving a user, including a new password, invalidates."""
+    user_cache.get(user.pk)
+
+    user.name = 'After'
+    user.set_password('new-password')
+    user.save()
+
+    cached = user_cache.get(user.pk)
+    assert cached.name == 'After'
+    assert cached.check_password('new-password')
+
+
+def test_ttl_and_size_bounds(user, settings):
+    """Test entries expire and the LRU is bounded."""
+    other = UserFactory(user_type='home_seeker')
+    settings.USER_CACHE_SIZE = 1
+    before = user_cache.snapshot()
+    user_cache.get(user.pk)
+    user_cache.get(other.pk)
+    stats = user_cache.snapshot()
+    assert stats['evictions'] - before['evictions'] == 1
+    assert stats['size'] == 1
+
+    settings.USER_CACHE_TTL = 0
+    user_cache.get(user.pk)
+    user_cache.get(user.pk)
+    assert user_cache.snapshot()['hits'] == before['hits']
+
+
+def test_authentication_uses_cache(user):
+    """Test repeated API calls do not load the user again."""
+    client = jwt_client(user)
+    client.get(ME_URL)
+
+    with CaptureQueriesContext(connection) as queries:
+        res = client.get(ME_URL)
+
+    assert res.status_code == status.HTTP_200_OK
+    assert user_selects(queries) == []
+
+
+def test_deactivated_user_denied_promptly(user):
+    """Test deactivation invalidates the cached user."""
+    client = jwt_client(user)
+    assert client.get(ME_URL).status_code == status.HTTP_200_OK
+
+    deactivate_users(user_ids=[user.pk])
+
+    assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_deleted_user_denied(user):
+    """Test a deleted user cannot authenticate with an old token."""
+    client = jwt_client(user)
+    client.get(ME_URL)
+
+    user.delete()
+
+    assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,163 @@
+"""
+Tests for the user change feed.
+"""
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import archive
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+CHANGES_URL = reverse('user:user-changes')
+
+
+@pytest.fixture
+def admin_client(db):
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='admin'))
+    return client
+
+
+def sync(client, cursor=None, limit=100):
+    params = {'limit': limit}
+    if cursor:
+        params['cursor'] = cursor
+    res = client.get(CHANGES_URL, params)
+    assert res.status_code == status.HTTP_200_OK
+    return res.data
+
+
+def test_full_sync_pages_through_all_users(admin_client):
+    """Test paging from no cursor returns every user once."""
+    for _ in range(5):
+        UserFactory(user_type='home_seeker')
+
+    seen, cursor, has_more = [], None, True
+    while has_more:
+        page = sync(admin_client, cursor, limit=2)
+        seen += [row['id'] for row in page['results']]
+        cursor, has_more = page['next_cursor'], page['has_more']
+
+    assert seen == list(
+        User.objects.order_by('updated_at', 'id').values_list('id', flat=True)
+    )
+
+
+def test_poll_returns_only_changed_users(admin_client):
+    """Test polling with a cursor returns users changed since."""
+    users = [UserFactory(user_type='home_seeker') for _ in range(3)]
+    cursor = sync(admin_client)['next_cursor']
+
+    users[1].name = 'Renamed'
+    users[1].save()
+    page = sync(admin_client, cursor)
+
+    assert [row['id'] for row in page['results']] == [users[1].id]
+    assert page['results'][0]['name'] == 'Renamed'
+    assert sync(admin_client, page['next_cursor'])['results'] == []
+
+
+def test_soft_deleted_users_are_tombstones(admin_client):
+    """Test soft deletes show up as tombstones and leave the list."""
+    user = UserFactory(user_type='home_seeker')
+    cursor = sync(admin_client)['next_cursor']
+
+    user.soft_delete()
+    page = sync(admin_client, cursor)
+
+    assert page['results'] == [{
+        'id': user.id,
+        'updated_at': page['results'][0]['updated_at'],
+        'deleted': True,
+    }]
+    res = admin_client.get(reverse('user:user-list'))
+    assert user.id not in [row['id'] for row in res.data]
+
+
+def test_archived_users_are_tombstones(admin_client):
+    """Test users moved to the archive leave the feed as tombstones."""
+    user = UserFactory(user_type='home_seeker')
+    User.objects.filter(pk=user.pk).update(
+        updated_at=timezone.now() - timedelta(days=1000),
+        last_login=timezone.now() - timedelta(days=1000),
+    )
+    cursor = sync(admin_client)['next_cursor']
+
+    assert archive.archive_batch(10) == 1
+    page = sync(admin_client, cursor)
+
+    assert page['results'] == [{
+        'id': user.id,
+        'updated_at': page['results'][0]['updated_at'],
+        'deleted': True,
+    }]
+    assert sync(admin_client, page['next_cursor'])['results'] == []
+
+
+def test_changes_hide_admins_from_admins(admin_client):
+    """Test admins are tombstones for those who cannot see them."""
+    admin = UserFactory(user_type='admin')
+
+    rows = {row['id']: row for row in sync(admin_client)['results']}
+    assert rows[admin.id]['deleted'] is True
+    assert 'email' not in rows[admin.id]
+
+
+def test_users_made_admin_leave_as_tombstones(admin_client):
+    """Test a user whose role changes to admin gets a tombstone."""
+    user = UserFactory(user_type='home_seeker')
+    cursor = sync(admin_client)['next_cursor']
+
+    user.user_type = 'admin'
+    user.save()
+    page = sync(admin_client, cursor)
+
+    assert page['results'] == [{
+        'id': user.id,
+        'updated_at': page['results'][0]['updated_at'],
+        'deleted': True,
+    }]
+
+
+def test_recent_changes_wait_for_the_safety_lag(admin_client, settings):
+    """Test rows changed within the lag are left for a later poll."""
+    settings.USER_CHANGES_SAFETY_LAG = 60
+    user = UserFactory(user_type='home_seeker')
+
+    assert sync(admin_client)['results'] == []
+
+    User.objects.filter(pk=user.pk).update(
+        updated_at=timezone.now() - timedelta(minutes=2)
+    )
+    assert [row['id'] for row in sync(admin_client)['results']] == [user.id]
+
+
+def test_invalid_cursor(admin_client):
+    """Test a malformed cursor is rejected."""
+    res = admin_client.get(CHANGES_URL, {'cursor': 'not-a-cursor'})
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_activity_saves_do_not_bump_updated_at():
+    """Test login bookkeeping does not count as a change."""
+    user = UserFactory(user_type='home_seeker')
+    updated_at = user.updated_at
+
+    user.last_login = timezone.now()
+    user.save(update_fields=['last_login'])
+    user.refresh_from_db()
+    assert user.updated_at == updated_at
+
+    user.name = 'Renamed'
+    user.save(update_fields=['name'])
+    user.refresh_from_db()
+    assert user.updated_at > updated_at
@@ -0,0 +1,73 @@
+"""
+Tests for the user management commands.
+"""
+import gzip
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth import get_user_model
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_seed_users_creates_users_in_batches():
+    """Test seeding creates the requested number of users."""
+    call_command('seed_users', 25, batch_size=10, seed=1)
+
+    assert User.objects.count() == 25
+    assert User.objects.values('email').distinct().count() == 25
+
+
+@pytest.mark.django_db
+def test_seed_users_respects_distributions():
+    """Test seeded users follow the role and gender distributions."""
+    call_command(
+        'seed_users', 10,
+        roles='property_owner=1', genders='F=1', password='seedpass123'
+    )
+
+    users = User.objects.all()
+    assert {user.user_type for user in users} == {'property_owner'}
+    assert {user.gender for user in users} == {'F'}
+    assert not any(user.is_staff for user in users)
+    assert users[0].check_password('seedpass123') is True
+    assert len({user.password for user in users}) == 1
+
+
+@pytest.mark.django_db
+def test_seed_users_rejects_unknown_role():
+    """Test an unknown role in the distribution raises an error."""
+    with pytest.raises(CommandError):
+        call_command('seed_users', 5, roles='landlord=1')
+
+    assert User.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_user_factory_create_batch_is_one_insert(django_assert_num_queries):
+    """Test creating a batch of users uses a single insert."""
+    with django_assert_num_queries(1):
+        users = UserFactory.create_batch(20, user_type='home_seeker')
+
+    assert User.objects.filter(user_type='home_seeker').count() == 20
+    assert users[0].check_password('defaultpassword') is True
+
+
+@pytest.mark.django_db
+def test_export_users_ndjson(tmp_path):
+    """Test exporting users to a gzip compressed NDJSON file."""
+    users = UserFactory.create_batch(3, user_type='home_seeker')
+    output = tmp_path / 'users.ndjson.gz'
+
+    call_command(
+        'export_users', output=str(output), output_format='ndjson',
+        fields='email', after_id=users[0].id, gzip=True,
+    )
+
+    with gzip.open(output, 'rt') as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['email'] for row in rows] == [u.email for u in users[1:]]
@@ -0,0 +1,127 @@
+"""
+Tests for the email availability endpoint and its Bloom filter.
+"""
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.bloom import BloomFilter
+from user import emails
+from user.emails import email_filter
+from user.models import ArchivedUser
+
+User = get_user_model()
+
+EMAIL_AVAILABLE_URL = reverse('user:user-email-available')
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        'Taken@example.com', 'sample123', user_type='home_seeker'
+    )
+
+
+def available(client, email):
+    res = client.get(EMAIL_AVAILABLE_URL, {'email': email})
+    assert res.status_code == status.HTTP_200_OK
+    return res.data['available']
+
+
+def test_free_email_needs_no_query(client, user, django_assert_num_queries):
+    """Test emails the filter rules out are answered from memory."""
+    email_filter.current()
+
+    with django_assert_num_queries(0):
+        assert available(client, 'free@example.com') is True
+
+
+def test_taken_email_in_any_case(client, user, django_assert_num_queries):
+    """Test taken emails are confirmed with one index probe."""
+    email_filter.current()
+
+    with django_assert_num_queries(1):
+        assert available(client, 'TAKEN@example.com') is False
+
+
+def test_new_users_are_added(client, user):
+    """Test emails created after the filter was built are taken."""
+    email_filter.current()
+
+    User.objects.create_user('later@example.com', 'sample123')
+
+    assert available(client, 'Later@Example.com') is False
+
+
+def test_archived_emails_are_taken(client, db):
+    """Test archived users keep their email."""
+    ArchivedUser.objects.create(id=1, email='gone@example.com', data={})
+
+    assert available(client, 'gone@example.com') is False
+
+
+def test_false_positives_are_counted(client, user):
+    """Test a maybe-taken email that is free is counted and free."""
+    email_filter.current()
+    before = email_filter.snapshot()['false_positives']
+
+    with patch.object(email_filter, 'definitely_free', return_value=False):
+        assert available(client, 'free@example.com') is True
+
+    assert email_filter.snapshot()['false_positives'] == before + 1
+
+
+def test_invalid_email_rejected(client, db):
+    """Test the email is validated."""
+    res = client.get(EMAIL_AVAILABLE_URL, {'email': 'not-an-email'})
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_stale_filter_falls_back_to_queries(client, user):
+    """Test a lost bus message is not answered from the old filter."""
+    email_filter.current()
+    email_filter.add(None)
+    User.objects.filter(pk=user.pk).update(email='missed@example.com')
+
+    with patch.object(email_filter, 'rebuild_in_background') as rebuild:
+        assert available(client, 'missed@example.com') is False
+
+    assert rebuild.called
+
+
+def test_message_lost_during_build_keeps_filter_stale(user):
+    """Test a resync arriving while loading triggers another rebuild."""
+    def bloom_filter(*args):
+        email_filter.add(None)
+        return BloomFilter(*args)
+
+    with patch.object(emails, 'BloomFilter', side_effect=bloom_filter):
+        email_filter.build()
+
+    assert email_filter.stale is True
+    assert email_filter.current() is not None
+    assert email_filter.stale is False
+
+
+def test_metrics(user, settings):
+    """Test the filter reports its sizing and error rates."""
+    settings.USER_EMAIL_FILTER_CAPACITY = 1000
+    email_filter.current()
+
+    stats = email_filter.snapshot()
+
+    assert stats['capacity'] == 1000
+    assert stats['emails'] == 1
+    assert stats['hashes'] == 7
+    assert stats['bytes'] == (stats['bits'] + 7) // 8
+    assert stats['estimated_error_rate'] < 0.01
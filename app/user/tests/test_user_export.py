@@ -0,0 +1,87 @@
+"""
+Tests for the user export API.
+"""
+import gzip
+import json
+
+import pytest
+from django.contrib.auth import get_user_model
+from user.user_factory import UserFactory
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+
+User = get_user_model()
+
+EXPORT_URL = reverse('user:user-export')
+
+
+@pytest.fixture
+def admin_client(db):
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='admin'))
+    return client
+
+
+@pytest.fixture
+def users(db):
+    return [
+        UserFactory(user_type='home_seeker'),
+        UserFactory(user_type='property_owner'),
+        UserFactory(user_type='admin'),
+    ]
+
+
+def read(response):
+    return b''.join(response.streaming_content)
+
+
+def test_export_csv_hides_admins_for_admin_users(admin_client, users):
+    """Test the CSV export streams the users visible to the admin."""
+    res = admin_client.get(EXPORT_URL)
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res['Content-Type'] == 'text/csv'
+    lines = read(res).decode().splitlines()
+    assert lines[0] == 'id,email,name,gender,user_type,is_active,image'
+    assert len(lines) == 3
+    assert users[2].email not in ''.join(lines)
+
+
+def test_export_ndjson_selected_fields_after_id(admin_client, users):
+    """Test NDJSON export with column selection resumes after an id."""
+    res = admin_client.get(EXPORT_URL, {
+        'output': 'ndjson',
+        'fields': 'email',
+        'after_id': users[0].id,
+    })
+
+    rows = [json.loads(line) for line in read(res).decode().splitlines()]
+    assert rows == [{'id': users[1].id, 'email': users[1].email}]
+
+
+def test_export_gzip(admin_client, users):
+    """Test the export is gzip compressed on request."""
+    res = admin_client.get(EXPORT_URL, {'compress': 'gzip'})
+
+    assert res['Content-Type'] == 'application/gzip'
+    assert 'users.csv.gz' in res['Content-Disposition']
+    assert users[0].email in gzip.decompress(read(res)).decode()
+
+
+def test_export_rejects_unknown_and_private_fields(admin_client, users):
+    """Test password and superuser-only columns cannot be exported."""
+    for fields in ['password', 'is_superuser']:
+        res = admin_client.get(EXPORT_URL, {'fields': fields})
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_forbidden_for_home_seekers(users):
+    """Test home seekers cannot export users."""
+    client = APIClient()
+    client.force_authenticate(user=users[0])
+    res = client.get(EXPORT_URL)
+
+    assert res.status_code == status.HTTP_403_FORBIDDEN
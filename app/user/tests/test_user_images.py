@@ -0,0 +1,158 @@
+"""
+Tests for the resized user image endpoint.
+"""
+import io
+import os
+import threading
+import time
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+from user import images
+from user.user_factory import UserFactory
+
+
+@pytest.fixture(autouse=True)
+def image_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.USER_IMAGE_CACHE_DIR = str(tmp_path / 'cache') + '/'
+    images.cache.size = None
+
+
+@pytest.fixture
+def user(db):
+    user = UserFactory(user_type='home_seeker')
+    data = io.BytesIO()
+    Image.new('RGB', (400, 200), 'red').save(data, format='JPEG')
+    user.image = SimpleUploadedFile('a.jpg', data.getvalue())
+    user.save()
+    return user
+
+
+def image_url(user_id, size=128, ext='jpg'):
+    return reverse('user-image', args=[user_id, size, ext])
+
+
+def test_renders_and_caches_variant(client, user):
+    """Test a variant is rendered once and then served from the cache."""
+    renders = images.cache.stats['renders']
+
+    res = client.get(image_url(user.id, ext='webp'))
+    again = client.get(image_url(user.id, ext='webp'))
+
+    assert res.status_code == 200
+    assert res['Content-Type'] == 'image/webp'
+    assert 'max-age=' in res['Cache-Control']
+    with Image.open(io.BytesIO(b''.join(res.streaming_content))) as img:
+        assert img.size == (128, 64)
+    assert again['ETag'] == res['ETag']
+    assert images.cache.stats['renders'] == renders + 1
+
+
+def test_not_modified(client, user):
+    """Test a matching If-None-Match gets a 304."""
+    etag = client.get(image_url(user.id))['ETag']
+
+    res = client.get(image_url(user.id), HTTP_IF_NONE_MATCH=etag)
+
+    assert res.status_code == 304
+
+
+def test_range_requests(client, user):
+    """Test single byte ranges and unsatisfiable ranges."""
+    full = b''.join(client.get(image_url(user.id)).streaming_content)
+
+    res = client.get(image_url(user.id), HTTP_RANGE='bytes=0-9')
+    assert res.status_code == 206
+    assert res.content == full[:10]
+    assert res['Content-Range'] == f'bytes 0-9/{len(full)}'
+
+    res = client.get(image_url(user.id), HTTP_RANGE='bytes=-5')
+    assert res.content == full[-5:]
+
+    res = client.get(image_url(user.id), HTTP_RANGE=f'bytes={len(full)}-')
+    assert res.status_code == 416
+
+
+def test_x_accel_redirect(client, user, settings):
+    """Test nginx delivery hands over the cached file path."""
+    settings.USER_IMAGE_DELIVERY = 'x-accel'
+
+    res = client.get(image_url(user.id, size=64))
+
+    assert res['X-Accel-Redirect'].startswith('/internal/images/')
+    assert res['X-Accel-Redirect'].endswith('.jpg')
+    assert res.content == b''
+
+
+@pytest.mark.parametrize('size,ext', [(100, 'jpg'), (128, 'gif')])
+def test_unsupported_variant(client, user, size, ext):
+    """Test only configured sizes and formats are served."""
+    res = client.get(image_url(user.id, size=size, ext=ext))
+
+    assert res.status_code == 404
+
+
+def test_missing_image(client, db):
+    """Test users without an image get a 404."""
+    user = UserFactory(user_type='home_seeker')
+
+    assert client.get(image_url(user.id)).status_code == 404
+
+
+def test_evicts_least_recently_used(client, user, settings):
+    """Test the cache is trimmed to its byte budget, oldest first."""
+    client.get(image_url(user.id, size=64))
+    old = [path for _, _, path in images.cache.files()]
+    past = time.time() - 60
+    os.utime(old[0], (past, past))
+    settings.USER_IMAGE_CACHE_MAX_BYTES = os.path.getsize(old[0]) + 1
+
+    client.get(image_url(user.id, size=256))
+
+    remaining = [path for _, _, path in images.cache.files()]
+    assert old[0] not in remaining
+    assert len(remaining) == 1
+
+
+def test_budget_is_shared_by_workers(tmp_path, settings):
+    """Test caches of several workers stay within one byte budget."""
+    settings.USER_IMAGE_CACHE_MAX_BYTES = 10
+    workers = [images.VariantCache() for _ in range(2)]
+
+    for i in range(6):
+        workers[i % 2].get_or_render(
+            str(tmp_path / 'cache' / f'{i}.jpg'),
+            lambda f: f.write(b'data'),
+        )
+        assert sum(size for _, size, _ in workers[0].files()) <= 10
+
+    assert workers[1].snapshot()['bytes'] == 8
+
+
+def test_concurrent_misses_render_once(tmp_path, settings):
+    """Test concurrent requests for one variant share a single render."""
+    path = str(tmp_path / 'cache' / 'variant.jpg')
+    calls = []
+
+    def render(f):
+        calls.append(1)
+        time.sleep(0.05)
+        f.write(b'data')
+
+    threads = [
+        threading.Thread(target=images.cache.get_or_render,
+                         args=(path, render))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert open(path, 'rb').read() == b'data'
+    assert images.cache.key_locks == {}
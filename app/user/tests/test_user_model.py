@@ -4,6 +4,7 @@ Tests for models.
 from unittest.mock import patch
 import pytest
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
 from user.user_factory import UserFactory
 from user.models import user_image_file_path
 
@@ -113,3 +114,50 @@ def test_user_photo_file_name_uuid(mock_uuid):
     file_path = user_image_file_path(None, 'example.jpg')
 
     assert file_path == f'uploads/recipe/{uuid}.jpg'
+
+
+@pytest.mark.django_db
+def test_email_unique_regardless_of_case():
+    """Test case variants of an email cannot both be registered."""
+    User.objects.create_user('Case@example.com', 'sample123')
+
+    with pytest.raises(IntegrityError):
+        User.objects.create_user('case@EXAMPLE.com', 'sample123')
+
+
+@pytest.mark.django_db
+def test_get_by_natural_key_ignores_case():
+    """Test natural key lookups are case-insensitive."""
+    user = User.objects.create_user('Case@example.com', 'sample123')
+
+    assert User.objects.get_by_natural_key('CASE@example.COM') == user
+
+
+@pytest.mark.django_db
+def test_role_scoped_partial_index():
+    """Test the role scoped partial index is created."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, User._meta.db_table
+        )
+
+    assert constraints['user_role_alive_idx']['columns'] == ['user_type', 'id']
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(
+    connection.vendor != 'postgresql', reason='EXPLAIN output is PostgreSQL.'
+)
+def test_role_scoped_scan_uses_partial_index():
+    """Test paging through one role's live users reads the partial index."""
+    UserFactory.create_batch(3, user_type='property_owner')
+    queryset = User.objects.alive().filter(
+        user_type='property_owner'
+    ).order_by('id')
+
+    with connection.cursor() as cursor:
+        # The table is too small for the planner to bother otherwise
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset[:50].explain()
+
+    assert 'user_role_alive_idx' in plan
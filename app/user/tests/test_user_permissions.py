@@ -0,0 +1,100 @@
+"""
+Tests for the cached permission engine.
+"""
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+
+from user.permissions import (
+    ADMIN,
+    HOME_SEEKER,
+    SUPERUSER,
+    get_access,
+    has_perm,
+    has_role,
+)
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+PERM = 'user.view_user'
+
+
+@pytest.fixture
+def view_user_permission(db):
+    return Permission.objects.get(
+        content_type__app_label='user', codename='view_user'
+    )
+
+
+def fresh(user):
+    """The same user as a new request would load it."""
+    return User.objects.get(pk=user.pk)
+
+
+def test_roles(db):
+    """Test roles follow the user type and superuser flags."""
+    seeker = UserFactory(user_type='home_seeker')
+    superuser = User.objects.create_superuser('s@example.com', 'pass12345')
+
+    assert get_access(seeker).roles == {HOME_SEEKER}
+    assert get_access(superuser).roles == {ADMIN, SUPERUSER}
+    assert has_perm(superuser, 'anything.at_all')
+
+
+def test_inactive_user_has_no_access(db):
+    """Test inactive users have no roles."""
+    user = UserFactory(user_type='admin', is_active=False)
+
+    assert not has_role(user, ADMIN)
+
+
+def test_access_is_cached_across_requests(
+    db, view_user_permission, django_assert_num_queries
+):
+    """Test permissions are only queried once."""
+    user = UserFactory(user_type='admin')
+    user.user_permissions.add(view_user_permission)
+    assert has_perm(fresh(user), PERM)
+
+    user = fresh(user)
+    with django_assert_num_queries(0):
+        assert has_perm(user, PERM)
+        assert has_role(user, ADMIN)
+
+
+def test_user_permission_change_invalidates(db, view_user_permission):
+    """Test adding or removing a user's permission invalidates."""
+    user = UserFactory(user_type='admin')
+    assert not has_perm(fresh(user), PERM)
+
+    user.user_permissions.add(view_user_permission)
+    assert has_perm(fresh(user), PERM)
+
+    view_user_permission.user_set.remove(user)
+    assert not has_perm(fresh(user), PERM)
+
+
+def test_group_changes_invalidate(db, view_user_permission):
+    """Test group membership and group permission changes invalidate."""
+    user = UserFactory(user_type='admin')
+    group = Group.objects.create(name='support')
+    group.user_set.add(user)
+    assert not has_perm(fresh(user), PERM)
+
+    group.permissions.add(view_user_permission)
+    assert has_perm(fresh(user), PERM)
+
+    user.groups.clear()
+    assert not has_perm(fresh(user), PERM)
+
+
+def test_user_save_invalidates(db):
+    """Test saving the user drops the memoized access."""
+    user = UserFactory(user_type='admin')
+    assert has_role(user, ADMIN)
+
+    user.is_active = False
+    user.save()
+
+    assert not has_role(user, ADMIN)
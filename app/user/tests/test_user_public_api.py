@@ -97,6 +97,35 @@ def test_create_access_token_for_user(client, user_details):
     assert res.status_code == status.HTTP_200_OK
 
 
+@pytest.mark.django_db
+def test_create_access_token_email_case_insensitive(client, user_details):
+    """Test login matches the email regardless of its case."""
+    payload = {
+        'email': user_details['email'].upper(),
+        'password': user_details['password'],
+    }
+    res = client.post(ACCESS_TOKEN_URL, payload)
+
+    assert res.status_code == status.HTTP_200_OK
+    assert 'access' in res.data
+
+
+@pytest.mark.django_db
+def test_user_with_email_case_variant_exists_error(client, user_details):
+    """Test registering a case variant of a taken email fails."""
+    payload = {
+        'email': 'Test@Example.com',
+        'password': 'testpass123',
+        'name': 'Test Name',
+        'user_type': 'home_seeker',
+        'gender': 'M'
+    }
+    res = client.post(CREATE_LIST_USERS_URL, payload)
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'email' in res.data
+
+
 @pytest.mark.django_db
 def test_create_access_token_bad_credentials(client, user_details):
     """Test returns an error when credentials are invalid."""
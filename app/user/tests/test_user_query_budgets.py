@@ -0,0 +1,212 @@
+"""
+Tests for the query budgets of the user API.
+"""
+import io
+import itertools
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import URLPattern, URLResolver, reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.budget import budget_for
+from user import tokens, urls
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+PASSWORD = 'sample123'
+
+emails = itertools.count()
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture
+def admin(db):
+    return UserFactory(user_type='admin')
+
+
+@pytest.fixture
+def seeker(db):
+    return User.objects.create_user(
+        'seeker@example.com', PASSWORD, user_type='home_seeker'
+    )
+
+
+def routes(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from routes(
+                pattern.url_patterns, prefix + str(pattern.pattern)
+            )
+        elif isinstance(pattern, URLPattern):
+            yield prefix + str(pattern.pattern), pattern
+
+
+def view_methods(view):
+    actions = getattr(view, 'actions', None)
+    if actions:
+        return [method.upper() for method in actions]
+    cls = view.cls
+    return [
+        method.upper() for method in cls.http_method_names
+        if method not in ('head', 'options') and hasattr(cls, method)
+    ]
+
+
+def jpeg():
+    data = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(data, format='JPEG')
+    return SimpleUploadedFile('a.jpg', data.getvalue(), 'image/jpeg')
+
+
+def drain(response):
+    """Read a streamed response so its queries are counted too."""
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def refresh_token(user):
+    token = str(RefreshToken.for_user(user))
+    tokens.recorder.flush()
+    return token
+
+
+def test_every_route_declares_a_budget():
+    """Test each method of every user route has a query budget."""
+    missing = [
+        f'{method} {route}'
+        for route, pattern in routes(urls.urlpatterns)
+        # The router's API root lists links without the database
+        if pattern.name != 'api-root'
+        for method in view_methods(pattern.callback)
+        if budget_for(pattern.callback, method) is None
+    ]
+
+    assert missing == []
+
+
+def test_view_method_budget_wins_over_class():
+    """Test an action's budget overrides its viewset's."""
+    callbacks = {
+        pattern.name: pattern.callback for pattern in urls.router.urls
+    }
+    upload = callbacks['user-upload-image']
+    listing = callbacks['user-list']
+
+    assert budget_for(upload, 'POST') == upload.cls.upload_image.query_budget
+    assert budget_for(upload, 'POST') != budget_for(listing, 'GET')
+    assert budget_for(listing, 'GET') == listing.cls.query_budget
+
+
+def grow_users(owner):
+    """Add users, and refresh tokens of `owner`, `n` at a time."""
+
+    def grow(n):
+        for _ in range(n):
+            UserFactory(user_type='home_seeker')
+            RefreshToken.for_user(owner)
+        tokens.recorder.flush()
+
+    return grow
+
+
+def admin_requests(admin):
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    return {
+        'list': lambda args: client.get(reverse('user:user-list')),
+        'changes': lambda args: client.get(reverse('user:user-changes')),
+        'export': lambda args: drain(
+            client.get(reverse('user:user-export'))
+        ),
+        'batch': lambda args: client.post(
+            reverse('user:user-batch'),
+            {'ids': list(range(1, 100))}, format='json',
+        ),
+        'upload': lambda args: client.post(
+            reverse('user:user-upload-image', args=[args]),
+            {'image': jpeg()}, format='multipart',
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    'name', ['list', 'changes', 'export', 'batch', 'upload']
+)
+def test_admin_endpoints_do_not_scale_with_users(
+    admin, seeker, query_scaling, name
+):
+    """Test admin endpoints run as many queries for 1 or 20 users."""
+    request = admin_requests(admin)[name]
+
+    def send(args):
+        assert request(args).status_code < 400
+
+    counts = query_scaling(grow_users(admin), send, lambda: seeker.pk)
+
+    assert len(set(counts.values())) == 1, counts
+
+
+def seeker_requests(seeker):
+    client = APIClient()
+    client.force_authenticate(user=seeker)
+    anonymous = APIClient()
+    return {
+        'create': lambda args: anonymous.post(reverse('user:user-list'), {
+            'email': f'new{next(emails)}@example.com',
+            'password': PASSWORD,
+            'name': 'New',
+            'gender': 'M',
+            'user_type': 'home_seeker',
+        }),
+        'email-available': lambda args: anonymous.get(
+            reverse('user:user-email-available'),
+            {'email': f'free{next(emails)}@example.com'},
+        ),
+        'me': lambda args: client.get(reverse('user:me')),
+        'me-update': lambda args: client.patch(
+            reverse('user:me'), {'name': 'Name'}
+        ),
+        'my-image': lambda args: client.patch(
+            reverse('user:my-image'), {'image': jpeg()}, format='multipart',
+        ),
+        'token': lambda args: anonymous.post(
+            reverse('user:token_obtain_pair'),
+            {'email': seeker.email, 'password': PASSWORD},
+        ),
+        'token-refresh': lambda args: anonymous.post(
+            reverse('user:token_refresh'), {'refresh': args},
+        ),
+        'logout': lambda args: client.post(
+            reverse('user:auth_logout'), {'refresh': args},
+        ),
+    }
+
+
+@pytest.mark.parametrize('name', [
+    'create', 'email-available', 'me', 'me-update', 'my-image', 'token',
+    'token-refresh', 'logout',
+])
+def test_user_endpoints_do_not_scale_with_tokens(
+    seeker, query_scaling, name
+):
+    """Test user endpoints run as many queries for 1 or 20 tokens."""
+    request = seeker_requests(seeker)[name]
+
+    def send(args):
+        assert request(args).status_code < 400
+
+    counts = query_scaling(
+        grow_users(seeker), send, lambda: refresh_token(seeker)
+    )
+
+    assert len(set(counts.values())) == 1, counts
@@ -0,0 +1,103 @@
+"""
+Tests for sparse fieldsets on the user API.
+"""
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.user_factory import UserFactory
+
+User = get_user_model()
+
+CREATE_LIST_USERS_URL = reverse('user:user-list')
+ME_URL = reverse('user:me')
+
+
+@pytest.fixture
+def admin_client(db):
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(user_type='admin'))
+    return client
+
+
+@pytest.fixture
+def superuser_client(db):
+    user = User.objects.create_superuser('super@example.com', 'pass12345')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def test_list_fields_trims_output_and_columns(admin_client):
+    """Test ?fields= trims the response and the selected columns."""
+    user = UserFactory(user_type='home_seeker')
+
+    with CaptureQueriesContext(connection) as queries:
+        res = admin_client.get(CREATE_LIST_USERS_URL, {'fields': 'email'})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data == [{'id': user.id, 'email': user.email}]
+    select = [q['sql'] for q in queries if 'user_type' in q['sql']][-1]
+    assert '"password"' not in select
+    assert '"name"' not in select
+
+
+def test_list_omit_fields(admin_client):
+    """Test ?omit= drops fields from the response."""
+    UserFactory(user_type='home_seeker')
+
+    res = admin_client.get(CREATE_LIST_USERS_URL, {'omit': 'image,name'})
+
+    assert set(res.data[0]) == {
+        'id', 'email', 'gender', 'user_type', 'is_active'
+    }
+
+
+def test_list_never_loads_password(admin_client):
+    """Test the default list query leaves the password hash out."""
+    UserFactory(user_type='home_seeker')
+
+    with CaptureQueriesContext(connection) as queries:
+        admin_client.get(CREATE_LIST_USERS_URL)
+
+    select = [q['sql'] for q in queries if 'user_type' in q['sql']][-1]
+    assert '"password"' not in select
+
+
+@pytest.mark.parametrize('fields', ['password', 'is_superuser', 'nope'])
+def test_write_only_and_unknown_fields_rejected(admin_client, fields):
+    """Test write-only, superuser-only and unknown fields are rejected."""
+    res = admin_client.get(CREATE_LIST_USERS_URL, {'fields': fields})
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_superuser_can_select_extra_fields(superuser_client):
+    """Test superusers can select the superuser serializer extras."""
+    res = superuser_client.get(
+        CREATE_LIST_USERS_URL, {'fields': 'is_superuser'}
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data[0] == {'id': res.data[0]['id'], 'is_superuser': True}
+
+
+def test_me_fields(admin_client):
+    """Test sparse fieldsets on the profile endpoint."""
+    res = admin_client.get(ME_URL, {'fields': 'email'})
+
+    assert set(res.data) == {'id', 'email'}
+
+
+def test_fields_do_not_restrict_updates(admin_client):
+    """Test ?fields= does not drop writable fields on updates."""
+    res = admin_client.patch(
+        ME_URL + '?fields=email', {'name': 'Renamed'}
+    )
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['name'] == 'Renamed'
@@ -0,0 +1,89 @@
+"""
+Tests for the user background tasks.
+"""
+import tempfile
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from jobs.models import Job
+from user.tasks import (
+    deactivate_users,
+    flush_expired_tokens,
+    process_user_image,
+)
+from user.user_factory import UserFactory
+
+
+@pytest.fixture
+def seeker(db):
+    user = UserFactory(user_type='home_seeker')
+    yield user
+    if user.image:
+        user.image.delete()
+
+
+def jpeg(size):
+    image_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', size).save(image_file, format='JPEG')
+    image_file.seek(0)
+    return image_file
+
+
+@override_settings(USER_IMAGE_MAX_SIZE=32)
+def test_process_user_image_downscales(seeker):
+    """Test large images are downscaled in place."""
+    with jpeg((100, 50)) as image_file:
+        seeker.image = SimpleUploadedFile('a.jpg', image_file.read())
+        seeker.save()
+
+    process_user_image(seeker.id)
+
+    with Image.open(seeker.image.path) as img:
+        assert img.size == (32, 16)
+
+
+def test_upload_my_image_enqueues_processing(seeker):
+    """Test uploading a profile image queues image processing."""
+    client = APIClient()
+    client.force_authenticate(user=seeker)
+    with jpeg((10, 10)) as image_file:
+        client.patch(
+            reverse('user:my-image'), {'image': image_file},
+            format='multipart'
+        )
+    seeker.refresh_from_db()
+
+    job = Job.objects.get(task=process_user_image.task_name)
+    assert job.payload == {'user_id': seeker.id}
+    assert job.queue == 'images'
+
+
+def test_flush_expired_tokens(seeker):
+    """Test only the user's expired tokens are removed."""
+    now = timezone.now()
+    OutstandingToken.objects.create(
+        user=seeker, jti='old', token='old', expires_at=now - timedelta(1))
+    OutstandingToken.objects.create(
+        user=seeker, jti='new', token='new', expires_at=now + timedelta(1))
+
+    flush_expired_tokens(seeker.id)
+
+    assert list(
+        OutstandingToken.objects.values_list('jti', flat=True)
+    ) == ['new']
+
+
+def test_deactivate_users(seeker):
+    """Test bulk deactivation."""
+    deactivate_users([seeker.id])
+
+    seeker.refresh_from_db()
+    assert seeker.is_active is False
@@ -0,0 +1,159 @@
+"""
+Tests for write-behind recording of outstanding tokens.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken, OutstandingToken
+)
+
+from user import tokens
+from user.cache import logout_cache
+from user.user_factory import UserFactory
+
+LOGOUT_URL = reverse('user:auth_logout')
+REFRESH_TOKEN_URL = reverse('user:token_refresh')
+
+
+@pytest.fixture
+def buffered():
+    """Keep recorded tokens buffered until flushed explicitly."""
+    with patch.object(tokens.recorder, 'schedule'):
+        yield tokens.recorder
+    tokens.recorder.pending.clear()
+
+
+@pytest.fixture
+def user(db):
+    return UserFactory(user_type='home_seeker')
+
+
+def is_blacklisted(token):
+    return BlacklistedToken.objects.filter(token__jti=token['jti']).exists()
+
+
+def test_tokens_are_written_on_flush(user, buffered):
+    """Test issued tokens are buffered and then bulk inserted."""
+    tokens.RefreshToken.for_user(user)
+    tokens.RefreshToken.for_user(user)
+    assert not OutstandingToken.objects.exists()
+
+    buffered.flush()
+
+    assert OutstandingToken.objects.filter(user=user).count() == 2
+    assert buffered.pending == []
+
+
+def test_sync_durability_writes_inline(user, buffered, settings):
+    """Test the sync mode inserts the row while issuing the token."""
+    settings.TOKEN_RECORDER_DURABILITY = 'sync'
+
+    token = tokens.RefreshToken.for_user(user)
+
+    assert OutstandingToken.objects.filter(jti=token['jti']).exists()
+
+
+def test_logout_covers_buffered_tokens(user, buffered):
+    """Test logout blacklists tokens that were not flushed yet."""
+    token = tokens.RefreshToken.for_user(user)
+    other = tokens.RefreshToken.for_user(user)
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    res = client.post(LOGOUT_URL, {'refresh': str(token)})
+
+    assert res.status_code == status.HTTP_205_RESET_CONTENT
+    assert is_blacklisted(token) and is_blacklisted(other)
+    res = client.post(REFRESH_TOKEN_URL, {'refresh': str(other)})
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_flush_after_remote_logout_blacklists(user, buffered):
+    """Test a token flushed after its user logged out elsewhere."""
+    token = tokens.RefreshToken.for_user(user)
+    logged_out = OutstandingToken.objects.create(
+        user=user, jti='elsewhere', token='x',
+        created_at=token.current_time,
+        expires_at=token.current_time + timedelta(days=1),
+    )
+    BlacklistedToken.objects.create(token=logged_out)
+
+    buffered.flush()
+
+    assert is_blacklisted(token)
+
+
+def test_blacklisting_a_token_buffered_elsewhere(user, buffered):
+    """Test the row made on blacklisting keeps the user of the token."""
+    token = tokens.RefreshToken.for_user(user)
+    tokens.RefreshToken.for_user(user)
+    # Both rows are still buffered by another worker
+    elsewhere, buffered.pending = buffered.pending, []
+
+    token.blacklist()
+    buffered.pending = elsewhere
+    buffered.flush()
+
+    assert OutstandingToken.objects.filter(user=user).count() == 2
+    assert BlacklistedToken.objects.filter(token__user=user).count() == 2
+
+
+def test_logout_rejects_tokens_never_flushed(user, buffered):
+    """Test a token lost with its worker is refused after logout."""
+    lost = tokens.RefreshToken.for_user(user)
+    # Issued a while before the logout
+    lost['iat'] -= 5
+    buffered.pending.clear()
+    token = tokens.RefreshToken.for_user(user)
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    client.post(LOGOUT_URL, {'refresh': str(token)})
+
+    assert not OutstandingToken.objects.filter(jti=lost['jti']).exists()
+    res = client.post(REFRESH_TOKEN_URL, {'refresh': str(lost)})
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_logout_drops_cached_watermark(user, buffered):
+    """Test a logout invalidates the watermark cached before it."""
+    lost = tokens.RefreshToken.for_user(user)
+    lost['iat'] -= 5
+    buffered.pending.clear()
+    assert logout_cache.get(user.pk) is None
+    token = tokens.RefreshToken.for_user(user)
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    client.post(LOGOUT_URL, {'refresh': str(token)})
+
+    res = client.post(REFRESH_TOKEN_URL, {'refresh': str(lost)})
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_logout_watermark_is_cached(user, django_assert_num_queries):
+    """Test the logout watermark is read once per user."""
+    logout_cache.get(user.pk)
+    hits = logout_cache.snapshot()['hits']
+
+    with django_assert_num_queries(0):
+        assert logout_cache.get(user.pk) is None
+    assert logout_cache.snapshot()['hits'] == hits + 1
+
+
+def test_token_issued_after_logout_stays_valid(user, buffered):
+    """Test logging out does not revoke tokens issued afterwards."""
+    old = tokens.RefreshToken.for_user(user)
+    buffered.flush()
+    old.blacklist()
+
+    token = tokens.RefreshToken.for_user(user)
+    buffered.flush()
+
+    assert not is_blacklisted(token)
+    assert tokens.recorder.snapshot()['pending'] == 0
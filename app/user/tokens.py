@@ -0,0 +1,159 @@
+"""
+JWT tokens whose outstanding records are written behind in batches.
+"""
+from django.conf import settings
+from django.db.models import Max
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken, OutstandingToken
+)
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from core import metrics
+from core.background import BackgroundFlusher
+from core.bus import bus
+
+
+class TokenRecorder(BackgroundFlusher):
+    """
+    Buffer `OutstandingToken` rows and insert them in bulk.
+
+    With `TOKEN_RECORDER_DURABILITY = 'sync'` every row is inserted while
+    the token is issued. In the default 'buffered' mode rows are flushed
+    every `TOKEN_RECORDER_FLUSH_INTERVAL` seconds or once
+    `TOKEN_RECORDER_BATCH_SIZE` are pending, and rows still buffered when
+    a worker dies are lost; those tokens stay valid until they expire
+    unless they are blacklisted individually, but see
+    `RefreshToken.check_blacklist`.
+
+    Tokens issued before their user logged out are blacklisted as soon as
+    they are flushed, so a logout in another worker still covers them.
+    """
+    interval_setting = 'TOKEN_RECORDER_FLUSH_INTERVAL'
+
+    def __init__(self):
+        super().__init__()
+        self.pending = []
+        self.stats = {'recorded': 0, 'written': 0, 'revoked': 0}
+
+    def record(self, user, token):
+        row = OutstandingToken(
+            user_id=user.pk,
+            jti=token[api_settings.JTI_CLAIM],
+            token=str(token),
+            created_at=token.current_time,
+            expires_at=datetime_from_epoch(token['exp']),
+        )
+        if settings.TOKEN_RECORDER_DURABILITY == 'sync':
+            self.write([row])
+            return
+        with self.lock:
+            self.pending.append(row)
+            self.stats['recorded'] += 1
+            full = len(self.pending) >= settings.TOKEN_RECORDER_BATCH_SIZE
+        if full:
+            self.wake()
+        self.schedule()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        batch_size = settings.TOKEN_RECORDER_BATCH_SIZE
+        for start in range(0, len(pending), batch_size):
+            self.write(pending[start:start + batch_size])
+
+    def write(self, rows):
+        # A token blacklisted before its row was flushed already has one
+        OutstandingToken.objects.bulk_create(rows, ignore_conflicts=True)
+        revoked = revoke_logged_out(rows)
+        with self.lock:
+            self.stats['written'] += len(rows)
+            self.stats['revoked'] += revoked
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, 'pending': len(self.pending)}
+
+
+def revoke_logged_out(rows):
+    """Blacklist rows issued before their user's latest blacklisting."""
+    logged_out = dict(
+        BlacklistedToken.objects
+        .filter(token__user_id__in={row.user_id for row in rows})
+        .values('token__user_id')
+        .annotate(last=Max('blacklisted_at'))
+        .values_list('token__user_id', 'last')
+    )
+    jtis = [
+        row.jti for row in rows
+        if row.user_id in logged_out and
+        logged_out[row.user_id] >= row.created_at
+    ]
+    if not jtis:
+        return 0
+    BlacklistedToken.objects.bulk_create(
+        [
+            BlacklistedToken(token=token)
+            for token in OutstandingToken.objects.filter(jti__in=jtis)
+        ],
+        ignore_conflicts=True,
+    )
+    # bulk_create sends no signals
+    for user_id in {row.user_id for row in rows if row.jti in jtis}:
+        bus.publish('token', user_id)
+    return len(jtis)
+
+
+recorder = TokenRecorder()
+metrics.register('token_recorder', recorder.snapshot)
+
+
+class RefreshToken(tokens.RefreshToken):
+    """Refresh token recorded through the `TokenRecorder`."""
+
+    @classmethod
+    def for_user(cls, user):
+        # Skip `BlacklistMixin.for_user`, which inserts the row inline
+        token = super(tokens.BlacklistMixin, cls).for_user(user)
+        recorder.record(user, token)
+        return token
+
+    def check_blacklist(self):
+        """
+        Also reject tokens issued before their user's latest logout, the
+        last time one of their tokens was blacklisted, from the
+        `logout_cache`.
+
+        Logout blacklists the rows written so far, while tokens still
+        buffered by a worker, or lost with it, have no row yet; this check
+        covers them too. It compares whole seconds, as `iat` does, so a
+        token issued in the second of the logout is left to the flush.
+        """
+        super().check_blacklist()
+        from user.cache import logout_cache
+
+        logged_out = logout_cache.get(self.get(api_settings.USER_ID_CLAIM))
+        if logged_out is not None and (
+            self['iat'] < int(logged_out.timestamp())
+        ):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        """
+        Blacklist this token, inserting its outstanding row with its user
+        when it is still buffered, maybe by another worker, so the
+        logout is seen when the other rows of that user are flushed.
+        """
+        token, _ = OutstandingToken.objects.get_or_create(
+            jti=self[api_settings.JTI_CLAIM],
+            defaults={
+                'user_id': self.get(api_settings.USER_ID_CLAIM),
+                'token': str(self),
+                'created_at': datetime_from_epoch(self['iat']),
+                'expires_at': datetime_from_epoch(self['exp']),
+            },
+        )
+        return BlacklistedToken.objects.get_or_create(token=token)
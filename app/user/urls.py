@@ -8,6 +8,7 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+from core.budget import query_budget
 from user import views
 
 app_name = 'user'
@@ -20,9 +21,15 @@ urlpatterns = [
     path('me/', views.ManageUserView.as_view(), name='me'),
     path('my-image/', views.ManageUserImageView.as_view(), name='my-image'),
     path('token/',
-         TokenObtainPairView.as_view(), name='token_obtain_pair'),
+         query_budget(queries=20, seconds=1.0)(
+             TokenObtainPairView.as_view()
+         ),
+         name='token_obtain_pair'),
     path('token/refresh/',
-         TokenRefreshView.as_view(), name='token_refresh'),
+         query_budget(queries=8, seconds=0.5)(
+             TokenRefreshView.as_view()
+         ),
+         name='token_refresh'),
     path('logout/',
          views.LogoutView.as_view(), name='auth_logout'),
 ]
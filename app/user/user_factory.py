@@ -1,17 +1,26 @@
 """
 User Factory.
 """
-from factory import Faker, Iterator
+from functools import lru_cache
+
+from django.contrib.auth.hashers import make_password
+from factory import Faker, Iterator, Sequence
 from user.models import User
 import factory
 
 
+@lru_cache(maxsize=None)
+def hashed_password(password):
+    """Return a password hash computed once per raw password."""
+    return make_password(password)
+
+
 class UserFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = User
         skip_postgeneration_save = True
 
-    email = Faker('email')
+    email = Sequence(lambda n: f'user{n}@example.com')
     name = Faker('name')
     gender = Iterator(User.GENDER_CHOICES, getter=lambda c: c[0])
     user_type = Iterator(User.USER_TYPE_CHOICES, getter=lambda c: c[0])
@@ -19,4 +28,10 @@ class UserFactory(factory.django.DjangoModelFactory):
     @factory.post_generation
     def password(self, create, extracted, **kwargs):
         password = extracted if extracted else 'defaultpassword'
-        self.set_password(password)
+        self.password = hashed_password(password)
+
+    @classmethod
+    def create_batch(cls, size, **kwargs):
+        """Build `size` users and insert them with one `bulk_create`."""
+        users = cls.build_batch(size, **kwargs)
+        return cls._meta.model.objects.bulk_create(users)
@@ -1,20 +1,34 @@
 """
 Views for the API.
 """
+from operator import attrgetter
+
+from django.http import Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 from rest_framework import generics, mixins, viewsets, status, permissions
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.token_blacklist.models import (
     BlacklistedToken, OutstandingToken
 )
-from .permissions import IsAdminUser, IsSuperUser
+from .authentication import CachedJWTAuthentication
+from .permissions import SUPERUSER, IsAdminUser, has_role
+from audit.models import AuditEvent
+from audit.recorder import recorder
+from core.budget import query_budget
+from core.bus import bus
+from core.idempotency import idempotent
+from user import changes, emails, export, tokens
+from user.cache import user_cache
+from user.tasks import flush_expired_tokens, process_user_image
 
 from user.serializers import (
+    EmailAvailabilitySerializer,
     UserSerializer,
+    UserBatchLookupSerializer,
+    UserChangeSerializer,
     SuperUserSerializer,
     UserImageSerializer,
     LogoutSerializer
@@ -24,46 +38,80 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+@query_budget(queries=6, seconds=0.5)
 class UserView(
             mixins.ListModelMixin,
             mixins.CreateModelMixin,
             viewsets.GenericViewSet
 ):
     """Create a new user in the system."""
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ('create', 'email_available'):
             permission_classes = [permissions.AllowAny]
         else:  # For list action and any other actions
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
-    def get_queryset(self):
-        if self.request.user and self.request.user.is_authenticated:
-            if IsSuperUser().has_permission(self.request, self):
-                # If the user is a superuser, return all users
-                return User.objects.all()
+    def get_visible_users(self):
+        if has_role(self.request.user, SUPERUSER):
+            # If the user is a superuser, return all users
+            return User.objects.all()
         # Filter out admin users
         return User.objects.exclude(user_type='admin')
 
+    def get_queryset(self):
+        # Soft deleted users only show up as tombstones in `changes`
+        queryset = self.get_visible_users().filter(deleted_at__isnull=True)
+        if self.action in ('list', 'batch'):
+            # Load only the columns the (sparse) serializer renders
+            columns = {field.name for field in User._meta.concrete_fields}
+            queryset = queryset.only(*[
+                field.source for field in self.get_serializer().fields.values()
+                if field.source in columns and not field.write_only
+            ])
+        return queryset
+
+    def get_object(self):
+        """Look the user up in the `user_cache`, with list visibility."""
+        try:
+            user = user_cache.get(int(self.kwargs['pk']))
+        except ValueError:
+            user = None
+        if user is None or user.deleted_at is not None or (
+            user.user_type == 'admin' and
+            not has_role(self.request.user, SUPERUSER)
+        ):
+            raise Http404
+        self.check_object_permissions(self.request, user)
+        return user
+
     def get_serializer_class(self):
         if (
-            self.action == 'list' and
-            IsSuperUser().has_permission(self.request, self)
+            self.action in ('list', 'batch') and
+            has_role(self.request.user, SUPERUSER)
         ):
             return SuperUserSerializer
         elif self.action == 'upload_image':
             return UserImageSerializer
+        elif self.action == 'email_available':
+            return EmailAvailabilitySerializer
         return UserSerializer
 
+    @query_budget(queries=16, seconds=1.0)
+    @idempotent('user-create')
     def create(self, request, *args, **kwargs):
         user_type = request.data.get('user_type')
         if (
             user_type == 'admin' and
-            not IsSuperUser().has_permission(request, self)
+            not has_role(request.user, SUPERUSER)
         ):
             # Deny create an admin user for non-superuser
+            recorder.record(
+                AuditEvent.ADMIN_CREATE_DENIED, request,
+                email=request.data.get('email'),
+            )
             return Response(
                 {
                     'detail':
@@ -81,6 +129,8 @@ class UserView(
         url_path='upload-image',
         url_name='upload-image'
     )
+    @query_budget(queries=14, seconds=1.0)
+    @idempotent('user-upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to user."""
         user = self.get_object()
@@ -88,35 +138,206 @@ class UserView(
 
         if serializer.is_valid():
             serializer.save()
+            process_user_image.enqueue(user_id=user.id)
+            recorder.record(AuditEvent.IMAGE_UPLOAD, request, target=user)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['GET'], detail=False, url_path='email-available')
+    @query_budget(queries=6, seconds=0.5)
+    def email_available(self, request):
+        """
+        Tell whether `?email=` is free to sign up with, usually without
+        a query thanks to the `email_filter`.
+        """
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data['email']
+        return Response({
+            'email': email,
+            'available': emails.is_available(email),
+        })
+
+    @action(methods=['POST'], detail=False, url_path='batch')
+    @query_budget(queries=6, seconds=0.5)
+    def batch(self, request):
+        """
+        Look up many users by `ids` or `emails` in a single query.
+
+        Results are keyed by the requested identifier, users that do not
+        exist or are not visible to the caller map to null.
+        """
+        lookup = UserBatchLookupSerializer(data=request.data)
+        lookup.is_valid(raise_exception=True)
+        if 'ids' in lookup.validated_data:
+            identifiers = keys = lookup.validated_data['ids']
+            users = self.get_queryset().filter(id__any=keys)
+            key_of = attrgetter('id')
+        else:
+            # Emails match regardless of case, see `user_email_lower_uniq`
+            identifiers = lookup.validated_data['emails']
+            keys = [email.lower() for email in identifiers]
+            users = self.get_queryset().filter(email__lower__any=keys)
+            key_of = lambda user: user.email.lower()  # noqa: E731
+
+        users = list(users)
+        serializer = self.get_serializer(users, many=True)
+        found = {
+            key_of(user): data for user, data in zip(users, serializer.data)
+        }
+        return Response({
+            'results': {
+                str(identifier): found.get(key)
+                for identifier, key in zip(identifiers, keys)
+            }
+        })
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    # Covers the setup only, the body is streamed after the middleware
+    # has counted; `export.iter_rows` reads it in server side chunks
+    @query_budget(queries=6, seconds=0.5)
+    def export(self, request):
+        """Stream all visible users as CSV, NDJSON or Parquet."""
+        output = request.query_params.get('output', 'csv')
+        if output not in export.CONTENT_TYPES:
+            return Response(
+                {'output': f'Must be one of {list(export.CONTENT_TYPES)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        allowed = (
+            export.SUPERUSER_EXPORT_FIELDS
+            if has_role(request.user, SUPERUSER)
+            else export.EXPORT_FIELDS
+        )
+        try:
+            fields = export.parse_fields(
+                request.query_params.get('fields'), allowed
+            )
+        except ValueError as e:
+            return Response(
+                {'fields': str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        after_id = request.query_params.get('after_id', '')
+        if after_id and not after_id.isdigit():
+            return Response(
+                {'after_id': 'Must be a user id.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        after_id = int(after_id) if after_id else None
+        compress = request.query_params.get('compress') == 'gzip'
+
+        try:
+            stream = export.stream_users(
+                self.get_queryset(), fields, output, after_id, compress
+            )
+        except ImportError:
+            return Response(
+                {'output': 'Parquet export requires pyarrow.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        filename = f'users.{output}' + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            stream,
+            content_type=(
+                'application/gzip' if compress
+                else export.CONTENT_TYPES[output]
+            ),
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(methods=['GET'], detail=False, url_path='changes')
+    @query_budget(queries=6, seconds=0.5)
+    def changes(self, request):
+        """
+        Users created, updated or deleted after `cursor`, oldest first.
+
+        Start without a cursor for a full sync, then poll with the
+        returned `next_cursor`; deletions come back as tombstones, and so
+        do admins for those who cannot see them, so users made admin
+        leave the copies of non superusers.
+        """
+        updated_at = pk = None
+        if request.query_params.get('cursor'):
+            try:
+                updated_at, pk = changes.decode_cursor(
+                    request.query_params['cursor']
+                )
+            except ValueError as e:
+                return Response(
+                    {'cursor': str(e)}, status=status.HTTP_400_BAD_REQUEST
+                )
+        elif request.query_params.get('since'):
+            updated_at = parse_datetime(request.query_params['since'])
+            if updated_at is None:
+                return Response(
+                    {'since': 'Must be an ISO 8601 time.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        try:
+            limit = min(int(request.query_params.get('limit', 100)), 1000)
+        except ValueError:
+            limit = 100
+
+        users, has_more = changes.changes_after(
+            User.objects.all(), updated_at, pk, max(limit, 1)
+        )
+        if users:
+            next_cursor = changes.encode_cursor(users[-1])
+        else:
+            next_cursor = request.query_params.get('cursor')
+        context = self.get_serializer_context()
+        context['hide_admins'] = not has_role(request.user, SUPERUSER)
+        return Response({
+            'results': UserChangeSerializer(
+                users, many=True, context=context
+            ).data,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        })
+
+
+@query_budget(queries=16, seconds=1.0)
 class LogoutView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LogoutSerializer
 
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = tokens.RefreshToken(refresh_token)
+            # Tokens still buffered in this worker must be covered too
+            tokens.recorder.flush()
             token.blacklist()
 
             # blacklist all outstanding tokens for the user
-            for token in OutstandingToken.objects.filter(user=request.user):
-                BlacklistedToken.objects.get_or_create(token=token)
+            BlacklistedToken.objects.bulk_create(
+                [
+                    BlacklistedToken(token_id=pk)
+                    for pk in OutstandingToken.objects.filter(
+                        user=request.user
+                    ).values_list('pk', flat=True)
+                ],
+                ignore_conflicts=True,
+            )
+            # bulk_create sends no signals
+            bus.publish('token', request.user.pk)
+            flush_expired_tokens.enqueue(user_id=request.user.id)
+            recorder.record(AuditEvent.LOGOUT, request)
 
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(queries=10, seconds=0.5)
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -124,13 +345,19 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
+@query_budget(queries=12, seconds=1.0)
 class ManageUserImageView(generics.UpdateAPIView):
     """Update Image the authenticated user."""
     serializer_class = UserImageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['patch']
 
     def get_object(self):
         """Retrieve and return the authenticatd user."""
         return self.request.user
+
+    def perform_update(self, serializer):
+        user = serializer.save()
+        process_user_image.enqueue(user_id=user.id)
+        recorder.record(AuditEvent.IMAGE_UPLOAD, self.request, target=user)